@@ -1,7 +1,9 @@
 # app/api/v1/endpoints/chat.py
 import logging
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from app.api.v1.sse import format_sse
 from app.services.chatbot_service import chatbot_service
 
 logger = logging.getLogger(__name__)
@@ -30,3 +32,26 @@ async def handle_chat_query(query: ChatQuery):
     except Exception as e:
         logger.error(f"Error inesperado en el endpoint de chat: {e}")
         raise HTTPException(status_code=500, detail="Ocurrió un error interno al procesar la pregunta.")
+
+
+@router.post("/chat/stream")
+async def handle_chat_query_stream(query: ChatQuery):
+    """
+    Variante de /chat que emite la respuesta por SSE a medida que el LLM la genera.
+    El primer evento ('context') trae los filtros aplicados y el contexto recuperado; después
+    llegan eventos 'token' con el texto y un evento final 'done' (o 'error').
+    """
+    if not query.question:
+        raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía.")
+
+    logger.info(f"Recibida nueva pregunta para el chat (streaming): '{query.question}'")
+
+    async def event_stream():
+        try:
+            async for event, data in chatbot_service.stream_answer(query.question):
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Error inesperado en el chat en streaming: {e}")
+            yield format_sse("error", {"detail": "Ocurrió un error interno al procesar la pregunta."})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -0,0 +1,93 @@
+# app/api/v1/endpoints/jobs.py
+import asyncio
+import logging
+from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.core.config import settings
+from app.api.v1.sse import format_sse
+from app.services.upload_service import save_upload_file, UploadRejectedError
+from app.services.job_service import job_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _job_view(job: dict) -> dict:
+    """Representación pública de un trabajo (sin rutas internas)."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "stages": job["stages"],
+        "filename": job["filename"],
+        "record_id": job["record_id"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+@router.post("/jobs")
+async def submit_audio_job(file: UploadFile = File(...)):
+    """
+    Guarda el audio y programa su procesamiento en segundo plano.
+    Devuelve de inmediato el identificador del trabajo para consultar su progreso.
+    """
+    if not file.content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail="Formato de archivo no válido.")
+
+    try:
+        file_path = await save_upload_file(file)
+        job = job_service.submit(file_path, file.filename)
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error al registrar el trabajo: {e}")
+        raise HTTPException(status_code=500, detail=f"Ocurrió un error: {str(e)}")
+
+    return JSONResponse(
+        status_code=202, # 202 Accepted: el procesamiento continúa en segundo plano
+        content={
+            "message": "Audio recibido. El procesamiento continúa en segundo plano.",
+            "job_id": job["id"],
+            "status_url": f"/api/v1/jobs/{job['id']}",
+            "events_url": f"/api/v1/jobs/{job['id']}/events",
+        }
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Devuelve el estado del trabajo, el progreso por etapa y, al terminar, el 'record_id'.
+    """
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    return _job_view(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream SSE con una actualización cada vez que cambia el estado del trabajo.
+    El stream se cierra cuando el trabajo termina (completado o fallido).
+    """
+    if not job_service.get(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+
+    async def event_stream():
+        last_update = None
+        while True:
+            job = job_service.get(job_id)
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                yield format_sse("progress", _job_view(job))
+            if job["status"] in job_service.TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(settings.JOBS_SSE_POLL_SECONDS)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -0,0 +1,50 @@
+# app/api/v1/endpoints/records.py
+import logging
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from app.services.vector_db_service import vector_db_service
+from app.services.query_planner import normalize, canonical_symptoms
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Filtros estructurados sobre los datos extraídos de cada conversación
+class RecordSearch(BaseModel):
+    patient_name: Optional[str] = None
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    symptoms: List[str] = []
+    date_from: Optional[date] = None
+    date_to: Optional[date] = Field(default=None, description="Fecha final (inclusive).")
+    limit: int = Field(default=20, ge=1, le=200)
+    offset: Optional[str] = None
+
+@router.post("/records/search")
+def search_records(query: RecordSearch):
+    """
+    Búsqueda estructurada de registros por nombre, rango de edad, síntomas y fecha de consulta,
+    usando los índices de payload de la base vectorial (sin búsqueda semántica).
+    """
+    filter_spec = {
+        "min_age": query.min_age,
+        "max_age": query.max_age,
+        "date_from": query.date_from,
+        "date_to": date.fromordinal(query.date_to.toordinal() + 1) if query.date_to else None,
+    }
+    if query.patient_name:
+        filter_spec["name_tokens"] = normalize(query.patient_name).split()
+    if query.symptoms:
+        # Cada síntoma se busca por su término canónico si está en el vocabulario, o tal cual.
+        filter_spec["symptoms"] = [
+            (canonical_symptoms(symptom) or [normalize(symptom)])[0] for symptom in query.symptoms
+        ]
+
+    try:
+        records, next_offset = vector_db_service.find_records(filter_spec, limit=query.limit, offset=query.offset)
+    except Exception as e:
+        logger.error(f"Error en la búsqueda estructurada de registros: {e}")
+        raise HTTPException(status_code=503, detail="No se pudo consultar la base de datos vectorial.")
+
+    return {"records": records, "next_offset": next_offset}
@@ -1,12 +1,14 @@
 # app/api/v1/endpoints/transcription.py
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from app.services.whisper_service import whisper_service
-from app.services.extraction_service import extraction_service
-from app.services.vector_db_service import vector_db_service 
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.transcription_service import transcription_service, TranscriptionQueueFullError
+from app.services.ingestion_service import ingestion_service
+from app.services.upload_service import save_upload_file, UploadRejectedError
+from app.services.cache_service import cache_stats, sha256_file
+from app.api.v1.sse import format_sse
 from app.core.config import settings
 import os
-import uuid
+import asyncio
 import time
 import logging
 
@@ -14,61 +16,48 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-os.makedirs(settings.UPLOAD_DIRECTORY, exist_ok=True)
 
 @router.post("/transcribe")
 async def process_audio_and_store_endpoint(file: UploadFile = File(...)):
     if not file.content_type.startswith("audio/"):
         raise HTTPException(status_code=400, detail="Formato de archivo no válido.")
 
-    start_time = time.time()
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.UPLOAD_DIRECTORY, unique_filename)
+    # Rechazo temprano: si el pool de transcripción está lleno no tiene sentido guardar el archivo.
+    if transcription_service.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="El servicio de transcripción está saturado. Intenta de nuevo más tarde.",
+            headers={"Retry-After": str(settings.TRANSCRIPTION_RETRY_AFTER_SECONDS)}
+        )
 
+    file_path = None
     try:
         # Paso 1: Guardar archivo
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-        
-        # Paso 2: Transcribir
-        transcription_result = whisper_service.transcribe_audio(file_path)
-        transcription_text = transcription_result["transcription"]
-        
-        if not transcription_text or not transcription_text.strip():
-            logger.warning(f"Transcripción vacía para {file.filename}.")
-            return JSONResponse(status_code=200, content={"status": "Transcripción vacía, no se procesó."})
-
-        # Paso 3: Extraer datos
-        extracted_data = await extraction_service.extract_data_from_text(transcription_text)
+        file_path = await save_upload_file(file)
 
-        processing_metadata = {
-            "filename": file.filename,
-            "language": transcription_result["language"],
-            "processing_time_seconds": round(time.time() - start_time, 2),
-        }
-
-        # --- Paso 4 (Nuevo): Almacenar en la base de datos vectorial ---
-        record_id = vector_db_service.store_record(
-            transcription=transcription_text,
-            extracted_data=extracted_data,
-            metadata=processing_metadata
-        )
+        # Pasos 2 a 4: Transcribir, extraer y almacenar
+        result = await ingestion_service.process(file_path, file.filename)
 
-        logger.info(f"Proceso completo. Registro guardado con ID: {record_id}")
+        if result["record_id"] is None:
+            return JSONResponse(status_code=200, content={"status": "Transcripción vacía, no se procesó."})
 
         return JSONResponse(
             status_code=201, # 201 Created es más apropiado ya que creamos un recurso
             content={
                 "message": "Audio procesado y almacenado exitosamente.",
-                "record_id": record_id,
+                "record_id": result["record_id"],
+                "cached": result["cached"],
                 "data": {
-                    "processing_metadata": processing_metadata,
-                    "transcription": transcription_text,
-                    "extracted_information": extracted_data
+                    "processing_metadata": result["processing_metadata"],
+                    "transcription": result["transcription"],
+                    "extracted_information": result["extracted_information"]
                 }
             }
         )
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except TranscriptionQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except RuntimeError as e:
         logger.error(f"Error de ejecución en un servicio: {e}")
         raise HTTPException(status_code=503, detail=str(e))
@@ -76,5 +65,83 @@ async def process_audio_and_store_endpoint(file: UploadFile = File(...)):
         logger.error(f"Error inesperado: {e}")
         raise HTTPException(status_code=500, detail=f"Ocurrió un error: {str(e)}")
     finally:
-        if os.path.exists(file_path):
+        if file_path and os.path.exists(file_path):
             os.remove(file_path)
+
+
+@router.post("/transcribe/stream")
+async def stream_transcription_endpoint(file: UploadFile = File(...)):
+    """
+    Variante incremental de /transcribe: emite por SSE cada segmento (con su inicio y fin)
+    en cuanto se decodifica. Al terminar el stream se extraen y almacenan los datos
+    sobre la transcripción final y se emite un último evento con el 'record_id'.
+    """
+    if not file.content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail="Formato de archivo no válido.")
+
+    if transcription_service.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="El servicio de transcripción está saturado. Intenta de nuevo más tarde.",
+            headers={"Retry-After": str(settings.TRANSCRIPTION_RETRY_AFTER_SECONDS)}
+        )
+
+    try:
+        file_path = await save_upload_file(file)
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    filename = file.filename
+
+    async def event_stream():
+        start_time = time.time()
+        try:
+            audio_hash = await asyncio.to_thread(sha256_file, file_path)
+            transcription_result = None
+            async for event, data in transcription_service.stream(file_path, audio_hash=audio_hash):
+                if event == "segment":
+                    yield format_sse("segment", data)
+                else:
+                    transcription_result = data
+
+            yield format_sse("transcription", {
+                "language": transcription_result["language"],
+                "duration": transcription_result["duration"],
+                "transcription": transcription_result["transcription"]
+            })
+
+            result = await ingestion_service.process_transcription(
+                transcription_result, filename, start_time, audio_hash=audio_hash
+            )
+            if result["record_id"] is None:
+                yield format_sse("done", {"status": "Transcripción vacía, no se procesó."})
+            else:
+                yield format_sse("done", {
+                    "message": "Audio procesado y almacenado exitosamente.",
+                    "record_id": result["record_id"],
+                    "cached": result["cached"],
+                    "processing_metadata": result["processing_metadata"],
+                    "extracted_information": result["extracted_information"]
+                })
+        except UploadRejectedError as e:
+            yield format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+        except TranscriptionQueueFullError as e:
+            yield format_sse("error", {"status_code": 429, "detail": str(e), "retry_after": e.retry_after})
+        except RuntimeError as e:
+            logger.error(f"Error de ejecución en un servicio: {e}")
+            yield format_sse("error", {"status_code": 503, "detail": str(e)})
+        except Exception as e:
+            logger.error(f"Error inesperado: {e}")
+            yield format_sse("error", {"status_code": 500, "detail": f"Ocurrió un error: {str(e)}"})
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """
+    Devuelve el número de entradas y los aciertos/fallos de las cachés de resultados.
+    """
+    return cache_stats()
@@ -0,0 +1,11 @@
+# app/api/v1/sse.py
+import json
+from fastapi.encoders import jsonable_encoder
+
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Formatea un evento Server-Sent Events. Los datos pasan por 'jsonable_encoder', como las
+    respuestas JSON de la API (p. ej. las fechas de los filtros aplicados se envían en ISO 8601).
+    """
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
@@ -0,0 +1,36 @@
+# app/batch_ingest.py
+"""
+Ingesta masiva de grabaciones históricas desde la línea de comandos.
+
+Uso:
+    python -m app.batch_ingest /ruta/al/directorio
+    python -m app.batch_ingest /ruta/a/grabaciones.zip
+
+Si la ingesta se interrumpe, basta con volver a ejecutar el mismo comando:
+los archivos ya almacenados se omiten.
+"""
+import argparse
+import asyncio
+import json
+from app.services.batch_ingestion_service import batch_ingestion_service
+from app.services.llm_service import llm_service
+
+
+async def _run(source: str) -> dict:
+    try:
+        return await batch_ingestion_service.run(source)
+    finally:
+        await llm_service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta masiva de audios (directorio o .zip).")
+    parser.add_argument("source", help="Directorio o archivo .zip con las grabaciones.")
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args.source))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,14 +16,194 @@ class Settings:
     COMPUTE_TYPE: str = os.getenv("COMPUTE_TYPE", "cpu")
     COMPUTE_DEVICE: str = os.getenv("COMPUTE_DEVICE", "cpu")
 
+    # Configuración del pool de transcripción
+    # Número de transcripciones que se ejecutan en paralelo (cada una en su propio worker del modelo).
+    TRANSCRIPTION_WORKERS: int = int(os.getenv("TRANSCRIPTION_WORKERS", "2"))
+    # Trabajos que pueden esperar en cola antes de responder 429 al cliente.
+    TRANSCRIPTION_QUEUE_SIZE: int = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "8"))
+    # Segundos sugeridos en la cabecera Retry-After cuando la cola está llena.
+    TRANSCRIPTION_RETRY_AFTER_SECONDS: int = int(os.getenv("TRANSCRIPTION_RETRY_AFTER_SECONDS", "30"))
+    # Hilos de CPU por worker; por defecto se reparten los núcleos disponibles entre los workers.
+    WHISPER_CPU_THREADS: int = int(os.getenv(
+        "WHISPER_CPU_THREADS",
+        str(max(1, (os.cpu_count() or 1) // max(1, TRANSCRIPTION_WORKERS)))
+    ))
+
+    # Parámetros de decodificación de Whisper
+    WHISPER_BEAM_SIZE: int = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+    # Filtro de actividad de voz (VAD) en la transcripción normal.
+    WHISPER_VAD_FILTER: bool = os.getenv("WHISPER_VAD_FILTER", "false").lower() == "true"
+    # Silencio mínimo (ms) que el VAD usa para separar dos tramos de voz.
+    WHISPER_VAD_MIN_SILENCE_MS: int = int(os.getenv("WHISPER_VAD_MIN_SILENCE_MS", "500"))
+
+    # Modo de audio largo: los audios de al menos LONG_AUDIO_THRESHOLD_SECONDS se dividen
+    # con VAD en fragmentos de hasta LONG_AUDIO_CHUNK_SECONDS que se transcriben en paralelo.
+    LONG_AUDIO_THRESHOLD_SECONDS: float = float(os.getenv("LONG_AUDIO_THRESHOLD_SECONDS", "600"))
+    LONG_AUDIO_CHUNK_SECONDS: float = float(os.getenv("LONG_AUDIO_CHUNK_SECONDS", "120"))
+    LONG_AUDIO_WORKERS: int = int(os.getenv("LONG_AUDIO_WORKERS", str(TRANSCRIPTION_WORKERS)))
+
+    # Preprocesamiento del audio: decodificación a PCM mono de 16 kHz en un pool de procesos.
+    AUDIO_DECODE_WORKERS: int = int(os.getenv("AUDIO_DECODE_WORKERS", str(TRANSCRIPTION_WORKERS)))
+    AUDIO_DECODE_TIMEOUT_SECONDS: float = float(os.getenv("AUDIO_DECODE_TIMEOUT_SECONDS", "600"))
+    # Ejecutable de ffmpeg; si no está instalado, se decodifica con PyAV.
+    FFMPEG_BINARY: str = os.getenv("FFMPEG_BINARY", "ffmpeg")
+    # Recorte del silencio inicial y final: umbral de energía (dBFS) y margen (ms) que se conserva.
+    AUDIO_TRIM_SILENCE: bool = os.getenv("AUDIO_TRIM_SILENCE", "true").lower() == "true"
+    AUDIO_SILENCE_THRESHOLD_DB: float = float(os.getenv("AUDIO_SILENCE_THRESHOLD_DB", "-45"))
+    AUDIO_SILENCE_PADDING_MS: int = int(os.getenv("AUDIO_SILENCE_PADDING_MS", "300"))
+
+    # Configuración del modelo de embeddings (compartido por la ingesta y el chatbot)
+    EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    # 'torch' (por defecto) u 'onnx' para inferencia en CPU con ONNX Runtime.
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    # Archivo ONNX a usar con el backend 'onnx' (p. ej. una variante cuantizada a int8).
+    EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "")
+    # Número de consultas cuyo embedding se guarda en la caché LRU.
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+    # Tamaño máximo del lote y espera (ms) para agrupar llamadas concurrentes a 'encode'.
+    EMBEDDING_MAX_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "0"))
+
+    # Indexación por fragmentos: cada transcripción se divide en fragmentos solapados
+    # (alineados con los segmentos de Whisper) que se indexan como puntos independientes.
+    CHUNK_MAX_WORDS: int = int(os.getenv("CHUNK_MAX_WORDS", "120"))
+    CHUNK_OVERLAP_WORDS: int = int(os.getenv("CHUNK_OVERLAP_WORDS", "25"))
+    # En la búsqueda se piden top_k * RETRIEVAL_OVERSAMPLE fragmentos para agruparlos por registro.
+    RETRIEVAL_OVERSAMPLE: int = int(os.getenv("RETRIEVAL_OVERSAMPLE", "4"))
+    # Fragmentos coincidentes que se conservan por registro recuperado.
+    RETRIEVAL_CHUNKS_PER_RECORD: int = int(os.getenv("RETRIEVAL_CHUNKS_PER_RECORD", "3"))
+    # Búsqueda híbrida: los resultados densos se fusionan (RRF) con los de un índice BM25 local.
+    RETRIEVAL_HYBRID: bool = os.getenv("RETRIEVAL_HYBRID", "true").lower() == "true"
+    RETRIEVAL_RRF_K: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    # Re-ranking opcional con un cross-encoder en CPU, limitado a RERANK_TIMEOUT_MS por consulta.
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL_NAME: str = os.getenv("RERANK_MODEL_NAME", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "20"))
+    RERANK_TIMEOUT_MS: float = float(os.getenv("RERANK_TIMEOUT_MS", "300"))
+    # Predicciones del cross-encoder en curso o en cola; por encima, las consultas no se re-ordenan.
+    RERANK_MAX_PENDING: int = int(os.getenv("RERANK_MAX_PENDING", "2"))
+    # Presupuesto (tokens estimados) del contexto que se envía al LLM en el chat.
+    CHAT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+
+    # Conexión con Qdrant
+    QDRANT_HOST: str = os.getenv("QDRANT_HOST", "qdrant")
+    QDRANT_PORT: int = int(os.getenv("QDRANT_PORT", "6333"))
+    # Qdrant embebido (':memory:' o una ruta local) en lugar del servidor, p. ej. para desarrollo o benchmarks.
+    QDRANT_LOCATION: str = os.getenv("QDRANT_LOCATION", "")
+    # Las búsquedas del chat usan el cliente asíncrono, por gRPC si QDRANT_PREFER_GRPC es true.
+    QDRANT_GRPC_PORT: int = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    QDRANT_PREFER_GRPC: bool = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+
+    # Configuración de la colección de Qdrant
+    # Alias con el que trabaja la aplicación; apunta a la colección versionada '<alias>_v<N>'.
+    QDRANT_COLLECTION: str = os.getenv("QDRANT_COLLECTION", "patient_conversations")
+    # Cuantización de los vectores: 'int8' (escalar), 'binary' o 'none'. Los vectores
+    # cuantizados quedan en RAM y los originales, con QDRANT_VECTORS_ON_DISK, en disco.
+    QDRANT_QUANTIZATION: str = os.getenv("QDRANT_QUANTIZATION", "int8").lower()
+    QDRANT_QUANTIZATION_QUANTILE: float = float(os.getenv("QDRANT_QUANTIZATION_QUANTILE", "0.99"))
+    QDRANT_VECTORS_ON_DISK: bool = os.getenv("QDRANT_VECTORS_ON_DISK", "true").lower() == "true"
+    # El payload (transcripciones y datos extraídos) se guarda en disco; los índices de payload siguen en RAM.
+    QDRANT_PAYLOAD_ON_DISK: bool = os.getenv("QDRANT_PAYLOAD_ON_DISK", "true").lower() == "true"
+    # Parámetros del índice HNSW (construcción) y de la búsqueda.
+    QDRANT_HNSW_M: int = int(os.getenv("QDRANT_HNSW_M", "16"))
+    QDRANT_HNSW_EF_CONSTRUCT: int = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "128"))
+    QDRANT_SEARCH_EF: int = int(os.getenv("QDRANT_SEARCH_EF", "128"))
+    # Con cuantización, se recuperan QDRANT_SEARCH_OVERSAMPLING veces más candidatos y se
+    # reordenan con los vectores originales si QDRANT_SEARCH_RESCORE es true.
+    QDRANT_SEARCH_RESCORE: bool = os.getenv("QDRANT_SEARCH_RESCORE", "true").lower() == "true"
+    QDRANT_SEARCH_OVERSAMPLING: float = float(os.getenv("QDRANT_SEARCH_OVERSAMPLING", "2.0"))
+
     # Configuración de directorios
     UPLOAD_DIRECTORY: str = "/tmp/audio_uploads"
+    # Tamaño máximo aceptado por archivo subido y tamaño de bloque para escribirlo a disco.
+    MAX_UPLOAD_SIZE_BYTES: int = int(os.getenv("MAX_UPLOAD_SIZE_MB", "200")) * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    # Directorio para los datos locales persistentes (estado de trabajos, cachés, etc.)
+    DATA_DIRECTORY: str = os.getenv("DATA_DIRECTORY", "/tmp/elsol_data")
+
+    # Caché de resultados (transcripciones, extracciones y registros) direccionada por contenido
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_DB_PATH: str = os.getenv("CACHE_DB_PATH", os.path.join(DATA_DIRECTORY, "cache.db"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+    # Backend de la base vectorial: 'qdrant' (servidor, o embebido con QDRANT_LOCATION) o 'local',
+    # un índice en el propio proceso (matriz de numpy mapeada en memoria y un registro de payloads
+    # de solo añadir en LOCAL_INDEX_PATH), sin servicio adicional, para despliegues pequeños.
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+    LOCAL_INDEX_PATH: str = os.getenv("LOCAL_INDEX_PATH", os.path.join(DATA_DIRECTORY, "vector_index"))
+    # Filas por bloque en el producto escalar de la búsqueda exacta.
+    LOCAL_INDEX_BLOCK_ROWS: int = int(os.getenv("LOCAL_INDEX_BLOCK_ROWS", "65536"))
+    # El índice se compacta cuando las filas eliminadas o reemplazadas superan esta fracción.
+    LOCAL_INDEX_COMPACT_RATIO: float = float(os.getenv("LOCAL_INDEX_COMPACT_RATIO", "0.3"))
+
+    # Índice léxico (SQLite FTS5) de los fragmentos para la búsqueda híbrida
+    LEXICAL_INDEX_DB_PATH: str = os.getenv("LEXICAL_INDEX_DB_PATH", os.path.join(DATA_DIRECTORY, "lexical.db"))
+
+    # Caché semántica de respuestas del chat: una pregunta reutiliza la respuesta de otra
+    # anterior si la similitud de sus embeddings supera el umbral (y los filtros coinciden).
+    CHAT_CACHE_ENABLED: bool = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+    CHAT_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("CHAT_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    CHAT_CACHE_MAX_ENTRIES: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+    CHAT_CACHE_TTL_SECONDS: float = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+
+    # Ingesta masiva (python -m app.batch_ingest)
+    BATCH_MANIFEST_DB_PATH: str = os.getenv("BATCH_MANIFEST_DB_PATH", os.path.join(DATA_DIRECTORY, "batch_manifest.db"))
+    # Extracciones simultáneas con Gemini durante la ingesta masiva.
+    BATCH_LLM_CONCURRENCY: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+    # Registros que se acumulan antes de generar sus embeddings e insertarlos en Qdrant.
+    BATCH_UPSERT_SIZE: int = int(os.getenv("BATCH_UPSERT_SIZE", "256"))
+
+    # Configuración de los trabajos de ingesta en segundo plano
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIRECTORY, "jobs.db"))
+    # Número de pipelines de ingesta que se ejecutan a la vez en modo trabajo.
+    JOBS_MAX_CONCURRENCY: int = int(os.getenv("JOBS_MAX_CONCURRENCY", str(TRANSCRIPTION_WORKERS)))
+    # Intervalo con el que el stream SSE consulta el estado del trabajo.
+    JOBS_SSE_POLL_SECONDS: float = float(os.getenv("JOBS_SSE_POLL_SECONDS", "0.5"))
+
+    # Observabilidad: /metrics requiere 'prometheus_client'; los spans, 'opentelemetry-api' y OTEL_ENABLED=true.
+    OTEL_ENABLED: bool = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+
+    # Arranque: los modelos y la conexión con Qdrant se cargan en segundo plano tras iniciar el
+    # servidor (en paralelo si STARTUP_WARMUP_PARALLEL) y /health/ready indica cuándo han terminado.
+    # Con STARTUP_WARMUP=false se cargan en el primer uso. Los componentes que fallan se reintentan.
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+    STARTUP_WARMUP_PARALLEL: bool = os.getenv("STARTUP_WARMUP_PARALLEL", "true").lower() == "true"
+    STARTUP_RETRY_SECONDS: float = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+    # Despliegue con varios workers ('python -m app.server'): con API_WORKERS > 1, los modelos se
+    # cargan una sola vez en un proceso servidor de modelos al que los workers llegan por un socket
+    # Unix. MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY y SERVER_BOOT_ID los fija el lanzador.
+    API_WORKERS: int = int(os.getenv("API_WORKERS", "1"))
+    MODEL_SERVER_SOCKET: str = os.getenv("MODEL_SERVER_SOCKET", os.path.join(DATA_DIRECTORY, "model_server.sock"))
+    MODEL_SERVER_ADDRESS: str = os.getenv("MODEL_SERVER_ADDRESS", "")
+    MODEL_SERVER_AUTHKEY: str = os.getenv("MODEL_SERVER_AUTHKEY", "")
+    SERVER_BOOT_ID: str = os.getenv("SERVER_BOOT_ID", "")
+    # Directorio donde los procesos escriben sus métricas de Prometheus con varios workers. El
+    # lanzador lo vacía al arrancar y lo exporta como PROMETHEUS_MULTIPROC_DIR.
+    METRICS_MULTIPROC_DIR: str = os.getenv("METRICS_MULTIPROC_DIR", os.path.join(DATA_DIRECTORY, "prometheus"))
     
     # API Key para el servicio de extracción (Gemini)
     # os.getenv buscará la variable 'GEMINI_API_KEY' en el entorno.
     # Gracias a load_dotenv(), ahora la encontrará en tu archivo .env.
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
 
+    # Configuración del cliente compartido de Gemini
+    # La URL base es configurable para poder apuntar a un servidor local de pruebas.
+    GEMINI_API_BASE_URL: str = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-preview-05-20")
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    # Peticiones simultáneas máximas a Gemini.
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    # Límite de tasa (token bucket): peticiones por segundo y tamaño de ráfaga. 0 desactiva el límite.
+    LLM_RATE_LIMIT_PER_SECOND: float = float(os.getenv("LLM_RATE_LIMIT_PER_SECOND", "0"))
+    LLM_RATE_LIMIT_BURST: float = float(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+    # Reintentos con backoff exponencial ante 429/5xx y errores de red.
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+
     # Verificación para asegurar que la API Key fue cargada
     if not GEMINI_API_KEY:
         print("ADVERTENCIA: La variable de entorno GEMINI_API_KEY no está configurada.")
@@ -0,0 +1,172 @@
+# app/core/metrics.py
+"""
+Instrumentación de la aplicación: métricas de Prometheus y, opcionalmente, spans de OpenTelemetry.
+
+'prometheus_client' y 'opentelemetry-api' son dependencias opcionales: si no están instaladas,
+los helpers de este módulo no hacen nada y /metrics responde 503.
+
+Con varios workers ('python -m app.server'), el lanzador define PROMETHEUS_MULTIPROC_DIR: cada
+proceso escribe sus contadores e histogramas en ese directorio y /metrics los agrega todos,
+responda el worker que responda. Las métricas calculadas al vuelo ('register_callback') son las
+del worker que atiende el scrape.
+"""
+import logging
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client import multiprocess
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+_tracer = None
+if settings.OTEL_ENABLED:
+    try:
+        from opentelemetry import trace
+        # El proveedor y el exportador se configuran fuera (p. ej. con 'opentelemetry-instrument').
+        _tracer = trace.get_tracer("elsol")
+    except ImportError:
+        logger.warning("OTEL_ENABLED está activo pero 'opentelemetry-api' no está instalado; no se emitirán spans.")
+
+# Buckets de latencia (segundos): desde búsquedas de milisegundos hasta transcripciones de minutos.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_DURATION = Histogram(
+        "elsol_stage_duration_seconds", "Duración de cada etapa de los pipelines de ingesta y chat.",
+        ["stage"], buckets=LATENCY_BUCKETS
+    )
+    STAGE_ERRORS = Counter(
+        "elsol_stage_errors_total", "Errores por etapa y tipo de excepción.", ["stage", "error_type"]
+    )
+    LLM_TOKENS = Counter(
+        "elsol_llm_tokens_total", "Tokens consumidos en Gemini según 'usageMetadata'.", ["operation", "kind"]
+    )
+    LLM_REQUESTS = Counter(
+        "elsol_llm_requests_total", "Peticiones HTTP a Gemini por método y resultado.", ["method", "outcome"]
+    )
+    HTTP_DURATION = Histogram(
+        "elsol_http_request_duration_seconds", "Duración de las peticiones HTTP a la API.",
+        ["method", "route", "status"], buckets=LATENCY_BUCKETS
+    )
+
+# Métricas que se leen en el momento del scrape: nombre -> (tipo, descripción, etiquetas, callbacks).
+# Cada callback devuelve un dict {tupla de valores de etiquetas: valor}.
+_callback_metrics = {}
+
+
+def register_callback(name: str, documentation: str, callback, labelnames: tuple = (), kind: str = "gauge"):
+    """
+    Registra una métrica calculada al vuelo a partir del estado de un servicio (profundidad
+    de colas, aciertos de caché, etc.). 'kind' es "gauge" o "counter" (valores acumulados).
+    Si ya existía una con el mismo nombre, se combinan los valores de todos sus callbacks.
+    """
+    entry = _callback_metrics.setdefault(name, (kind, documentation, tuple(labelnames), []))
+    entry[3].append(callback)
+
+
+class _CallbackCollector:
+    def collect(self):
+        for name, (kind, documentation, labelnames, callbacks) in _callback_metrics.items():
+            family_class = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+            family = family_class(name, documentation, labels=list(labelnames))
+            for callback in callbacks:
+                try:
+                    values = callback()
+                except Exception as e:
+                    logger.error(f"Error al calcular la métrica {name}: {e}")
+                    continue
+                for labels, value in values.items():
+                    family.add_metric(list(labels), value)
+            yield family
+
+
+if PROMETHEUS_AVAILABLE:
+    REGISTRY.register(_CallbackCollector())
+
+
+def observe_stage(stage: str, seconds: float):
+    if PROMETHEUS_AVAILABLE:
+        STAGE_DURATION.labels(stage=stage).observe(seconds)
+
+
+def record_error(stage: str, error: BaseException):
+    if PROMETHEUS_AVAILABLE:
+        STAGE_ERRORS.labels(stage=stage, error_type=type(error).__name__).inc()
+
+
+@contextmanager
+def track_stage(stage: str, **attributes):
+    """
+    Mide la duración de una etapa (histograma), cuenta sus errores por tipo y, si OpenTelemetry
+    está activo, la envuelve en un span con los atributos indicados.
+    """
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        if _tracer is not None:
+            stack.enter_context(_tracer.start_as_current_span(stage, attributes=attributes))
+        try:
+            yield
+        except Exception as e:
+            record_error(stage, e)
+            raise
+        finally:
+            observe_stage(stage, time.perf_counter() - start)
+
+
+def record_llm_usage(operation: str, usage_metadata: dict):
+    """Acumula los tokens de prompt y de respuesta que informa Gemini."""
+    if not PROMETHEUS_AVAILABLE or not usage_metadata:
+        return
+    for kind, key in (("prompt", "promptTokenCount"), ("completion", "candidatesTokenCount")):
+        if usage_metadata.get(key):
+            LLM_TOKENS.labels(operation=operation, kind=kind).inc(usage_metadata[key])
+
+
+def record_llm_request(method: str, outcome: str):
+    if PROMETHEUS_AVAILABLE:
+        LLM_REQUESTS.labels(method=method, outcome=outcome).inc()
+
+
+def observe_http_request(method: str, route: str, status: int, seconds: float):
+    if PROMETHEUS_AVAILABLE:
+        HTTP_DURATION.labels(method=method, route=route, status=str(status)).observe(seconds)
+
+
+@contextmanager
+def request_span(method: str, path: str):
+    """Span de OpenTelemetry por petición HTTP (no hace nada si OTEL_ENABLED no está activo)."""
+    with ExitStack() as stack:
+        if _tracer is not None:
+            stack.enter_context(_tracer.start_as_current_span(
+                f"HTTP {method}", attributes={"http.method": method, "url.path": path}
+            ))
+        yield
+
+
+def _multiprocess_dir() -> str:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+
+def render_metrics() -> bytes:
+    if not _multiprocess_dir():
+        return generate_latest(REGISTRY)
+    # Registro por scrape con las métricas de todos los procesos (workers y servidor de modelos).
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_CallbackCollector())
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    """Al terminar un worker, descarta sus métricas de tipo gauge del directorio compartido."""
+    if PROMETHEUS_AVAILABLE and _multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
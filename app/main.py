@@ -1,20 +1,79 @@
 # app/main.py
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 # Importamos los routers de ambos endpoints
-from app.api.v1.endpoints import transcription, chat
+from app.api.v1.endpoints import transcription, chat, jobs, records
+from app.services.transcription_service import transcription_service
+from app.services.job_service import job_service
+from app.services.llm_service import llm_service
+from app.services.vector_db_service import vector_db_service
+from app.services.startup_service import startup_service
+from app.core.metrics import (CONTENT_TYPE_LATEST, PROMETHEUS_AVAILABLE, mark_process_dead, observe_http_request,
+                              render_metrics, request_span)
+
+# --- Ciclo de Vida ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Al arrancar, lanza en segundo plano la carga de los modelos y la conexión con Qdrant y
+    reanuda los trabajos de ingesta pendientes. Al detenerse, libera el pool de transcripción
+    y las conexiones con Gemini y Qdrant.
+    """
+    startup_service.start()
+    job_service.resume_pending()
+    yield
+    await startup_service.stop()
+    transcription_service.shutdown()
+    await llm_service.aclose()
+    await vector_db_service.aclose()
+    mark_process_dead()
+
 
 # --- Inicialización de la Aplicación FastAPI ---
 app = FastAPI(
     title="API de Análisis de Conversaciones Médicas",
     description="Un sistema para transcribir, analizar y consultar conversaciones entre promotores y pacientes.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- Inclusión de Routers ---
 # Incluimos el router de transcripción
 app.include_router(transcription.router, prefix="/api/v1", tags=["1. Procesamiento de Audio"])
+# Incluimos el router de trabajos de ingesta en segundo plano
+app.include_router(jobs.router, prefix="/api/v1", tags=["1. Procesamiento de Audio"])
 # Incluimos el nuevo router del chatbot
 app.include_router(chat.router, prefix="/api/v1", tags=["2. Chatbot de Consultas"])
+# Incluimos el router de búsqueda estructurada de registros
+app.include_router(records.router, prefix="/api/v1", tags=["3. Registros"])
+
+
+# --- Instrumentación ---
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Mide la duración de cada petición por ruta (la plantilla, p. ej. '/jobs/{job_id}', para no
+    disparar la cardinalidad) y la envuelve en un span si OpenTelemetry está activo.
+    En las respuestas SSE se mide hasta el envío de las cabeceras.
+    """
+    start = time.perf_counter()
+    with request_span(request.method, request.url.path):
+        response = await call_next(request)
+    route = request.scope.get("route")
+    observe_http_request(request.method, route.path if route else "unmatched", response.status_code,
+                         time.perf_counter() - start)
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Métricas en formato de exposición de Prometheus.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return Response("prometheus_client no está instalado.", status_code=503, media_type="text/plain")
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 
 # --- Endpoint de Verificación (Health Check) ---
@@ -24,3 +83,23 @@ def read_root():
     Endpoint raíz para verificar que el servicio está funcionando.
     """
     return {"status": "ok", "message": "Bienvenido a la API de Análisis de Conversaciones Médicas."}
+
+
+@app.get("/health/live", tags=["Root"])
+def liveness():
+    """
+    Liveness: el proceso responde. No depende de los modelos ni de Qdrant.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", tags=["Root"])
+def readiness(response: Response):
+    """
+    Readiness: 200 cuando todos los componentes (Whisper, embeddings, la base vectorial y, si está activo,
+    el re-ranker) están cargados; 503 mientras se calientan o si alguno falló.
+    """
+    ready, components = startup_service.readiness()
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "not_ready", "components": components}
@@ -0,0 +1,35 @@
+# app/migrate_collection.py
+"""
+Migra la colección de Qdrant a una nueva colección versionada con la configuración actual
+(cuantización, HNSW, almacenamiento en disco y modelo de embeddings) y cambia el alias a ella.
+Con VECTOR_BACKEND=local reescribe el índice local en una versión nueva y cambia CURRENT.
+
+Uso:
+    python -m app.migrate_collection
+    python -m app.migrate_collection --keep-old
+
+Los cambios de HNSW, cuantización o almacenamiento en disco se aplican solos al arrancar la
+API; esta migración hace falta al cambiar de modelo de embeddings (otra dimensión), para
+convertir una colección anterior a los alias o para reconstruir todos los segmentos desde cero.
+Conviene ejecutarla con la ingesta detenida: las escrituras durante la copia no se trasladan.
+"""
+import argparse
+import logging
+from app.services.vector_db_service import vector_db_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra la colección de la base vectorial a una nueva versión.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Puntos copiados por lote.")
+    parser.add_argument("--keep-old", action="store_true", help="Conserva la colección anterior tras cambiar el alias.")
+    args = parser.parse_args()
+
+    target = vector_db_service.migrate_collection(batch_size=args.batch_size, keep_old=args.keep_old)
+    logger.info(f"'{vector_db_service.collection_name}' usa ahora la versión '{target}'.")
+
+
+if __name__ == "__main__":
+    main()
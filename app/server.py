@@ -0,0 +1,96 @@
+# app/server.py
+"""
+Lanzador de la API para producción.
+
+Uso:
+    python -m app.server                  # API_WORKERS (1 por defecto)
+    python -m app.server --workers 4
+
+Con un solo worker equivale a 'uvicorn app.main:app'. Con varios, arranca primero el servidor
+de modelos (un proceso con Whisper y los modelos de embeddings) y después los workers de
+uvicorn, que le envían las inferencias por un socket Unix en lugar de cargar cada uno su copia.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import secrets
+import shutil
+import time
+import uuid
+import uvicorn
+from app.core.config import settings
+from app.services.model_server import serve
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo para que el servidor de modelos abra su socket.
+MODEL_SERVER_START_TIMEOUT_SECONDS = 30
+
+
+def _start_model_server(address: str, authkey: bytes) -> multiprocessing.Process:
+    if os.path.exists(address):
+        os.remove(address)
+    os.makedirs(os.path.dirname(address), exist_ok=True)
+    # 'spawn': el proceso no hereda hilos ni estado del lanzador.
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(address, authkey), name="model-server"
+    )
+    process.start()
+    deadline = time.monotonic() + MODEL_SERVER_START_TIMEOUT_SECONDS
+    while not os.path.exists(address):
+        if not process.is_alive() or time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError("No se pudo iniciar el servidor de modelos.")
+        time.sleep(0.1)
+    return process
+
+
+def _prepare_metrics_dir(path: str):
+    """
+    Directorio de métricas compartido por todos los procesos (ver 'app.core.metrics'). Se vacía
+    para no sumar los valores de un arranque anterior. Debe definirse antes de lanzar los procesos.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de la API con uno o varios workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS)
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run("app.main:app", host=args.host, port=args.port)
+        return
+
+    if settings.VECTOR_BACKEND == "local" or settings.QDRANT_LOCATION:
+        # El Qdrant embebido y el índice local son propios de cada proceso: los workers no verían los mismos datos.
+        parser.error("Con varios workers, Qdrant debe ejecutarse como servidor (VECTOR_BACKEND=qdrant y QDRANT_LOCATION vacío).")
+
+    _prepare_metrics_dir(settings.METRICS_MULTIPROC_DIR)
+    authkey = secrets.token_bytes(32)
+    model_server = _start_model_server(settings.MODEL_SERVER_SOCKET, authkey)
+    # Los workers de uvicorn heredan el entorno y leen estos valores al importar la configuración.
+    os.environ.update({
+        "API_WORKERS": str(args.workers),
+        "MODEL_SERVER_ADDRESS": settings.MODEL_SERVER_SOCKET,
+        "MODEL_SERVER_AUTHKEY": authkey.hex(),
+        "SERVER_BOOT_ID": str(uuid.uuid4()),
+    })
+    logger.info(f"Iniciando {args.workers} workers con el servidor de modelos (pid {model_server.pid}).")
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        model_server.terminate()
+        model_server.join()
+        if os.path.exists(settings.MODEL_SERVER_SOCKET):
+            os.remove(settings.MODEL_SERVER_SOCKET)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# app/services/audio_service.py
+"""
+Preprocesamiento del audio antes de Whisper: decodificación y remuestreo a PCM mono de 16 kHz,
+recorte del silencio inicial y final y rechazo temprano de archivos dañados.
+
+El trabajo corre en un pool de procesos propio, de modo que la decodificación de un audio se
+solapa con la inferencia de otro y los workers de Whisper reciben directamente un array de numpy.
+Este módulo solo depende de numpy (y de ffmpeg o PyAV) para que los procesos arranquen rápido.
+"""
+import asyncio
+import logging
+import multiprocessing
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import track_stage
+from app.services.upload_service import UploadRejectedError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Frecuencia de muestreo con la que trabaja Whisper.
+SAMPLING_RATE = 16000
+# Duración de las ventanas (s) con las que se mide la energía al recortar el silencio.
+SILENCE_FRAME_SECONDS = 0.02
+
+
+class AudioDecodeError(UploadRejectedError):
+    """
+    Se lanza cuando el archivo no se puede decodificar (dañado o sin pista de audio).
+    """
+    def __init__(self, detail: str):
+        super().__init__(422, detail)
+
+
+def _decode_with_ffmpeg(ffmpeg: str, file_path: str) -> np.ndarray:
+    command = [
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", file_path, "-vn", "-ac", "1", "-ar", str(SAMPLING_RATE), "-f", "s16le", "-"
+    ]
+    try:
+        process = subprocess.run(command, capture_output=True, timeout=settings.AUDIO_DECODE_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError("La decodificación del audio superó el tiempo máximo.")
+    if process.returncode != 0:
+        error = process.stderr.decode(errors="replace").strip().splitlines()
+        raise AudioDecodeError(f"El archivo de audio está dañado o no se puede decodificar: {error[-1] if error else 'error de ffmpeg'}")
+    return np.frombuffer(process.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _decode_with_pyav(file_path: str) -> np.ndarray:
+    # Sin ffmpeg en el sistema se usa el decodificador de faster-whisper (PyAV).
+    from faster_whisper.audio import decode_audio
+    try:
+        return decode_audio(file_path, sampling_rate=SAMPLING_RATE)
+    except Exception as e:
+        raise AudioDecodeError(f"El archivo de audio está dañado o no se puede decodificar: {e}")
+
+
+def decode(file_path: str) -> np.ndarray:
+    """
+    Decodifica cualquier contenedor o códec a PCM mono de 16 kHz en float32 (entre -1 y 1).
+
+    Raises:
+        AudioDecodeError: Si el archivo no se puede decodificar o no contiene audio.
+    """
+    ffmpeg = shutil.which(settings.FFMPEG_BINARY)
+    audio = _decode_with_ffmpeg(ffmpeg, file_path) if ffmpeg else _decode_with_pyav(file_path)
+    if audio.size == 0:
+        raise AudioDecodeError("El archivo no contiene audio decodificable.")
+    return audio
+
+
+def trim_silence(audio: np.ndarray) -> tuple:
+    """
+    Recorta el silencio inicial y final: las ventanas cuya energía (RMS) no supera
+    AUDIO_SILENCE_THRESHOLD_DB (dBFS), conservando AUDIO_SILENCE_PADDING_MS alrededor de la voz.
+
+    Returns:
+        tuple: (audio recortado, segundos recortados al inicio). Si todo es silencio, el audio queda vacío.
+    """
+    frame = int(SILENCE_FRAME_SECONDS * SAMPLING_RATE)
+    frames = len(audio) // frame
+    if frames == 0:
+        return audio, 0.0
+    rms = np.sqrt(np.mean(np.square(audio[:frames * frame].reshape(frames, frame)), axis=1))
+    voiced = np.flatnonzero(rms > 10 ** (settings.AUDIO_SILENCE_THRESHOLD_DB / 20))
+    if voiced.size == 0:
+        return audio[:0], 0.0
+
+    padding = int(settings.AUDIO_SILENCE_PADDING_MS / 1000 * SAMPLING_RATE)
+    start = max(0, voiced[0] * frame - padding)
+    # La última ventana incompleta se conserva si la voz llega hasta el final.
+    end = len(audio) if voiced[-1] == frames - 1 else min(len(audio), (voiced[-1] + 1) * frame + padding)
+    return audio[start:end], float(start / SAMPLING_RATE)
+
+
+def prepare_audio(file_path: str) -> dict:
+    """
+    Decodifica y normaliza un archivo para Whisper. Se ejecuta en los procesos del pool,
+    pero también puede llamarse directamente.
+
+    Returns:
+        dict: "audio" (array float32 a 16 kHz), "offset" (segundos recortados al inicio, para
+            desplazar las marcas de tiempo) y "duration" (duración del audio original).
+    """
+    audio = decode(file_path)
+    duration = len(audio) / SAMPLING_RATE
+    offset = 0.0
+    if settings.AUDIO_TRIM_SILENCE:
+        audio, offset = trim_silence(audio)
+    return {"audio": audio, "offset": offset, "duration": duration}
+
+
+class AudioService:
+    """
+    Pool de procesos para la decodificación del audio. Se crea en el primer uso con el
+    contexto 'spawn', de forma que los procesos no heredan los modelos ni los hilos del worker.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Pool de decodificación de audio listo: {self.max_workers} procesos.")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def prepare(self, file_path: str) -> dict:
+        """
+        Prepara el audio en el pool de procesos sin bloquear el event loop (ver 'prepare_audio').
+
+        Raises:
+            AudioDecodeError: Si el archivo está dañado o no contiene audio.
+        """
+        with track_stage("decode"):
+            executor = self._get_executor()
+            try:
+                return await asyncio.wrap_future(executor.submit(prepare_audio, file_path))
+            except BrokenProcessPool:
+                # Un proceso murió (p. ej. por falta de memoria): se recrea el pool para los siguientes audios.
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                executor.shutdown(wait=False)
+                raise RuntimeError("El proceso de decodificación de audio terminó de forma inesperada.")
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Instancia única del servicio
+audio_service = AudioService(max_workers=settings.AUDIO_DECODE_WORKERS)
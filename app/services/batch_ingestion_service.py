@@ -0,0 +1,221 @@
+# app/services/batch_ingestion_service.py
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from app.core.config import settings
+from app.services.transcription_service import transcription_service, TranscriptionQueueFullError
+from app.services.extraction_service import extraction_service
+from app.services.vector_db_service import vector_db_service
+from app.services.ingestion_service import ingestion_service
+from app.services.upload_service import sniff_audio_format, SNIFF_LENGTH
+from app.services.cache_service import sha256_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BatchManifest:
+    """
+    Registro local (SQLite) del estado de cada archivo de una ingesta masiva.
+    Permite reanudar una ingesta interrumpida sin volver a procesar lo ya almacenado.
+    """
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batch_files (
+                    source TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    audio_hash TEXT,
+                    record_id TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source, path)
+                )
+                """
+            )
+
+    def status(self, source: str, path: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM batch_files WHERE source = ? AND path = ?", (source, path)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark(self, source: str, path: str, status: str, audio_hash: str = None, record_id: str = None, error: str = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batch_files (source, path, status, audio_hash, record_id, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, path, status, audio_hash, record_id, error, time.time())
+            )
+
+
+class BatchIngestionService:
+    """
+    Ingesta masiva de un directorio o archivo .zip de grabaciones.
+
+    Las etapas se solapan: las transcripciones corren en el pool de Whisper, las
+    extracciones con concurrencia acotada contra Gemini, y los registros listos se
+    acumulan para generar sus embeddings e insertarlos en Qdrant en lotes grandes
+    (sin esperar la indexación, con una espera final). Los archivos ya almacenados,
+    según el manifiesto o la caché de registros, se omiten.
+    """
+    def __init__(self, manifest: BatchManifest):
+        self.manifest = manifest
+
+    @staticmethod
+    def _collect_audio_files(root: str) -> list:
+        """Devuelve las rutas relativas de los archivos de audio (por magic bytes) bajo 'root'."""
+        files = []
+        for directory, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                with open(path, "rb") as f:
+                    if sniff_audio_format(f.read(SNIFF_LENGTH)) is None:
+                        continue
+                files.append(os.path.relpath(path, root))
+        return sorted(files)
+
+    async def run(self, source: str) -> dict:
+        """
+        Ingiere todos los audios de 'source' (directorio o .zip) y devuelve un informe.
+        """
+        source = os.path.abspath(source)
+        extracted_dir = None
+        if zipfile.is_zipfile(source):
+            extracted_dir = tempfile.mkdtemp(dir=settings.UPLOAD_DIRECTORY)
+            logger.info(f"Descomprimiendo {source}...")
+            with zipfile.ZipFile(source) as archive:
+                archive.extractall(extracted_dir)
+            root = extracted_dir
+        elif os.path.isdir(source):
+            root = source
+        else:
+            raise ValueError(f"'{source}' no es un directorio ni un archivo .zip.")
+
+        try:
+            return await self._ingest(source, root)
+        finally:
+            if extracted_dir:
+                shutil.rmtree(extracted_dir, ignore_errors=True)
+
+    async def _ingest(self, source: str, root: str) -> dict:
+        files = self._collect_audio_files(root)
+        logger.info(f"Ingesta masiva de {len(files)} archivos desde {source}.")
+
+        counts = {"processed": 0, "skipped": 0, "empty": 0, "failed": 0}
+        pending = []
+        flush_lock = asyncio.Lock()
+        transcription_slots = asyncio.Semaphore(transcription_service.max_workers)
+        llm_slots = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+        start_time = time.time()
+
+        async def flush(wait: bool):
+            async with flush_lock:
+                batch = pending[:]
+                pending.clear()
+                if not batch:
+                    return
+                try:
+                    await asyncio.to_thread(
+                        vector_db_service.store_records, [record for _, _, record in batch],
+                        settings.BATCH_UPSERT_SIZE, wait
+                    )
+                except Exception as e:
+                    for rel_path, audio_hash, _ in batch:
+                        self.manifest.mark(source, rel_path, "failed", audio_hash=audio_hash, error=str(e))
+                    counts["failed"] += len(batch)
+                    return
+                for rel_path, audio_hash, record in batch:
+                    self.manifest.mark(source, rel_path, "done", audio_hash=audio_hash, record_id=record["record_id"])
+                    ingestion_service.remember_record(audio_hash, {
+                        "record_id": record["record_id"],
+                        "processing_metadata": record["metadata"],
+                        "transcription": record["transcription"],
+                        "extracted_information": record["extracted_data"]
+                    })
+                counts["processed"] += len(batch)
+                elapsed = time.time() - start_time
+                logger.info(f"{counts['processed']} archivos almacenados ({counts['processed'] / elapsed * 60:.1f} archivos/min).")
+
+        async def transcribe(path: str, audio_hash: str) -> dict:
+            async with transcription_slots:
+                while True:
+                    try:
+                        return await transcription_service.transcribe(path, audio_hash=audio_hash)
+                    except TranscriptionQueueFullError as e:
+                        # El pool también atiende a la API: se espera en lugar de fallar.
+                        await asyncio.sleep(e.retry_after)
+
+        async def process_file(rel_path: str):
+            if self.manifest.status(source, rel_path) == "done":
+                counts["skipped"] += 1
+                return
+            path = os.path.join(root, rel_path)
+            file_start = time.time()
+            audio_hash = None
+            try:
+                audio_hash = await asyncio.to_thread(sha256_file, path)
+                cached = await ingestion_service.cached_record(audio_hash)
+                if cached is not None:
+                    self.manifest.mark(source, rel_path, "done", audio_hash=audio_hash, record_id=cached["record_id"])
+                    counts["skipped"] += 1
+                    return
+
+                transcription_result = await transcribe(path, audio_hash)
+                transcription_text = transcription_result["transcription"]
+                if not transcription_text.strip():
+                    self.manifest.mark(source, rel_path, "empty", audio_hash=audio_hash)
+                    counts["empty"] += 1
+                    return
+
+                async with llm_slots:
+                    extracted_data = await extraction_service.extract_data_from_text(transcription_text)
+
+                pending.append((rel_path, audio_hash, {
+                    "record_id": ingestion_service.record_id_for(audio_hash),
+                    "transcription": transcription_text,
+                    "segments": transcription_result.get("segments"),
+                    "extracted_data": extracted_data,
+                    "metadata": {
+                        "filename": rel_path,
+                        "language": transcription_result["language"],
+                        "processing_time_seconds": round(time.time() - file_start, 2),
+                    }
+                }))
+                if len(pending) >= settings.BATCH_UPSERT_SIZE:
+                    await flush(wait=False)
+            except Exception as e:
+                logger.error(f"Error al procesar {rel_path}: {e}")
+                self.manifest.mark(source, rel_path, "failed", audio_hash=audio_hash, error=str(e))
+                counts["failed"] += 1
+
+        await asyncio.gather(*(process_file(rel_path) for rel_path in files))
+        # Vaciado final: inserta lo pendiente y espera a que Qdrant aplique todas las operaciones.
+        await flush(wait=True)
+
+        elapsed = time.time() - start_time
+        report = {
+            "source": source,
+            "total_files": len(files),
+            **counts,
+            "elapsed_seconds": round(elapsed, 2),
+            "files_per_minute": round(counts["processed"] / elapsed * 60, 2) if elapsed > 0 else 0.0
+        }
+        logger.info(f"Ingesta masiva terminada: {report}")
+        return report
+
+
+# Instancia única del servicio
+batch_ingestion_service = BatchIngestionService(BatchManifest(settings.BATCH_MANIFEST_DB_PATH))
@@ -0,0 +1,298 @@
+# app/services/cache_service.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import register_callback
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula el hash SHA-256 de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Caché persistente (SQLite) de resultados direccionados por contenido.
+
+    Cada entrada se guarda como JSON bajo una clave (normalmente un hash). Las entradas
+    caducan tras 'ttl_seconds' y, si se supera 'max_entries', se eliminan las usadas
+    hace más tiempo. Lleva contadores de aciertos y fallos.
+    """
+    def __init__(self, name: str, db_path: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        register_callback("elsol_cache_hits", "Aciertos de caché.", lambda: {(self.name,): self.hits},
+                          labelnames=("cache",), kind="counter")
+        register_callback("elsol_cache_misses", "Fallos de caché.", lambda: {(self.name,): self.misses},
+                          labelnames=("cache",), kind="counter")
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.name} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_last_access ON {self.name} (last_access)")
+
+    def get(self, key: str) -> Optional[dict]:
+        if not settings.CACHE_ENABLED:
+            return None
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.name} SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        if not settings.CACHE_ENABLED:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._evict(now)
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+
+    def _evict(self, now: float):
+        """Elimina las entradas caducadas y, si sobran, las menos usadas recientemente."""
+        self._conn.execute(f"DELETE FROM {self.name} WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.name} WHERE key IN "
+                f"(SELECT key FROM {self.name} ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class SemanticCache:
+    """
+    Caché en memoria de respuestas indexada por el embedding de la pregunta.
+
+    Una consulta acierta si existe una entrada del mismo ámbito ('scope': versión de la
+    colección + filtros aplicados) cuya pregunta tenga una similitud coseno mayor o igual
+    que 'threshold'. Las entradas caducan tras 'ttl_seconds' y, si se supera 'max_entries',
+    se descartan las usadas hace más tiempo.
+
+    Cada entrada recuerda los registros que usó y la puntuación mínima con la que entraron
+    en el contexto: al almacenar fragmentos nuevos, 'invalidate' descarta las entradas que
+    podrían haber recuperado alguno de ellos (o cuyos registros se sobrescribieron).
+    """
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, threshold: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_key = 0
+
+        register_callback("elsol_cache_hits", "Aciertos de caché.", lambda: {(self.name,): self.hits},
+                          labelnames=("cache",), kind="counter")
+        register_callback("elsol_cache_misses", "Fallos de caché.", lambda: {(self.name,): self.misses},
+                          labelnames=("cache",), kind="counter")
+        register_callback("elsol_cache_entries", "Entradas en la caché semántica de respuestas.",
+                          lambda: {(self.name,): len(self._entries)}, labelnames=("cache",))
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def get(self, vector: list, scope: str) -> Optional[tuple]:
+        """
+        Returns:
+            tuple: (valor guardado, similitud) de la entrada más parecida, o None.
+        """
+        if not settings.CHAT_CACHE_ENABLED:
+            return None
+        query = self._normalize(vector)
+        now = time.time()
+        best_key, best_similarity = None, self.threshold
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if now - entry["created_at"] > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                if entry["scope"] != scope:
+                    continue
+                similarity = float(entry["vector"] @ query)
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key]["value"], best_similarity
+
+    def set(self, vector: list, scope: str, value: dict, record_ids: list, min_score: Optional[float]):
+        """
+        Guarda una respuesta. 'min_score' es la puntuación del último registro recuperado;
+        None indica que se recuperaron menos de los pedidos y cualquier escritura puede afectarla.
+        """
+        if not settings.CHAT_CACHE_ENABLED:
+            return
+        with self._lock:
+            self._next_key += 1
+            self._entries[self._next_key] = {
+                "vector": self._normalize(vector),
+                "scope": scope,
+                "value": value,
+                "record_ids": set(record_ids),
+                "min_score": min_score,
+                "created_at": time.time()
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, vectors: list, record_ids: list):
+        """
+        Descarta las entradas que podrían cambiar tras almacenar 'vectors' (los embeddings de
+        los fragmentos escritos) para los registros 'record_ids'.
+        """
+        if not self._entries or not len(vectors):
+            return
+        written = self._normalize(vectors)
+        record_ids = set(record_ids)
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                stale = (
+                    entry["min_score"] is None
+                    or entry["record_ids"] & record_ids
+                    or float(np.max(written @ entry["vector"])) >= entry["min_score"]
+                )
+                if stale:
+                    del self._entries[key]
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class SharedCounter:
+    """
+    Contador persistente (SQLite) compartido por todos los procesos que usan el mismo archivo.
+
+    La caché de respuestas de cada proceso solo ve las invalidaciones de los registros que
+    almacena él mismo; este contador, incluido en el ámbito de la caché, hace que cualquier
+    escritura (de otro worker, de 'app.batch_ingest' o de 'app.migrate_collection') invalide
+    las respuestas cacheadas en todos los procesos.
+    """
+    def __init__(self, name: str, db_path: str):
+        self.name = name
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+
+    def increment(self):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (self.name,))
+
+    def value(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM counters WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row else 0
+
+
+def _build_cache(name: str) -> ResultCache:
+    return ResultCache(
+        name=name,
+        db_path=settings.CACHE_DB_PATH,
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.CACHE_TTL_SECONDS
+    )
+
+
+# Cachés compartidas por los servicios
+# Transcripciones, por hash del audio + configuración del modelo.
+transcription_cache = _build_cache("transcriptions")
+# Extracciones, por hash de la transcripción + versión del esquema/prompt.
+extraction_cache = _build_cache("extractions")
+# Resultados completos de ingesta, para reutilizar el 'record_id' de un audio repetido.
+record_cache = _build_cache("records")
+# Respuestas del chat, por similitud de la pregunta (en memoria, por proceso).
+answer_cache = SemanticCache(
+    name="answers",
+    max_entries=settings.CHAT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CHAT_CACHE_TTL_SECONDS,
+    threshold=settings.CHAT_CACHE_SIMILARITY_THRESHOLD
+)
+# Escrituras en la colección, compartidas entre workers.
+data_generation = SharedCounter("data_generation", settings.CACHE_DB_PATH)
+
+
+def cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in (transcription_cache, extraction_cache, record_cache, answer_cache)}
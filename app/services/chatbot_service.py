@@ -1,63 +1,70 @@
-import logging
-import httpx
 import json
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+import logging
+import time
 from app.core.config import settings
+from app.core.metrics import observe_stage, record_error, record_llm_usage, track_stage
+from app.services.embedding_service import embedding_service
+from app.services.vector_db_service import vector_db_service
+from app.services.llm_service import llm_service
+from app.services.query_planner import plan_query
+from app.services.context_builder import build_context, estimate_tokens
+from app.services.cache_service import answer_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+NO_CONTEXT_ANSWER = "Lo siento, no pude encontrar información relevante para responder a tu pregunta."
+LLM_ERROR_ANSWER = "Hubo un error al comunicarme con el servicio de IA para generar la respuesta."
+
 class ChatbotService:
     """
     Servicio para manejar la lógica del chatbot usando el patrón RAG.
     """
-    def __init__(self, qdrant_host="qdrant", qdrant_port=6333):
+    def __init__(self):
         logger.info("Inicializando ChatbotService...")
-        # Conexión a la base de datos vectorial
-        self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port)
-        
-        # Carga del modelo de embeddings (el mismo que usamos para almacenar)
-        # La librería lo carga desde el caché, por lo que es instantáneo.
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        self.collection_name = "patient_conversations"
-        self.llm_api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={settings.GEMINI_API_KEY}"
+        # Reutiliza la base vectorial y el modelo de embeddings de la ingesta
+        # (el mismo que usamos para almacenar), en lugar de cargar copias propias.
+        self.vector_db_service = vector_db_service
+        self.embedding_service = embedding_service
 
-    def _retrieve_context(self, query: str, top_k: int = 3) -> list:
+    async def _retrieve_context(self, query: str, top_k: int = 3, filter_spec: dict = None, query_vector: list = None) -> list:
         """
-        Paso 1: Recuperar contexto relevante de Qdrant.
+        Paso 1: Recuperar contexto relevante de la base vectorial (Qdrant o el índice local).
+        Si la pregunta trae filtros explícitos (edad, síntomas, fechas, nombre), la búsqueda
+        se restringe a los registros que los cumplen. Ni el embedding (se calcula en el hilo
+        del modelo, agrupado con otras peticiones) ni la búsqueda (asíncrona) bloquean
+        el event loop.
         """
         try:
             logger.info(f"Buscando contexto para la pregunta: '{query}'")
-            # Convierte la pregunta del usuario en un vector
-            query_vector = self.embedding_model.encode(query).tolist()
+            # Convierte la pregunta del usuario en un vector (si no se calculó ya)
+            query_vector = query_vector or await self.embedding_service.aencode(query)
             
-            # Busca en Qdrant los 'top_k' vectores más similares
-            search_results = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=top_k,
-                with_payload=True # ¡Muy importante para obtener los datos!
+            # Busca en la base vectorial los fragmentos más similares y los agrupa por registro
+            context = await self.vector_db_service.asearch_records(
+                query_vector, top_k=top_k, filter_spec=filter_spec, query_text=query
             )
-            
-            # Extrae el payload (los datos guardados) de los resultados
-            context = [hit.payload for hit in search_results]
+            if not context and filter_spec:
+                # Los filtros se infieren de la pregunta y pueden ser demasiado estrictos.
+                logger.info("Sin resultados con los filtros de la pregunta; se busca sin filtros.")
+                filter_spec.clear()
+                context = await self.vector_db_service.asearch_records(query_vector, top_k=top_k, query_text=query)
             logger.info(f"Se encontraron {len(context)} documentos de contexto.")
             return context
         except Exception as e:
-            logger.error(f"Error al recuperar contexto de Qdrant: {e}")
+            logger.error(f"Error al recuperar contexto de la base vectorial: {e}")
             return []
 
-    async def _generate_response(self, query: str, context: list) -> str:
+    @staticmethod
+    def _build_prompt(query: str, context: list) -> tuple:
         """
-        Paso 2: Generar una respuesta usando el LLM con el contexto recuperado.
-        """
-        if not context:
-            return "Lo siento, no pude encontrar información relevante para responder a tu pregunta."
+        Construye la petición al LLM con un contexto compacto: solo los campos relevantes y
+        los fragmentos coincidentes, sin duplicados y dentro del presupuesto de tokens.
 
-        # Construimos un prompt claro y directo para el LLM
-        context_str = "\n---\n".join(json.dumps(doc, indent=2) for doc in context)
+        Returns:
+            tuple: (payload para Gemini, uso estimado de tokens del prompt).
+        """
+        context_str, context_stats = build_context(context)
         prompt = f"""
         Eres un asistente de IA que responde preguntas sobre conversaciones con pacientes.
         Usa únicamente la siguiente información de contexto para responder la pregunta del usuario.
@@ -74,31 +81,179 @@ class ChatbotService:
         """
         
         payload = {"contents": [{"parts": [{"text": prompt}]}]}
-        headers = {'Content-Type': 'application/json'}
+        usage = {**context_stats, "estimated_prompt_tokens": estimate_tokens(prompt), "prompt_tokens": None}
+        return payload, usage
+
+    @staticmethod
+    def _response_text(response_data: dict) -> str:
+        """Extrae el texto de una respuesta (o de un fragmento del stream) del LLM."""
+        parts = response_data.get("candidates", [{}])[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    async def _generate_response(self, query: str, context: list) -> tuple:
+        """
+        Paso 2: Generar una respuesta usando el LLM con el contexto recuperado.
+        Los errores del LLM se propagan para que la respuesta fallida no se guarde en caché.
+
+        Returns:
+            tuple: (respuesta, uso de tokens del prompt).
+        """
+        if not context:
+            return NO_CONTEXT_ANSWER, None
+
+        payload, usage = self._build_prompt(query, context)
 
         logger.info("Enviando petición al LLM para generar la respuesta final...")
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(self.llm_api_url, json=payload, headers=headers)
-                response.raise_for_status()
-                
-                # Extrae el texto de la respuesta del LLM
-                content = response.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-                return content.strip()
-            except Exception as e:
-                logger.error(f"Error al generar respuesta con el LLM: {e}")
-                return "Hubo un error al comunicarme con el servicio de IA para generar la respuesta."
-
-    async def answer_question(self, query: str) -> dict:
+        with track_stage("generate", streaming=False):
+            response_data = await llm_service.generate_content(payload)
+
+        # Gemini informa los tokens reales del prompt en 'usageMetadata'.
+        usage["prompt_tokens"] = response_data.get("usageMetadata", {}).get("promptTokenCount")
+        record_llm_usage("chat", response_data.get("usageMetadata"))
+        logger.info(f"Tokens del prompt: {usage}")
+        return self._response_text(response_data).strip(), usage
+
+    async def _prepare(self, query: str, top_k: int) -> tuple:
+        """
+        Planifica los filtros, calcula el embedding de la pregunta y consulta la caché semántica
+        de respuestas: una pregunta casi idéntica a otra reciente (con los mismos filtros)
+        reutiliza su respuesta.
+
+        Returns:
+            tuple: (filtros, vector de la pregunta, ámbito de caché, entrada cacheada o None).
+        """
+        filter_spec = plan_query(query)
+        if filter_spec:
+            logger.info(f"Filtros detectados en la pregunta: {filter_spec}")
+        query_vector = await self.embedding_service.aencode(query)
+
+        # Ámbito de la caché: misma colección (versión) y mismos filtros inferidos de la pregunta.
+        cache_scope = json.dumps(
+            {"collection": self.vector_db_service.collection_version, "filters": filter_spec, "top_k": top_k},
+            sort_keys=True, default=str
+        )
+        return filter_spec, query_vector, cache_scope, answer_cache.get(query_vector, cache_scope)
+
+    @staticmethod
+    def _remember(query_vector: list, cache_scope: str, response: dict, filter_spec: dict,
+                  applied_filters: dict, context: list, top_k: int):
+        if not context:
+            # Sin contexto no hubo llamada al LLM (o falló la búsqueda): no merece la pena cachearla.
+            return
+        # Un registro nuevo solo cambia esta respuesta si puntúa al menos como el último recuperado.
+        # Si se recuperaron menos registros de los pedidos, se descartaron los filtros por no
+        # haber resultados, o la puntuación es la de la fusión híbrida (no comparable con la
+        # similitud coseno), cualquier escritura puede cambiarla.
+        complete = len(context) >= top_k and applied_filters == filter_spec and not settings.RETRIEVAL_HYBRID
+        min_score = min(record["score"] for record in context) if complete else None
+        answer_cache.set(query_vector, cache_scope, response, [record["record_id"] for record in context], min_score)
+
+    async def answer_question(self, query: str, top_k: int = 3) -> dict:
         """
         Orquesta el proceso completo de RAG.
         """
-        context = self._retrieve_context(query)
-        answer = await self._generate_response(query, context)
-        
+        start_time = time.time()
+        filter_spec, query_vector, cache_scope, cached = await self._prepare(query, top_k)
+        if cached is not None:
+            response, similarity = cached
+            logger.info(f"Respuesta servida desde la caché (similitud {similarity:.3f}) en {(time.time() - start_time) * 1000:.1f} ms.")
+            return {**response, "question": query, "cached": True, "cache_similarity": round(similarity, 4)}
+
+        applied_filters = dict(filter_spec)
+        context = await self._retrieve_context(query, top_k=top_k, filter_spec=applied_filters, query_vector=query_vector)
+        try:
+            answer, usage = await self._generate_response(query, context)
+        except Exception as e:
+            logger.error(f"Error al generar respuesta con el LLM: {e}")
+            return self._build_response(query, LLM_ERROR_ANSWER, applied_filters, None, context)
+
+        response = self._build_response(query, answer, applied_filters, usage, context)
+        self._remember(query_vector, cache_scope, response, filter_spec, applied_filters, context, top_k)
+        return response
+
+    async def stream_answer(self, query: str, top_k: int = 3):
+        """
+        Variante incremental de 'answer_question' con 'streamGenerateContent'.
+
+        Genera tuplas (evento, datos): primero 'context' con los filtros aplicados y el contexto
+        recuperado, después un 'token' por cada fragmento de texto del LLM y, al final, 'done'
+        con la respuesta completa, el uso de tokens y el tiempo hasta el primer token
+        (o 'error' si falla el LLM).
+        """
+        start_time = time.time()
+        filter_spec, query_vector, cache_scope, cached = await self._prepare(query, top_k)
+        if cached is not None:
+            response, similarity = cached
+            logger.info(f"Respuesta servida desde la caché (similitud {similarity:.3f}).")
+            yield "context", {
+                "question": query,
+                "applied_filters": response["applied_filters"],
+                "cached": True,
+                "cache_similarity": round(similarity, 4),
+                "retrieved_context": response["retrieved_context"]
+            }
+            yield "token", {"text": response["answer"]}
+            yield "done", {"answer": response["answer"], "usage": response["usage"], "cached": True}
+            return
+
+        applied_filters = dict(filter_spec)
+        context = await self._retrieve_context(query, top_k=top_k, filter_spec=applied_filters, query_vector=query_vector)
+        yield "context", {
+            "question": query,
+            "applied_filters": applied_filters,
+            "cached": False,
+            "retrieved_context": context
+        }
+        if not context:
+            yield "token", {"text": NO_CONTEXT_ANSWER}
+            yield "done", {"answer": NO_CONTEXT_ANSWER, "usage": None, "cached": False}
+            return
+
+        payload, usage = self._build_prompt(query, context)
+        parts = []
+        first_token_ms = None
+        usage_metadata = None
+        # La etapa se mide a mano: un span abierto a través de los 'yield' quedaría ligado al consumidor.
+        generate_start = time.perf_counter()
+        logger.info("Enviando petición en streaming al LLM para generar la respuesta final...")
+        try:
+            async for chunk in llm_service.stream_generate_content(payload):
+                text = self._response_text(chunk)
+                # El último fragmento trae 'usageMetadata' con el recuento real del prompt.
+                usage_metadata = chunk.get("usageMetadata", usage_metadata)
+                usage["prompt_tokens"] = chunk.get("usageMetadata", {}).get("promptTokenCount", usage["prompt_tokens"])
+                if not text:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = round((time.time() - start_time) * 1000, 1)
+                    observe_stage("time_to_first_token", first_token_ms / 1000)
+                    logger.info(f"Primer token del LLM en {first_token_ms} ms.")
+                parts.append(text)
+                yield "token", {"text": text}
+        except Exception as e:
+            record_error("generate", e)
+            logger.error(f"Error al generar respuesta en streaming con el LLM: {e}")
+            yield "error", {"detail": LLM_ERROR_ANSWER}
+            return
+
+        observe_stage("generate", time.perf_counter() - generate_start)
+        record_llm_usage("chat", usage_metadata)
+        answer = "".join(parts).strip()
+        logger.info(f"Tokens del prompt: {usage}")
+        self._remember(
+            query_vector, cache_scope, self._build_response(query, answer, applied_filters, usage, context),
+            filter_spec, applied_filters, context, top_k
+        )
+        yield "done", {"answer": answer, "usage": usage, "cached": False, "time_to_first_token_ms": first_token_ms}
+
+    @staticmethod
+    def _build_response(query: str, answer: str, filter_spec: dict, usage: dict, context: list) -> dict:
         return {
             "question": query,
             "answer": answer,
+            "applied_filters": filter_spec,
+            "usage": usage,
+            "cached": False,
             "retrieved_context": context # Opcional: devolver el contexto para depuración
         }
 
@@ -0,0 +1,71 @@
+# app/services/chunking_service.py
+from typing import Optional
+from app.core.config import settings
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _chunk_words(transcription: str, max_words: int, overlap_words: int) -> list:
+    """Divide un texto sin segmentos en ventanas de palabras solapadas."""
+    words = transcription.split()
+    step = max(1, max_words - overlap_words)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append({"text": " ".join(words[start:start + max_words]), "start": None, "end": None})
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+
+def chunk_transcription(transcription: str, segments: Optional[list] = None,
+                        max_words: int = None, overlap_words: int = None) -> list:
+    """
+    Divide una transcripción en fragmentos solapados para indexarlos por separado.
+
+    Los fragmentos se alinean con los segmentos de Whisper: se acumulan segmentos hasta
+    alcanzar 'max_words' palabras (para no superar la ventana del modelo de embeddings)
+    y el siguiente fragmento repite los últimos segmentos hasta cubrir 'overlap_words'.
+    Sin segmentos, se usan ventanas de palabras.
+
+    Returns:
+        list: Diccionarios con 'index', 'text', 'start' y 'end' (segundos, o None sin segmentos).
+    """
+    max_words = max_words or settings.CHUNK_MAX_WORDS
+    overlap_words = overlap_words if overlap_words is not None else settings.CHUNK_OVERLAP_WORDS
+
+    if not segments:
+        chunks = _chunk_words(transcription, max_words, overlap_words)
+    else:
+        chunks = []
+        first = 0
+        while first < len(segments):
+            last = first
+            words = _word_count(segments[first]["text"])
+            while last + 1 < len(segments) and words + _word_count(segments[last + 1]["text"]) <= max_words:
+                last += 1
+                words += _word_count(segments[last]["text"])
+            selected = segments[first:last + 1]
+            chunks.append({
+                "text": "".join(segment["text"] for segment in selected).strip(),
+                "start": selected[0]["start"],
+                "end": selected[-1]["end"]
+            })
+            if last + 1 >= len(segments):
+                break
+            # El siguiente fragmento retrocede tantos segmentos como quepan en el solapamiento,
+            # pero siempre avanza al menos uno.
+            next_first = last + 1
+            overlap = 0
+            while next_first - 1 > first and overlap + _word_count(segments[next_first - 1]["text"]) <= overlap_words:
+                next_first -= 1
+                overlap += _word_count(segments[next_first]["text"])
+            first = next_first
+
+    # Se numeran después de descartar los vacíos (p. ej. segmentos de silencio): el fragmento 0,
+    # que guarda la transcripción completa, tiene que existir siempre que haya texto.
+    chunks = [chunk for chunk in chunks if chunk["text"]]
+    if not chunks and segments:
+        chunks = [chunk for chunk in _chunk_words(transcription, max_words, overlap_words) if chunk["text"]]
+    return [{"index": index, **chunk} for index, chunk in enumerate(chunks)]
@@ -0,0 +1,128 @@
+# app/services/context_builder.py
+import math
+from app.core.config import settings
+
+# Campos extraídos que se incluyen en el prompt, con la etiqueta que se muestra al LLM.
+PROMPT_FIELDS = (
+    ("patient_name", "paciente"),
+    ("patient_age", "edad"),
+    ("consultation_date", "fecha"),
+    ("symptoms", "síntomas"),
+    ("preliminary_diagnosis", "diagnóstico"),
+    ("observations", "observaciones"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token), suficiente para presupuestar el prompt."""
+    return math.ceil(len(text) / 4)
+
+
+def _format_timestamp(seconds) -> str:
+    seconds = int(seconds or 0)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def _merge_overlapping_chunks(chunks: list) -> list:
+    """
+    Une los fragmentos consecutivos de un registro eliminando el texto solapado entre ellos,
+    para no enviar dos veces las mismas frases.
+    """
+    merged = []
+    for chunk in sorted(chunks, key=lambda item: item["chunk_index"]):
+        previous = merged[-1] if merged else None
+        if previous and chunk["chunk_index"] == previous["last_index"] + 1:
+            previous_words = previous["text"].split()
+            words = chunk["text"].split()
+            overlap = 0
+            for size in range(min(len(previous_words), len(words)), 0, -1):
+                if previous_words[-size:] == words[:size]:
+                    overlap = size
+                    break
+            previous["text"] = " ".join(previous_words + words[overlap:])
+            previous["end"] = chunk["end"]
+            previous["last_index"] = chunk["chunk_index"]
+            previous["score"] = max(previous["score"], chunk["score"])
+        else:
+            merged.append({**chunk, "last_index": chunk["chunk_index"]})
+    return merged
+
+
+def _format_fields(extracted_data: dict) -> str:
+    parts = []
+    for key, label in PROMPT_FIELDS:
+        value = (extracted_data or {}).get(key)
+        if value in (None, "", []):
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        parts.append(f"{label}: {value}")
+    return " | ".join(parts) or "sin datos extraídos"
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    words = text.split()
+    kept = []
+    for word in words:
+        if estimate_tokens(" ".join(kept + [word])) > max_tokens:
+            break
+        kept.append(word)
+    return " ".join(kept) + " …" if len(kept) < len(words) else text
+
+
+def build_context(records: list, token_budget: int = None) -> tuple:
+    """
+    Construye un contexto compacto para el prompt a partir de los registros recuperados.
+
+    - Proyecta solo los campos extraídos relevantes (sin metadatos de procesamiento).
+    - Usa solo los fragmentos coincidentes de la transcripción, uniendo los solapados.
+    - Descarta registros duplicados (mismo ID o mismos datos y fragmentos).
+    - Añade registros y fragmentos por orden de relevancia hasta agotar 'token_budget'.
+
+    Returns:
+        tuple: (texto del contexto, estadísticas con tokens estimados y elementos usados).
+    """
+    token_budget = token_budget or settings.CHAT_CONTEXT_TOKEN_BUDGET
+    blocks = []
+    used_tokens = 0
+    seen = set()
+    chunks_used = 0
+
+    for record in records:
+        fields = _format_fields(record.get("extracted_data"))
+        chunks = _merge_overlapping_chunks(record.get("matched_chunks") or [])
+        fingerprint = (fields, tuple(chunk["text"] for chunk in chunks))
+        if record.get("record_id") in seen or fingerprint in seen:
+            continue
+        seen.update((record.get("record_id"), fingerprint))
+
+        header = f"[Registro {len(blocks) + 1}] {fields}"
+        header_tokens = estimate_tokens(header)
+        if used_tokens + header_tokens > token_budget:
+            break
+        lines = [header]
+        used_tokens += header_tokens
+
+        # Los fragmentos más relevantes entran primero; se muestran en orden temporal.
+        selected = []
+        for chunk in sorted(chunks, key=lambda item: item["score"], reverse=True):
+            prefix = f"- ({_format_timestamp(chunk['start'])}-{_format_timestamp(chunk['end'])}) " if chunk.get("start") is not None else "- "
+            remaining = token_budget - used_tokens - estimate_tokens(prefix)
+            if remaining <= 0:
+                break
+            text = _truncate_to_tokens(chunk["text"], remaining)
+            if not text.strip("… "):
+                break
+            line = f"{prefix}{text}"
+            selected.append((chunk["chunk_index"], line))
+            used_tokens += estimate_tokens(line)
+        lines.extend(line for _, line in sorted(selected))
+        chunks_used += len(selected)
+        blocks.append("\n".join(lines))
+
+    context = "\n\n".join(blocks)
+    return context, {
+        "context_tokens": estimate_tokens(context),
+        "records_used": len(blocks),
+        "chunks_used": chunks_used,
+    }
@@ -0,0 +1,167 @@
+# app/services/embedding_service.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from sentence_transformers import SentenceTransformer
+from app.core.config import settings
+from app.core.metrics import observe_stage, register_callback, track_stage
+from app.services.model_client import remote_model
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """
+    Proveedor único del modelo de embeddings, compartido por todos los servicios.
+
+    - Carga el modelo una sola vez por proceso, en el primer uso o en el calentamiento del
+      arranque (opcionalmente con el backend ONNX/int8).
+    - Guarda en una caché LRU los embeddings de consultas repetidas.
+    - Agrupa las llamadas concurrentes a 'encode' en un único forward pass (micro-batching).
+    """
+    def __init__(self):
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._queue = queue.Queue()
+        self._batch_thread = None
+        self._thread_lock = threading.Lock()
+
+        register_callback("elsol_embedding_queue_depth", "Textos esperando al hilo de embeddings.",
+                          lambda: {(): self._queue.qsize()})
+        register_callback("elsol_cache_hits", "Aciertos de caché.", lambda: {("embeddings",): self.cache_hits},
+                          labelnames=("cache",), kind="counter")
+        register_callback("elsol_cache_misses", "Fallos de caché.", lambda: {("embeddings",): self.cache_misses},
+                          labelnames=("cache",), kind="counter")
+
+    # --- Carga diferida del modelo ---
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        with self._model_lock:
+            if self._model is None and settings.MODEL_SERVER_ADDRESS:
+                # Varios workers: el modelo vive en el servidor de modelos compartido.
+                self._model = remote_model("embeddings")
+            elif self._model is None:
+                logger.info(f"Cargando modelo de embeddings '{settings.EMBEDDING_MODEL_NAME}' (backend '{settings.EMBEDDING_BACKEND}')...")
+                if settings.EMBEDDING_BACKEND == "onnx":
+                    # Requiere sentence-transformers>=3.2 con 'optimum[onnxruntime]'. El archivo permite
+                    # elegir una variante cuantizada a int8 (p. ej. 'onnx/model_qint8_avx512_vnni.onnx').
+                    model_kwargs = {"file_name": settings.EMBEDDING_ONNX_FILE} if settings.EMBEDDING_ONNX_FILE else None
+                    self._model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, backend="onnx", model_kwargs=model_kwargs)
+                else:
+                    self._model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+                logger.info("Modelo de embeddings cargado.")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def load(self):
+        """Carga el modelo y ejecuta una inferencia de prueba (calentamiento del arranque)."""
+        self.model.encode(["calentamiento"], batch_size=1)
+
+    # --- Caché LRU de consultas ---
+    def _cache_get(self, text: str):
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.cache_hits += 1
+            return vector
+
+    def _cache_set(self, text: str, vector: list):
+        with self._cache_lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > settings.EMBEDDING_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    # --- Micro-batching ---
+    def _ensure_batch_thread(self):
+        # El hilo se arranca en el primer uso (y no al importar) para que cada proceso tenga el suyo.
+        with self._thread_lock:
+            if self._batch_thread is None or not self._batch_thread.is_alive():
+                self._batch_thread = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+                self._batch_thread.start()
+
+    def _batch_loop(self):
+        """
+        Toma la primera petición pendiente y agrupa con ella todas las que llegaron
+        mientras tanto (hasta EMBEDDING_MAX_BATCH_SIZE) para codificarlas juntas.
+        """
+        wait_seconds = settings.EMBEDDING_BATCH_WAIT_MS / 1000
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < settings.EMBEDDING_MAX_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=wait_seconds) if wait_seconds else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts))
+                observe_stage("embed_query", time.perf_counter() - start)
+                for (text, future), vector in zip(batch, vectors):
+                    future.set_result(vector.tolist())
+            except Exception as e:
+                logger.error(f"Error al generar embeddings para un lote de {len(texts)} textos: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def _submit(self, text: str) -> Future:
+        future = Future()
+        cached = self._cache_get(text)
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        def store_in_cache(done: Future):
+            if done.exception() is None:
+                self._cache_set(text, done.result())
+
+        future.add_done_callback(store_in_cache)
+        self._ensure_batch_thread()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> list:
+        """
+        Devuelve el embedding de un texto. Usa la caché y se agrupa con otras llamadas concurrentes.
+        """
+        return self._submit(text).result()
+
+    async def aencode(self, text: str) -> list:
+        """
+        Igual que 'encode', pero espera el resultado sin bloquear el event loop.
+        """
+        return await asyncio.wrap_future(self._submit(text))
+
+    def encode_batch(self, texts: list) -> list:
+        """
+        Codifica directamente una lista de textos en lotes (sin caché), p. ej. para la ingesta.
+        """
+        with track_stage("embed"):
+            vectors = self.model.encode(texts, batch_size=settings.EMBEDDING_MAX_BATCH_SIZE)
+        return [vector.tolist() for vector in vectors]
+
+
+# Instancia única del servicio
+embedding_service = EmbeddingService()
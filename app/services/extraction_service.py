@@ -2,6 +2,9 @@ import httpx
 import json
 import logging
 from app.core.config import settings
+from app.services.cache_service import extraction_cache, sha256_text
+from app.services.llm_service import llm_service
+from app.core.metrics import record_llm_usage, track_stage
 
 # Configuración del logger
 logging.basicConfig(level=logging.INFO)
@@ -12,10 +15,6 @@ class ExtractionService:
     Servicio para extraer información estructurada y no estructurada de un texto
     utilizando un Modelo de Lenguaje Grande (LLM).
     """
-    # La URL de la API de Gemini. En un entorno real, esto estaría en config.py
-    # El modelo gemini-2.5-flash-preview-05-20 es rápido y eficiente para esta tarea.
-    API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={settings.GEMINI_API_KEY}"
-
     # Definimos el esquema JSON que esperamos que el LLM nos devuelva.
     # Esto es crucial para obtener una salida consistente y fiable.
     JSON_SCHEMA = {
@@ -35,6 +34,13 @@ class ExtractionService:
         "required": ["patient_name", "symptoms", "observations"]
     }
 
+    # Versión del prompt. Increméntala al modificar '_build_prompt' para invalidar la caché de extracciones.
+    PROMPT_VERSION = "1"
+
+    def cache_version(self) -> str:
+        """Identifica el esquema y el prompt con los que se generó una extracción."""
+        return sha256_text(json.dumps(self.JSON_SCHEMA, sort_keys=True) + self.PROMPT_VERSION + settings.GEMINI_MODEL)
+
     def _build_prompt(self, transcription: str) -> str:
         """Construye el prompt para el LLM."""
         return f"""
@@ -67,6 +73,12 @@ class ExtractionService:
         Returns:
             dict: Los datos extraídos en formato de diccionario.
         """
+        cache_key = sha256_text(f"{sha256_text(transcription)}:{self.cache_version()}")
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Datos extraídos obtenidos de la caché.")
+            return cached
+
         prompt = self._build_prompt(transcription)
         
         payload = {
@@ -77,28 +89,30 @@ class ExtractionService:
             }
         }
         
-        headers = {'Content-Type': 'application/json'}
-
         logger.info("Enviando petición a la API de Gemini para extracción de datos...")
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(self.API_URL, json=payload, headers=headers)
-                response.raise_for_status()  # Lanza una excepción para códigos de error HTTP (4xx o 5xx)
-
-                response_data = response.json()
-                
-                # Extrae el contenido JSON de la respuesta de la API
-                content = response_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "{}")
-                
-                logger.info("Datos extraídos exitosamente.")
-                return json.loads(content)
-
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Error en la petición a la API de Gemini: {e.response.text}")
-                raise RuntimeError(f"Error al comunicarse con el servicio de IA: {e.response.status_code}")
-            except (json.JSONDecodeError, IndexError, KeyError) as e:
-                logger.error(f"Error al procesar la respuesta de la API de Gemini: {e}")
-                raise RuntimeError("La respuesta del servicio de IA no tuvo el formato esperado.")
+        try:
+            # El cliente compartido gestiona el pool de conexiones, los límites y los reintentos.
+            with track_stage("extract"):
+                response_data = await llm_service.generate_content(payload)
+            record_llm_usage("extract", response_data.get("usageMetadata"))
+
+            # Extrae el contenido JSON de la respuesta de la API
+            content = response_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "{}")
+
+            extracted_data = json.loads(content)
+            logger.info("Datos extraídos exitosamente.")
+            extraction_cache.set(cache_key, extracted_data)
+            return extracted_data
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error en la petición a la API de Gemini: {e.response.text}")
+            raise RuntimeError(f"Error al comunicarse con el servicio de IA: {e.response.status_code}")
+        except httpx.TransportError as e:
+            logger.error(f"Error de conexión con la API de Gemini: {e}")
+            raise RuntimeError("No se pudo conectar con el servicio de IA.")
+        except (json.JSONDecodeError, IndexError, KeyError) as e:
+            logger.error(f"Error al procesar la respuesta de la API de Gemini: {e}")
+            raise RuntimeError("La respuesta del servicio de IA no tuvo el formato esperado.")
 
 # Instancia única del servicio
 extraction_service = ExtractionService()
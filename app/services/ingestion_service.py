@@ -0,0 +1,163 @@
+# app/services/ingestion_service.py
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Optional
+from app.services.whisper_service import whisper_service
+from app.services.transcription_service import transcription_service
+from app.services.extraction_service import extraction_service
+from app.services.vector_db_service import vector_db_service
+from app.services.cache_service import record_cache, sha256_file, sha256_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class IngestionService:
+    """
+    Orquesta el pipeline de ingesta de un audio: transcripción, extracción y almacenamiento.
+    Lo usan tanto el endpoint síncrono como los trabajos en segundo plano.
+
+    Tras la transcripción, las etapas forman un pequeño grafo: la extracción con Gemini y la
+    escritura de los fragmentos en Qdrant (embeddings + upsert) no dependen entre sí y corren
+    a la vez; cuando ambas terminan, los datos extraídos se añaden a los fragmentos.
+    """
+    STAGES = ("transcribing", "extracting", "storing")
+    # Espacio de nombres para derivar el 'record_id' a partir del hash del audio.
+    RECORD_NAMESPACE = uuid.UUID("6f1d1f5e-2b1c-4c57-9a43-3c1e5b0f8a27")
+
+    @classmethod
+    def record_id_for(cls, audio_hash: str) -> str:
+        """
+        El 'record_id' se deriva del contenido del audio: volver a subir la misma
+        grabación sobrescribe su punto en Qdrant en lugar de duplicarlo.
+        """
+        return str(uuid.uuid5(cls.RECORD_NAMESPACE, audio_hash))
+
+    @staticmethod
+    def _record_cache_key(audio_hash: str) -> str:
+        return sha256_text(f"{whisper_service.cache_key(audio_hash)}:{extraction_service.cache_version()}")
+
+    async def cached_record(self, audio_hash: str) -> Optional[dict]:
+        """
+        Devuelve el resultado de una ingesta anterior del mismo audio si su registro sigue en la
+        base vectorial. La consulta (SQLite y una petición a Qdrant) se hace en un hilo para no
+        bloquear el event loop.
+        """
+        return await asyncio.to_thread(self._cached_record, audio_hash)
+
+    def _cached_record(self, audio_hash: str) -> Optional[dict]:
+        cache_key = self._record_cache_key(audio_hash)
+        cached = record_cache.get(cache_key)
+        if cached is None:
+            return None
+        if not vector_db_service.record_exists(cached["record_id"]):
+            record_cache.delete(cache_key)
+            return None
+        logger.info(f"Audio ya procesado. Se reutiliza el registro {cached['record_id']}.")
+        return {**cached, "cached": True}
+
+    async def process(self, file_path: str, filename: str, on_stage: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        Ejecuta el pipeline completo sobre un archivo ya guardado en disco.
+
+        Args:
+            file_path (str): Ruta al archivo de audio.
+            filename (str): Nombre original del archivo subido.
+            on_stage (callable, opcional): Se invoca con el nombre de cada etapa al comenzarla.
+
+        Returns:
+            dict: El resultado del proceso. 'record_id' es None si la transcripción quedó vacía.
+        """
+        start_time = time.time()
+        audio_hash = await asyncio.to_thread(sha256_file, file_path)
+        cached = await self.cached_record(audio_hash)
+        if cached is not None:
+            return cached
+
+        if on_stage:
+            on_stage("transcribing")
+        transcription_result = await transcription_service.transcribe(file_path, audio_hash=audio_hash)
+        return await self.process_transcription(
+            transcription_result, filename, start_time, audio_hash=audio_hash, on_stage=on_stage
+        )
+
+    async def process_transcription(self, transcription_result: dict, filename: str, start_time: float,
+                                    audio_hash: str, on_stage: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        Ejecuta las etapas posteriores a la transcripción: extracción y almacenamiento.
+        La usa también el endpoint de transcripción incremental una vez que termina el stream.
+
+        La etapa 'extracting' incluye también la escritura de los fragmentos, que avanza en
+        paralelo; 'storing' es solo la actualización final de su payload. Si algo falla, el
+        registro queda pendiente (invisible para las búsquedas) y repetir la ingesta lo completa.
+
+        Si el registro ya está almacenado y completo (p. ej. la caché de registros expiró), la
+        extracción se hace antes de escribir los fragmentos: así, si falla, el registro anterior
+        sigue visible en lugar de quedar pendiente.
+        """
+        def notify(stage: str):
+            if on_stage:
+                on_stage(stage)
+
+        cached = await self.cached_record(audio_hash)
+        if cached is not None:
+            return cached
+
+        transcription_text = transcription_result["transcription"]
+
+        if not transcription_text or not transcription_text.strip():
+            logger.warning(f"Transcripción vacía para {filename}.")
+            return {"record_id": None, "transcription": ""}
+
+        record_id = self.record_id_for(audio_hash)
+        processing_metadata = {
+            "filename": filename,
+            "language": transcription_result["language"],
+        }
+
+        def store_chunks():
+            return asyncio.to_thread(
+                vector_db_service.store_record_chunks,
+                transcription_text, processing_metadata, record_id, transcription_result.get("segments")
+            )
+
+        notify("extracting")
+        if await asyncio.to_thread(vector_db_service.record_exists, record_id):
+            extracted_data = await extraction_service.extract_data_from_text(transcription_text)
+            points = await store_chunks()
+        else:
+            # Se espera a las dos ramas aunque una falle, para no dejar escrituras en curso.
+            extracted_data, points = await asyncio.gather(
+                extraction_service.extract_data_from_text(transcription_text),
+                store_chunks(),
+                return_exceptions=True
+            )
+            for outcome in (extracted_data, points):
+                if isinstance(outcome, BaseException):
+                    raise outcome
+
+        processing_metadata = {**processing_metadata, "processing_time_seconds": round(time.time() - start_time, 2)}
+        notify("storing")
+        await asyncio.to_thread(vector_db_service.complete_record, record_id, extracted_data, processing_metadata, points)
+        logger.info(f"Proceso completo. Registro guardado con ID: {record_id}")
+
+        result = {
+            "record_id": record_id,
+            "processing_metadata": processing_metadata,
+            "transcription": transcription_text,
+            "extracted_information": extracted_data
+        }
+        self.remember_record(audio_hash, result)
+        return {**result, "cached": False}
+
+    def remember_record(self, audio_hash: str, result: dict):
+        """
+        Guarda el resultado de la ingesta de un audio para reutilizarlo si se vuelve a subir.
+        """
+        record_cache.set(self._record_cache_key(audio_hash), result)
+
+
+# Instancia única del servicio
+ingestion_service = IngestionService()
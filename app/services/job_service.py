@@ -0,0 +1,198 @@
+# app/services/job_service.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import register_callback
+from app.services.ingestion_service import ingestion_service
+from app.services.transcription_service import TranscriptionQueueFullError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    Persistencia local (SQLite) del estado de los trabajos de ingesta.
+    Permite que los trabajos sobrevivan a un reinicio del proceso.
+    """
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    stages TEXT NOT NULL,
+                    filename TEXT,
+                    file_path TEXT,
+                    record_id TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["stages"] = json.loads(job["stages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, filename: str, file_path: str) -> dict:
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        stages = {stage: {"status": "pending"} for stage in ingestion_service.STAGES}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, stage, stages, filename, file_path, created_at, updated_at) "
+                "VALUES (?, 'queued', NULL, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(stages), filename, file_path, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        if "stages" in fields:
+            fields["stages"] = json.dumps(fields["stages"])
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim_resume(self, boot_id: str) -> bool:
+        """
+        Con varios workers, solo el primero que lo reclama en cada arranque del servidor
+        ('boot_id') reanuda los trabajos pendientes. Devuelve True para ese worker.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('resumed_boot_id', '')")
+            cursor = self._conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'resumed_boot_id' AND value != ?", (boot_id, boot_id)
+            )
+        return cursor.rowcount == 1
+
+    def list_unfinished(self) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+
+class JobService:
+    """
+    Ejecuta el pipeline de ingesta en segundo plano y registra el progreso de cada etapa.
+    """
+    TERMINAL_STATUSES = ("completed", "failed")
+
+    def __init__(self, store: JobStore, max_concurrency: int):
+        self.store = store
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Referencias a las tareas en curso para que no sean recolectadas antes de terminar.
+        self._tasks = set()
+        register_callback("elsol_jobs_active", "Trabajos de ingesta en curso o esperando turno en este proceso.",
+                          lambda: {(): len(self._tasks)})
+
+    def submit(self, file_path: str, filename: str) -> dict:
+        """
+        Registra un nuevo trabajo para un archivo ya guardado y lo programa en segundo plano.
+        """
+        job = self.store.create(filename=filename, file_path=file_path)
+        self._schedule(job["id"])
+        logger.info(f"Trabajo {job['id']} encolado para el archivo {filename}.")
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.store.get(job_id)
+
+    def _schedule(self, job_id: str):
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def resume_pending(self):
+        """
+        Reanuda los trabajos que quedaron sin terminar tras un reinicio.
+        Si el archivo de audio ya no existe, el trabajo se marca como fallido.
+        """
+        if settings.SERVER_BOOT_ID and not self.store.claim_resume(settings.SERVER_BOOT_ID):
+            logger.info("Otro worker ya reanudó los trabajos pendientes de este arranque.")
+            return
+        for job in self.store.list_unfinished():
+            if job["file_path"] and os.path.exists(job["file_path"]):
+                logger.info(f"Reanudando trabajo {job['id']}.")
+                self.store.update(job["id"], status="queued", stage=None)
+                self._schedule(job["id"])
+            else:
+                self.store.update(job["id"], status="failed", error="El archivo de audio se perdió durante el reinicio.")
+
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        stages = {stage: {"status": "pending"} for stage in ingestion_service.STAGES}
+
+        def on_stage(stage: str):
+            now = time.time()
+            for info in stages.values():
+                if info["status"] == "running":
+                    info.update(status="completed", finished_at=now)
+            stages[stage] = {"status": "running", "started_at": now}
+            self.store.update(job_id, status="running", stage=stage, stages=stages)
+
+        async with self._semaphore:
+            try:
+                while True:
+                    try:
+                        result = await ingestion_service.process(job["file_path"], job["filename"], on_stage=on_stage)
+                        break
+                    except TranscriptionQueueFullError as e:
+                        # En modo trabajo no se rechaza: se espera a que haya hueco en el pool.
+                        self.store.update(job_id, status="queued")
+                        await asyncio.sleep(e.retry_after)
+
+                now = time.time()
+                for info in stages.values():
+                    if info["status"] == "running":
+                        info.update(status="completed", finished_at=now)
+                self.store.update(
+                    job_id, status="completed", stage=None, stages=stages,
+                    record_id=result["record_id"], result=result
+                )
+                logger.info(f"Trabajo {job_id} completado. Registro: {result['record_id']}")
+            except Exception as e:
+                logger.error(f"Error en el trabajo {job_id}: {e}")
+                for info in stages.values():
+                    if info["status"] == "running":
+                        info.update(status="failed", finished_at=time.time())
+                self.store.update(job_id, status="failed", stages=stages, error=str(e))
+            # Si la tarea se cancela (apagado del servidor) el archivo se conserva para reanudarla.
+            if os.path.exists(job["file_path"]):
+                os.remove(job["file_path"])
+
+
+# Instancia única del servicio
+job_service = JobService(
+    store=JobStore(settings.JOBS_DB_PATH),
+    max_concurrency=settings.JOBS_MAX_CONCURRENCY
+)
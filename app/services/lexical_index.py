@@ -0,0 +1,119 @@
+# app/services/lexical_index.py
+import logging
+import os
+import re
+import sqlite3
+import threading
+from app.core.config import settings
+from app.services.query_planner import normalize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Palabras vacías que no aportan a la búsqueda léxica (la pregunta se normaliza sin tildes).
+STOPWORDS = {
+    "a", "al", "algun", "alguna", "algunos", "con", "cual", "cuales", "cuando", "cuantos", "de", "del",
+    "donde", "el", "ella", "ellos", "en", "es", "esta", "este", "fue", "ha", "han", "hay", "la", "las",
+    "le", "les", "lo", "los", "mas", "me", "mi", "muy", "no", "o", "para", "pero", "por", "que", "quien",
+    "quienes", "se", "si", "sin", "son", "su", "sus", "tiene", "tienen", "tuvo", "un", "una", "uno", "y", "ya",
+    "the", "of", "and", "or", "in", "on", "with", "who", "what", "which", "is", "are", "has", "have", "any",
+}
+
+# Campos extraídos que se indexan junto al texto del fragmento.
+INDEXED_FIELDS = ("patient_name", "symptoms", "preliminary_diagnosis", "observations")
+
+
+def _fields_text(extracted_data: dict) -> str:
+    values = []
+    for key in INDEXED_FIELDS:
+        value = (extracted_data or {}).get(key)
+        if isinstance(value, list):
+            values.extend(str(item) for item in value if item)
+        elif value:
+            values.append(str(value))
+    return " ".join(values)
+
+
+def build_match_query(text: str) -> str:
+    """
+    Convierte una pregunta en una consulta FTS5: sus términos significativos unidos con OR,
+    para que BM25 pondere cuántos y cuán raros son los que aparecen en cada fragmento.
+    """
+    terms = []
+    for term in re.findall(r"\w+", normalize(text)):
+        if len(term) > 1 and term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class LexicalIndex:
+    """
+    Índice léxico local (SQLite FTS5 con ranking BM25) sobre los fragmentos almacenados en Qdrant.
+
+    Complementa la búsqueda densa en las coincidencias exactas que el modelo de embeddings
+    representa mal: nombres de pacientes, fármacos y términos médicos. Cada fila es un
+    fragmento (con el mismo ID de punto que en Qdrant) junto con los campos extraídos de su
+    registro. Se mantiene de forma incremental al almacenar registros.
+    """
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                    point_id UNINDEXED,
+                    record_id UNINDEXED,
+                    text,
+                    fields,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+                """
+            )
+
+    def index_records(self, records: list):
+        """
+        Reemplaza las filas de cada registro por sus fragmentos actuales.
+
+        Args:
+            records (list): Diccionarios con 'record_id', 'extracted_data' y 'chunks'
+                (lista de pares (ID del punto, texto del fragmento)).
+        """
+        with self._lock, self._conn:
+            for record in records:
+                fields = _fields_text(record["extracted_data"])
+                self._conn.execute("DELETE FROM chunks WHERE record_id = ?", (record["record_id"],))
+                self._conn.executemany(
+                    "INSERT INTO chunks (point_id, record_id, text, fields) VALUES (?, ?, ?, ?)",
+                    [(point_id, record["record_id"], text, fields) for point_id, text in record["chunks"]]
+                )
+
+    def search(self, query: str, limit: int) -> list:
+        """
+        Returns:
+            list: IDs de punto de los fragmentos más relevantes según BM25, del mejor al peor.
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                # Las coincidencias en los campos extraídos pesan el doble que en el texto.
+                "SELECT point_id FROM chunks WHERE chunks MATCH ? "
+                "ORDER BY bm25(chunks, 0.0, 0.0, 1.0, 2.0) LIMIT ?",
+                (match_query, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+
+
+# Instancia única del índice
+lexical_index = LexicalIndex(settings.LEXICAL_INDEX_DB_PATH)
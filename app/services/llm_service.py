@@ -0,0 +1,178 @@
+# app/services/llm_service.py
+import asyncio
+import json
+import logging
+import random
+import time
+import httpx
+from app.core.config import settings
+from app.core.metrics import record_llm_request, register_callback
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Códigos HTTP que indican un error transitorio y merecen un reintento.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Limitador de tasa tipo token bucket: permite ráfagas de hasta 'capacity' peticiones
+    y, en promedio, 'rate' peticiones por segundo. Con 'rate' <= 0 no limita.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LLMService:
+    """
+    Cliente compartido para la API de Gemini durante toda la vida de la aplicación.
+
+    Reutiliza un único 'httpx.AsyncClient' (keep-alive, pool de conexiones y HTTP/2 si
+    está disponible), limita la concurrencia con un semáforo y la tasa con un token
+    bucket, y reintenta con backoff exponencial los errores 429/5xx y de red.
+    """
+    def __init__(self):
+        self.base_url = settings.GEMINI_API_BASE_URL.rstrip("/")
+        self.model = settings.GEMINI_MODEL
+        self._client = None
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        self._bucket = TokenBucket(settings.LLM_RATE_LIMIT_PER_SECOND, settings.LLM_RATE_LIMIT_BURST)
+        self._in_flight = 0
+        register_callback("elsol_llm_in_flight", "Peticiones a Gemini en curso.", lambda: {(): self._in_flight})
+        register_callback("elsol_llm_max_concurrency", "Límite de peticiones simultáneas a Gemini.",
+                          lambda: {(): settings.LLM_MAX_CONCURRENCY})
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # El cliente se crea en el primer uso para quedar ligado al event loop de la aplicación.
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=settings.LLM_HTTP2,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+                ),
+                headers={"Content-Type": "application/json", "x-goog-api-key": settings.GEMINI_API_KEY or ""}
+            )
+        return self._client
+
+    def model_url(self, method: str) -> str:
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    @staticmethod
+    def _retry_delay(attempt: int, response: httpx.Response = None) -> float:
+        """Respeta 'Retry-After' si el servidor lo indica; si no, backoff exponencial con jitter."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        delay = settings.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt)
+        return delay + random.uniform(0, delay / 2)
+
+    async def generate_content(self, payload: dict) -> dict:
+        """
+        Llama a 'generateContent' y devuelve la respuesta JSON.
+
+        Raises:
+            httpx.HTTPStatusError: Si la API responde con error tras agotar los reintentos.
+            httpx.TransportError: Si falla la conexión tras agotar los reintentos.
+        """
+        url = self.model_url("generateContent")
+        attempt = 0
+        while True:
+            await self._bucket.acquire()
+            async with self._semaphore:
+                self._in_flight += 1
+                try:
+                    response = await self._get_client().post(url, json=payload)
+                    record_llm_request("generateContent", str(response.status_code))
+                    response.raise_for_status()
+                    return response.json()
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in RETRYABLE_STATUS_CODES or attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = self._retry_delay(attempt, e.response)
+                    logger.warning(f"Gemini respondió {e.response.status_code}. Reintento {attempt + 1} en {delay:.1f} s.")
+                except httpx.TransportError as e:
+                    record_llm_request("generateContent", type(e).__name__)
+                    if attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = self._retry_delay(attempt)
+                    logger.warning(f"Error de red con Gemini ({e}). Reintento {attempt + 1} en {delay:.1f} s.")
+                finally:
+                    self._in_flight -= 1
+            # La espera ocurre fuera del semáforo para no bloquear a otras peticiones.
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream_generate_content(self, payload: dict):
+        """
+        Llama a 'streamGenerateContent' (SSE) y va entregando cada fragmento JSON de la respuesta
+        en cuanto llega. Solo se reintenta mientras no se haya recibido ningún fragmento; un
+        corte a mitad de la respuesta se propaga para no duplicar texto ya entregado.
+
+        Raises:
+            httpx.HTTPStatusError: Si la API responde con error tras agotar los reintentos.
+            httpx.TransportError: Si falla la conexión tras agotar los reintentos o durante el stream.
+        """
+        url = self.model_url("streamGenerateContent")
+        attempt = 0
+        while True:
+            await self._bucket.acquire()
+            started = False
+            async with self._semaphore:
+                self._in_flight += 1
+                try:
+                    async with self._get_client().stream("POST", url, params={"alt": "sse"}, json=payload) as response:
+                        record_llm_request("streamGenerateContent", str(response.status_code))
+                        if response.is_error:
+                            await response.aread()
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            started = True
+                            yield json.loads(line[len("data:"):].strip())
+                    return
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in RETRYABLE_STATUS_CODES or attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = self._retry_delay(attempt, e.response)
+                    logger.warning(f"Gemini respondió {e.response.status_code}. Reintento {attempt + 1} en {delay:.1f} s.")
+                except httpx.TransportError as e:
+                    record_llm_request("streamGenerateContent", type(e).__name__)
+                    if started or attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = self._retry_delay(attempt)
+                    logger.warning(f"Error de red con Gemini ({e}). Reintento {attempt + 1} en {delay:.1f} s.")
+                finally:
+                    self._in_flight -= 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Instancia única del servicio
+llm_service = LLMService()
@@ -0,0 +1,591 @@
+# app/services/local_vector_backend.py
+"""
+Índice vectorial embebido en el propio proceso (VECTOR_BACKEND=local), alternativa al servidor
+de Qdrant para desarrollo, tests y benchmarks sin Docker, o despliegues de un solo nodo.
+
+Estructura en LOCAL_INDEX_PATH:
+
+    CURRENT          nombre de la versión activa ('v1', 'v2', ...)
+    v<N>/meta.json   dimensión de los vectores
+    v<N>/vectors.f32 matriz float32 mapeada en memoria (np.memmap), una fila por fragmento,
+                     con los vectores normalizados (el producto escalar es el coseno)
+    v<N>/payloads.jsonl  registro append-only de operaciones: upsert, delete y set_payload
+
+Las filas nunca se sobrescriben: reemplazar un punto añade una fila nueva y marca la anterior
+como eliminada. Al abrir el índice se reproduce el registro; cuando las filas eliminadas superan
+LOCAL_INDEX_COMPACT_RATIO, un hilo en segundo plano lo reescribe en una versión nueva y cambia CURRENT.
+
+La búsqueda es exacta: producto escalar por bloques de LOCAL_INDEX_BLOCK_ROWS filas y top-k con
+'argpartition'. Solo puede abrirlo un proceso a la vez (no sirve para varios workers): al abrirlo
+se toma un bloqueo exclusivo (flock) sobre LOCAL_INDEX_PATH/LOCK, de modo que, p. ej., la
+ingesta masiva o la migración fallan de inmediato si la API tiene el índice abierto.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Sin fcntl (Windows) no hay bloqueo entre procesos.
+    fcntl = None
+from qdrant_client import models
+from app.core.config import settings
+from app.services.vector_backend import VectorBackend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Filas reservadas al crear el archivo de vectores; después crece duplicándose.
+INITIAL_CAPACITY = 1024
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _day(value) -> str:
+    """Fecha como 'AAAA-MM-DD' a partir de un 'date' o de una cadena RFC 3339."""
+    return value.isoformat()[:10] if hasattr(value, "isoformat") else str(value)[:10]
+
+
+class LocalVectorBackend(VectorBackend):
+    """
+    Backend de la base vectorial sobre un índice NumPy mapeado en memoria (ver el módulo).
+    """
+    def __init__(self, path: str = settings.LOCAL_INDEX_PATH, dimension: int = None):
+        super().__init__()
+        self.path = path
+        # Sin dimensión explícita se usa la del modelo de embeddings (se carga al abrir el índice).
+        self._dimension = dimension
+        self.name = f"local:{os.path.abspath(path)}"
+        # Protege el estado en memoria y las escrituras; las búsquedas solo lo toman para copiar la máscara.
+        self._lock = threading.RLock()
+        # Serializa la compactación en segundo plano con la migración y el borrado del índice.
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        self._version = None
+        self._vectors = None
+        self._log = None
+        self._lock_file = None
+        self._reset_state(0)
+
+    def _reset_state(self, capacity: int):
+        self._count = 0
+        self._ids = []
+        self._payloads = []
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._pending = np.zeros(capacity, dtype=bool)
+        self._row_of = {}
+        self._record_rows = {}
+
+    # --- Archivos y versiones ---
+
+    def _version_dir(self, version: str) -> str:
+        return os.path.join(self.path, version)
+
+    def _read_current(self):
+        try:
+            with open(os.path.join(self.path, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_current(self, version: str):
+        """Cambia la versión activa de forma atómica (rename)."""
+        temporary = os.path.join(self.path, "CURRENT.tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, os.path.join(self.path, "CURRENT"))
+
+    def _acquire_process_lock(self):
+        """Bloqueo exclusivo del índice para este proceso; falla si otro proceso lo tiene abierto."""
+        if self._lock_file is not None or fcntl is None:
+            return
+        lock_file = open(os.path.join(self.path, "LOCK"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"El índice local '{self.path}' está abierto por otro proceso (p. ej. la API). Detenlo antes "
+                f"de ejecutar la ingesta masiva o la migración, o usa Qdrant (VECTOR_BACKEND=qdrant)."
+            )
+        self._lock_file = lock_file
+
+    def _release_process_lock(self):
+        if self._lock_file is not None:
+            # Cerrar el archivo libera el flock.
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _next_version(self) -> str:
+        current = self._read_current()
+        return f"v{int(current[1:]) + 1}" if current else "v1"
+
+    @staticmethod
+    def _map_vectors(directory: str, capacity: int, dimension: int) -> np.memmap:
+        file_path = os.path.join(directory, "vectors.f32")
+        size = capacity * dimension * 4
+        with open(file_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=np.float32, mode="r+", shape=(capacity, dimension))
+
+    def _create_version(self, version: str, dimension: int):
+        directory = self._version_dir(version)
+        # Una versión sin CURRENT que la apunte es el resto de una compactación o migración interrumpida.
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dimension": dimension}, f)
+        self._map_vectors(directory, INITIAL_CAPACITY, dimension)
+        open(os.path.join(directory, "payloads.jsonl"), "w").close()
+
+    def _open(self):
+        from app.services.embedding_service import embedding_service
+
+        dimension = self._dimension or embedding_service.dimension
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            self._acquire_process_lock()
+            version = self._read_current()
+            if version is None:
+                logger.info(f"Índice vectorial local no encontrado en '{self.path}'. Creándolo...")
+                version = "v1"
+                self._create_version(version, dimension)
+                self._write_current(version)
+                self._on_collection_replaced()
+            self._load(version)
+            if self._vectors.shape[1] != dimension:
+                stored = self._vectors.shape[1]
+                self._close_files()
+                raise RuntimeError(
+                    f"El índice local tiene vectores de dimensión {stored} y el modelo de embeddings genera "
+                    f"{dimension}. Ejecuta 'python -m app.migrate_collection' para re-indexarlo."
+                )
+            self._schedule_compaction()
+            logger.info(f"Índice vectorial local '{version}' abierto: {int(self._alive[:self._count].sum())} fragmentos.")
+
+    def _load(self, version: str):
+        """Abre los archivos de una versión y reproduce su registro de operaciones."""
+        directory = self._version_dir(version)
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            dimension = json.load(f)["dimension"]
+        vectors_path = os.path.join(directory, "vectors.f32")
+        capacity = max(INITIAL_CAPACITY, os.path.getsize(vectors_path) // (dimension * 4))
+        self._close_files()
+        self._version = version
+        self._vectors = self._map_vectors(directory, capacity, dimension)
+        self._reset_state(capacity)
+
+        log_path = os.path.join(directory, "payloads.jsonl")
+        valid_bytes = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                try:
+                    operation = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    operation = None
+                if operation is None:
+                    # Última línea a medio escribir (el proceso terminó durante una escritura).
+                    logger.warning(f"Descartando una operación incompleta del registro de '{version}'.")
+                    break
+                self._apply(operation)
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(log_path):
+            with open(log_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        self._log = open(log_path, "a", encoding="utf-8")
+
+    def _close_files(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._vectors = None
+        self._version = None
+
+    # --- Estado en memoria ---
+
+    def _ensure_capacity(self, rows: int):
+        capacity = len(self._alive)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2)
+        self._vectors.flush()
+        # Las búsquedas en curso conservan el mapeo anterior, que sigue siendo válido.
+        self._vectors = self._map_vectors(self._version_dir(self._version), capacity, self._vectors.shape[1])
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        self._pending = np.concatenate([self._pending, np.zeros(capacity - len(self._pending), dtype=bool)])
+
+    def _kill(self, point_id: str):
+        row = self._row_of.pop(point_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        record_id = self._payloads[row].get("record_id", point_id)
+        rows = self._record_rows.get(record_id)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self._record_rows[record_id]
+
+    def _apply(self, operation: dict):
+        kind = operation["op"]
+        if kind == "upsert":
+            start = operation["row"]
+            self._ensure_capacity(start + len(operation["ids"]))
+            for offset, (point_id, payload) in enumerate(zip(operation["ids"], operation["payloads"])):
+                self._kill(point_id)
+                row = start + offset
+                self._ids.append(point_id)
+                self._payloads.append(payload)
+                self._alive[row] = True
+                self._pending[row] = payload.get("status") == self.PENDING_STATUS
+                self._row_of[point_id] = row
+                self._record_rows.setdefault(payload.get("record_id", point_id), set()).add(row)
+            self._count = start + len(operation["ids"])
+        elif kind == "delete":
+            for point_id in operation["ids"]:
+                self._kill(point_id)
+        elif kind == "set_payload":
+            for point_id in operation["ids"]:
+                row = self._row_of.get(point_id)
+                if row is None:
+                    continue
+                # Se reemplaza el diccionario (no se modifica): las búsquedas pueden estar devolviéndolo.
+                self._payloads[row] = {**self._payloads[row], **operation["payload"]}
+                self._pending[row] = self._payloads[row].get("status") == self.PENDING_STATUS
+
+    def _append(self, operation: dict, wait: bool):
+        self._apply(operation)
+        self._log.write(json.dumps(operation, ensure_ascii=False, default=str) + "\n")
+        self._log.flush()
+        if wait:
+            os.fsync(self._log.fileno())
+
+    def _needs_compaction(self) -> bool:
+        dead = self._count - int(self._alive[:self._count].sum())
+        return dead > 0 and dead >= self._count * settings.LOCAL_INDEX_COMPACT_RATIO
+
+    def _write_version(self, version: str, dimension: int, rows: np.ndarray, ids: list, payloads: list, read_vectors):
+        """
+        Escribe en una versión nueva (sin activarla) las filas indicadas, como un 'upsert' por
+        bloque. 'read_vectors(filas)' devuelve los vectores normalizados de cada bloque.
+        """
+        self._create_version(version, dimension)
+        directory = self._version_dir(version)
+        vectors = self._map_vectors(directory, max(INITIAL_CAPACITY, len(rows)), dimension)
+        block = settings.LOCAL_INDEX_BLOCK_ROWS
+        with open(os.path.join(directory, "payloads.jsonl"), "w", encoding="utf-8") as f:
+            for start in range(0, len(rows), block):
+                batch = rows[start:start + block]
+                vectors[start:start + len(batch)] = read_vectors(batch)
+                f.write(json.dumps({
+                    "op": "upsert",
+                    "row": start,
+                    "ids": [ids[row] for row in batch],
+                    "payloads": [payloads[row] for row in batch],
+                }, ensure_ascii=False, default=str) + "\n")
+            vectors.flush()
+            f.flush()
+            os.fsync(f.fileno())
+        del vectors
+
+    def _activate(self, source: str, target: str, keep_old: bool = False):
+        self._write_current(target)
+        self._load(target)
+        if source is not None and not keep_old:
+            shutil.rmtree(self._version_dir(source), ignore_errors=True)
+
+    def _rewrite(self, dimension: int, encode=None, keep_old: bool = False) -> str:
+        """
+        Copia las filas vivas en una versión nueva y la activa, con el lock tomado (migración).
+        Con 'encode', los vectores se regeneran a partir del texto de cada fragmento.
+        """
+        source = self._version
+        target = self._next_version()
+        rows = np.flatnonzero(self._alive[:self._count])
+        if encode is not None:
+            empty = [row for row in rows if not self.embedding_text(self._payloads[row])]
+            if empty:
+                logger.warning(f"Se omiten {len(empty)} puntos sin texto del que regenerar el embedding.")
+                rows = np.setdiff1d(rows, empty)
+
+            def read_vectors(batch):
+                texts = [self.embedding_text(self._payloads[row]) for row in batch]
+                return _normalize(np.asarray(encode(texts), dtype=np.float32))
+        else:
+            def read_vectors(batch):
+                return self._vectors[batch]
+        self._write_version(target, dimension, rows, self._ids, self._payloads, read_vectors)
+        self._activate(source, target, keep_old)
+        return target
+
+    def _schedule_compaction(self):
+        """Lanza la compactación en segundo plano si hace falta y no hay otra en curso. Se llama con el lock tomado."""
+        if self._compacting or not self._needs_compaction():
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact, name="local-index-compaction", daemon=True).start()
+
+    def _compact(self):
+        """
+        Reescribe las filas vivas en una versión nueva sin bloquear búsquedas ni escrituras: la
+        copia se hace fuera del lock a partir de una instantánea, y con el lock solo se trasladan
+        las operaciones registradas mientras tanto y se cambia CURRENT.
+        """
+        try:
+            with self._compact_lock:
+                with self._lock:
+                    source = self._version
+                    if source is None:
+                        return
+                    rows = np.flatnonzero(self._alive[:self._count])
+                    ids, payloads, vectors = self._ids, self._payloads, self._vectors
+                    log_path = os.path.join(self._version_dir(source), "payloads.jsonl")
+                    self._log.flush()
+                    position = os.path.getsize(log_path)
+                    logger.info(f"Compactando el índice local ({self._count - len(rows)} de {self._count} filas eliminadas)...")
+
+                target = self._next_version()
+                self._write_version(target, vectors.shape[1], rows, ids, payloads, lambda batch: vectors[batch])
+
+                with self._lock:
+                    if self._version != source:
+                        # El índice se eliminó o se migró mientras tanto.
+                        shutil.rmtree(self._version_dir(target), ignore_errors=True)
+                        return
+                    self._log.flush()
+                    with open(log_path, "rb") as f:
+                        f.seek(position)
+                        tail = [json.loads(line) for line in f]
+                    source_vectors = self._vectors
+                    self._load(target)
+                    try:
+                        for operation in tail:
+                            if operation["op"] == "upsert":
+                                start, count = self._count, len(operation["ids"])
+                                self._ensure_capacity(start + count)
+                                self._vectors[start:start + count] = source_vectors[operation["row"]:operation["row"] + count]
+                                operation["row"] = start
+                            self._append(operation, wait=False)
+                        self._vectors.flush()
+                        os.fsync(self._log.fileno())
+                    except Exception:
+                        # CURRENT sigue apuntando a la versión anterior, que está completa.
+                        self._load(source)
+                        raise
+                    self._activate(source, target)
+                    logger.info(f"Índice local compactado en '{target}': {self._count} filas.")
+        except Exception as e:
+            logger.error(f"Error al compactar el índice local: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    # --- Gestión del almacenamiento ---
+
+    def delete_collection(self):
+        with self._compact_lock, self._lock:
+            self._close_files()
+            self._reset_state(0)
+            self._release_process_lock()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._ready = False
+
+    def migrate_collection(self, batch_size: int = 256, keep_old: bool = False) -> str:
+        """
+        Reescribe el índice en una versión nueva y cambia CURRENT a ella. Si la dimensión de los
+        vectores ya no coincide con el modelo de embeddings, se regeneran a partir de 'chunk_text'
+        (o de la transcripción en los puntos anteriores a la fragmentación).
+        """
+        from app.services.embedding_service import embedding_service
+
+        dimension = self._dimension or embedding_service.dimension
+        with self._init_lock, self._compact_lock, self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            self._acquire_process_lock()
+            version = self._read_current()
+            if version is None:
+                self._create_version("v1", dimension)
+                self._write_current("v1")
+                target = "v1"
+            else:
+                if self._version != version:
+                    self._load(version)
+                encode = embedding_service.encode_batch if self._vectors.shape[1] != dimension else None
+                logger.info(f"Migrando el índice local '{version}'...")
+                target = self._rewrite(dimension, encode=encode, keep_old=keep_old)
+            logger.info(f"Migración completada: {int(self._alive[:self._count].sum())} fragmentos en '{target}'.")
+            self._on_collection_replaced()
+            self._close_files()
+            self._ready = False
+        self.initialize()
+        return target
+
+    # --- Escritura ---
+
+    def _ensure_open(self):
+        if not self._ready:
+            self.initialize()
+
+    def upsert(self, points: list, wait: bool = True):
+        self._ensure_open()
+        if not points:
+            return
+        vectors = _normalize(np.asarray([point.vector for point in points], dtype=np.float32))
+        with self._lock:
+            start = self._count
+            self._ensure_capacity(start + len(points))
+            # Primero los vectores y después la operación: el registro nunca apunta a filas sin escribir.
+            self._vectors[start:start + len(points)] = vectors
+            if wait:
+                self._vectors.flush()
+            self._append({
+                "op": "upsert",
+                "row": start,
+                "ids": [str(point.id) for point in points],
+                "payloads": [point.payload or {} for point in points],
+            }, wait)
+
+    def delete_records(self, record_ids: list, wait: bool = True):
+        self._ensure_open()
+        with self._lock:
+            ids = [self._ids[row] for record_id in record_ids for row in self._record_rows.get(record_id, ())]
+            if ids:
+                self._append({"op": "delete", "ids": ids}, wait)
+            # La compactación nunca corre en el camino de escritura (ver '_compact').
+            self._schedule_compaction()
+
+    def set_record_payload(self, record_id: str, payload: dict):
+        self._ensure_open()
+        with self._lock:
+            ids = [self._ids[row] for row in self._record_rows.get(record_id, ())]
+            if ids:
+                self._append({"op": "set_payload", "ids": ids, "payload": payload}, wait=True)
+
+    # --- Lectura ---
+
+    @staticmethod
+    def _matches(payload: dict, spec: dict) -> bool:
+        """Misma semántica que 'QdrantBackend.build_filter' (sin la exclusión de pendientes)."""
+        fields = payload.get("filters") or {}
+        if spec.get("min_age") is not None or spec.get("max_age") is not None:
+            age = fields.get("patient_age")
+            if not isinstance(age, (int, float)):
+                return False
+            if spec.get("min_age") is not None and age < spec["min_age"]:
+                return False
+            if spec.get("max_age") is not None and age > spec["max_age"]:
+                return False
+        symptoms = fields.get("symptoms") or []
+        if any(symptom not in symptoms for symptom in spec.get("symptoms") or []):
+            return False
+        tokens = fields.get("patient_name_tokens") or []
+        if any(token not in tokens for token in spec.get("name_tokens") or []):
+            return False
+        if spec.get("date_from") or spec.get("date_to"):
+            consultation_date = fields.get("consultation_date")
+            if not consultation_date:
+                return False
+            day = _day(consultation_date)
+            if spec.get("date_from") and day < _day(spec["date_from"]):
+                return False
+            if spec.get("date_to") and day >= _day(spec["date_to"]):
+                return False
+        return True
+
+    def _visible_mask(self, filter_spec: dict) -> np.ndarray:
+        """Filas vivas, completas y que cumplen los filtros. Se llama con el lock tomado."""
+        mask = self._alive[:self._count] & ~self._pending[:self._count]
+        if not filter_spec:
+            return mask
+        allowed = np.zeros_like(mask)
+        # Todos los fragmentos de un registro comparten los filtros: se evalúan una vez por registro.
+        for rows in self._record_rows.values():
+            row = next(iter(rows))
+            if self._matches(self._payloads[row], filter_spec):
+                allowed[list(rows)] = True
+        return mask & allowed
+
+    def _record(self, row: int) -> models.Record:
+        return models.Record(id=self._ids[row], payload=self._payloads[row])
+
+    def search(self, query_vector: list, limit: int, filter_spec: dict) -> list:
+        self._ensure_open()
+        with self._lock:
+            # Una compactación crea listas y un mapeo nuevos: la búsqueda sigue con los que copia aquí.
+            vectors, ids, payloads = self._vectors, self._ids, self._payloads
+            mask = self._visible_mask(filter_spec)
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        block = settings.LOCAL_INDEX_BLOCK_ROWS
+        for start in range(0, len(mask), block):
+            rows = start + np.flatnonzero(mask[start:start + block])
+            if rows.size == 0:
+                continue
+            if rows.size == min(block, len(mask) - start):
+                scores = vectors[start:start + rows.size] @ query
+            else:
+                scores = vectors[rows] @ query
+            scores = np.concatenate([best_scores, scores])
+            rows = np.concatenate([best_rows, rows])
+            if len(scores) > limit:
+                top = np.argpartition(-scores, limit - 1)[:limit]
+                scores, rows = scores[top], rows[top]
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, kind="stable")
+        return [
+            models.ScoredPoint(id=ids[best_rows[i]], version=0, score=float(best_scores[i]), payload=payloads[best_rows[i]])
+            for i in order
+        ]
+
+    async def asearch(self, query_vector: list, limit: int, filter_spec: dict) -> list:
+        return await asyncio.to_thread(self.search, query_vector, limit, filter_spec)
+
+    def record_exists(self, record_id: str) -> bool:
+        self._ensure_open()
+        with self._lock:
+            return any(not self._pending[row] for row in self._record_rows.get(record_id, ()))
+
+    def get_points(self, point_ids: list, filter_spec: dict) -> list:
+        self._ensure_open()
+        with self._lock:
+            mask = self._visible_mask(filter_spec)
+            rows = [self._row_of.get(str(point_id)) for point_id in point_ids]
+            return [self._record(row) for row in rows if row is not None and mask[row]]
+
+    async def aget_points(self, point_ids: list, filter_spec: dict) -> list:
+        return await asyncio.to_thread(self.get_points, point_ids, filter_spec)
+
+    def find_first_chunks(self, filter_spec: dict, limit: int, offset: str = None) -> tuple:
+        self._ensure_open()
+        with self._lock:
+            mask = self._visible_mask(filter_spec)
+            # Orden estable por ID, como el 'scroll' de Qdrant; 'offset' es el primer ID de la página siguiente.
+            ids = sorted(
+                self._ids[row] for row in np.flatnonzero(mask)
+                if self._payloads[row].get("chunk_index", 0) == 0 and (offset is None or self._ids[row] >= offset)
+            )
+            page = [self._record(self._row_of[point_id]) for point_id in ids[:limit]]
+        return page, (ids[limit] if len(ids) > limit else None)
+
+    def iter_points(self, batch_size: int = 512):
+        self._ensure_open()
+        with self._lock:
+            ids = [self._ids[row] for row in np.flatnonzero(self._alive[:self._count])]
+        for start in range(0, len(ids), batch_size):
+            with self._lock:
+                rows = [self._row_of.get(point_id) for point_id in ids[start:start + batch_size]]
+                batch = [self._record(row) for row in rows if row is not None]
+            if batch:
+                yield batch
@@ -0,0 +1,152 @@
+# app/services/model_client.py
+"""
+Cliente del servidor de modelos ('app/services/model_server.py').
+
+Con varios workers de la API ('python -m app.server' con API_WORKERS > 1), Whisper, el
+modelo de embeddings y el cross-encoder viven en un único proceso y los workers usan estos
+sustitutos, que exponen la misma interfaz que los modelos reales ('transcribe', 'encode',
+'predict') y envían cada llamada por un socket Unix local. Los servicios siguen haciendo en
+el worker todo lo demás (decodificación del audio, cachés, micro-batching, VAD).
+"""
+import logging
+import queue
+import threading
+from multiprocessing.connection import Client
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ModelServerError(RuntimeError):
+    """
+    Error devuelto por el servidor de modelos al ejecutar una llamada.
+    """
+
+
+class ModelClient:
+    """
+    Pool de conexiones con el servidor de modelos. Cada llamada usa una conexión propia,
+    de modo que varios hilos pueden invocar los modelos a la vez.
+    """
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self._authkey = authkey
+        self._idle = queue.LifoQueue()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return Client(self.address, family="AF_UNIX", authkey=self._authkey)
+
+    def _release(self, conn):
+        self._idle.put(conn)
+
+    def _request(self, method: str, args: tuple):
+        """Envía una petición y devuelve (conexión, primera respuesta). Si falla la conexión, se descarta."""
+        conn = self._acquire()
+        try:
+            conn.send((method, args))
+            return conn, conn.recv()
+        except BaseException:
+            conn.close()
+            raise
+
+    def call(self, method: str, *args):
+        conn, (kind, value) = self._request(method, args)
+        self._release(conn)
+        if kind == "error":
+            raise ModelServerError(value)
+        return value
+
+    def stream(self, method: str, *args) -> tuple:
+        """
+        Llamada cuya respuesta es una cabecera seguida de elementos (p. ej. la información de
+        una transcripción y sus segmentos).
+
+        Returns:
+            tuple: (cabecera, generador de elementos). La conexión solo vuelve al pool si el
+                generador se consume entero; si se abandona a medias, se cierra.
+        """
+        conn, (kind, header) = self._request(method, args)
+        if kind == "error":
+            self._release(conn)
+            raise ModelServerError(header)
+
+        def items():
+            finished = False
+            try:
+                while True:
+                    kind, value = conn.recv()
+                    if kind == "item":
+                        yield value
+                        continue
+                    finished = True
+                    if kind == "error":
+                        raise ModelServerError(value)
+                    return
+            finally:
+                if finished:
+                    self._release(conn)
+                else:
+                    conn.close()
+
+        return header, items()
+
+
+class RemoteWhisperModel:
+    """Sustituto de 'faster_whisper.WhisperModel': los segmentos llegan a medida que se decodifican."""
+    def __init__(self, client: ModelClient):
+        self._client = client
+
+    def transcribe(self, audio, **kwargs) -> tuple:
+        info, segments = self._client.stream("whisper.transcribe", audio, kwargs)
+        return segments, info
+
+
+class RemoteSentenceTransformer:
+    """Sustituto de 'SentenceTransformer' para 'encode' y la dimensión de los vectores."""
+    def __init__(self, client: ModelClient):
+        self._client = client
+        self._dimension = None
+
+    def encode(self, texts, batch_size: int = 32):
+        return self._client.call("embeddings.encode", texts, batch_size)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self._client.call("embeddings.dimension")
+        return self._dimension
+
+
+class RemoteCrossEncoder:
+    """Sustituto de 'CrossEncoder' para 'predict'."""
+    def __init__(self, client: ModelClient):
+        self._client = client
+
+    def predict(self, pairs: list):
+        return self._client.call("reranker.predict", pairs)
+
+
+REMOTE_MODELS = {
+    "whisper": RemoteWhisperModel,
+    "embeddings": RemoteSentenceTransformer,
+    "reranker": RemoteCrossEncoder,
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def remote_model(component: str):
+    """
+    Pide al servidor de modelos que cargue 'component' (espera a que termine) y devuelve su sustituto.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ModelClient(settings.MODEL_SERVER_ADDRESS, bytes.fromhex(settings.MODEL_SERVER_AUTHKEY))
+    logger.info(f"Usando el modelo '{component}' del servidor de modelos en {settings.MODEL_SERVER_ADDRESS}.")
+    _client.call("load", component)
+    return REMOTE_MODELS[component](_client)
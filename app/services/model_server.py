@@ -0,0 +1,120 @@
+# app/services/model_server.py
+"""
+Servidor de modelos: un único proceso con Whisper, el modelo de embeddings y el cross-encoder
+al que los workers de la API se conectan por un socket Unix (ver 'app/services/model_client.py').
+
+Así, N workers aprovechan N núcleos para HTTP, decodificación de audio, búsquedas y llamadas
+a Gemini sin cargar N copias de los modelos. Lo lanza 'python -m app.server' cuando API_WORKERS > 1.
+"""
+import logging
+import os
+import threading
+from multiprocessing.connection import Listener
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _services():
+    # Importación diferida: el proceso padre importa este módulo sin cargar torch ni CTranslate2.
+    from app.services.whisper_service import whisper_service
+    from app.services.embedding_service import embedding_service
+    from app.services.rerank_service import rerank_service
+    return whisper_service, embedding_service, rerank_service
+
+
+def _loaders() -> dict:
+    whisper_service, embedding_service, rerank_service = _services()
+    return {"whisper": whisper_service.load, "embeddings": embedding_service.load, "reranker": rerank_service.load}
+
+
+def _handlers() -> dict:
+    """Llamadas con una sola respuesta: método -> función."""
+    whisper_service, embedding_service, rerank_service = _services()
+    loaders = _loaders()
+    return {
+        "load": lambda component: loaders[component](),
+        "embeddings.encode": lambda texts, batch_size: embedding_service.model.encode(texts, batch_size=batch_size),
+        "embeddings.dimension": lambda: embedding_service.dimension,
+        "reranker.predict": lambda pairs: rerank_service.model.predict(pairs),
+    }
+
+
+def _transcribe(conn, audio, kwargs: dict):
+    """Envía la información de la transcripción y, después, cada segmento en cuanto se decodifica."""
+    whisper_service, _, _ = _services()
+    segments, info = whisper_service.model.transcribe(audio, **kwargs)
+    conn.send(("ok", info))
+    try:
+        for segment in segments:
+            conn.send(("item", segment))
+    except (OSError, EOFError):
+        # El worker cerró la conexión: se propaga para terminar el hilo.
+        raise
+    except Exception as e:
+        # Error al decodificar: se notifica al worker y la conexión sigue siendo válida.
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("end", None))
+
+
+def _serve_connection(conn, handlers: dict):
+    """Atiende las peticiones de una conexión (un hilo por conexión) hasta que el worker la cierra."""
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (OSError, EOFError):
+                return
+            try:
+                if method == "whisper.transcribe":
+                    _transcribe(conn, *args)
+                else:
+                    conn.send(("ok", handlers[method](*args)))
+            except (OSError, EOFError):
+                return
+            except Exception as e:
+                logger.error(f"Error en la llamada '{method}' al servidor de modelos: {e}")
+                try:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+                except (OSError, EOFError):
+                    return
+
+
+def _warm_up(components: list):
+    def load(component: str):
+        try:
+            _loaders()[component]()
+        except Exception as e:
+            # Los workers vuelven a pedir la carga desde su propio calentamiento.
+            logger.error(f"Error al cargar '{component}' en el servidor de modelos: {e}")
+
+    for component in components:
+        threading.Thread(target=load, args=(component,), name=f"warmup-{component}", daemon=True).start()
+
+
+def serve(address: str, authkey: bytes):
+    """
+    Punto de entrada del proceso del servidor de modelos. Escucha en 'address' (socket Unix)
+    y, si STARTUP_WARMUP está activo, empieza a cargar los modelos de inmediato.
+    """
+    from app.core.config import settings
+
+    # Este proceso carga los modelos reales aunque herede la dirección del servidor.
+    settings.MODEL_SERVER_ADDRESS = ""
+    if os.path.exists(address):
+        os.remove(address)
+    handlers = _handlers()
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        os.chmod(address, 0o600)
+        logger.info(f"Servidor de modelos escuchando en {address} (pid {os.getpid()}).")
+        if settings.STARTUP_WARMUP:
+            _warm_up(["whisper", "embeddings"] + (["reranker"] if settings.RERANK_ENABLED else []))
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Autenticación fallida o conexión abortada: no debe tumbar el servidor.
+                logger.warning(f"Conexión rechazada por el servidor de modelos: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, handlers), name="model-server-conn", daemon=True).start()
@@ -0,0 +1,450 @@
+# app/services/qdrant_backend.py
+import asyncio
+import logging
+import re
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+from app.core.config import settings
+from app.services.embedding_service import embedding_service
+from app.services.vector_backend import VectorBackend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class _LocalAsyncClient:
+    """
+    Adaptador asíncrono sobre el cliente embebido de Qdrant. Un 'AsyncQdrantClient' local
+    tendría su propio almacenamiento, así que las búsquedas se delegan en el cliente
+    síncrono, ejecutado en un hilo para no bloquear el event loop.
+    """
+    def __init__(self, client: QdrantClient):
+        self._client = client
+
+    async def query_points(self, **kwargs):
+        return await asyncio.to_thread(self._client.query_points, **kwargs)
+
+    async def scroll(self, **kwargs):
+        return await asyncio.to_thread(self._client.scroll, **kwargs)
+
+    async def close(self):
+        pass
+
+
+class QdrantBackend(VectorBackend):
+    """
+    Backend de la base vectorial sobre Qdrant: un servidor (el servicio 'qdrant' de
+    docker-compose.yml) o Qdrant embebido si QDRANT_LOCATION está definido.
+
+    La aplicación trabaja con un alias (QDRANT_COLLECTION) que apunta a una colección
+    versionada, creada con la cuantización, el HNSW y el almacenamiento en disco de QDRANT_*.
+    """
+    def __init__(self, host=settings.QDRANT_HOST, port=settings.QDRANT_PORT):
+        super().__init__()
+        self._host = host
+        self._port = port
+        self._client = None
+        # Cliente asíncrono para las búsquedas del chat, creado en el primer uso (dentro del event loop).
+        self._async_client = None
+        # Alias de la colección: las operaciones se resuelven en la colección versionada a la que apunta.
+        self.collection_name = settings.QDRANT_COLLECTION
+        self.name = self.collection_name
+
+    @property
+    def client(self) -> QdrantClient:
+        if not self._ready:
+            self.initialize()
+        return self._client
+
+    def _connect(self):
+        if self._client is None:
+            if settings.QDRANT_LOCATION:
+                logger.info(f"Usando Qdrant embebido en '{settings.QDRANT_LOCATION}'...")
+                self._client = (QdrantClient(location=":memory:") if settings.QDRANT_LOCATION == ":memory:"
+                                else QdrantClient(path=settings.QDRANT_LOCATION))
+            else:
+                logger.info(f"Inicializando conexión con Qdrant en {self._host}:{self._port}...")
+                # El cliente se conecta al servicio 'qdrant' definido en docker-compose.yml
+                self._client = QdrantClient(host=self._host, port=self._port)
+
+    @staticmethod
+    def quantization_config(kind: str):
+        """Configuración de cuantización para 'int8' (escalar), 'binary' o 'none' (None)."""
+        if kind == "int8":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=settings.QDRANT_QUANTIZATION_QUANTILE, always_ram=True
+            ))
+        if kind == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        if kind == "none":
+            return None
+        raise ValueError(f"Cuantización no soportada: '{kind}' (usa 'int8', 'binary' o 'none').")
+
+    @staticmethod
+    def _quantization_kind(config) -> str:
+        if isinstance(config, models.ScalarQuantization):
+            return "int8"
+        if isinstance(config, models.BinaryQuantization):
+            return "binary"
+        return "none"
+
+    @classmethod
+    def collection_params(cls, dimension: int, quantization: str = None) -> dict:
+        """
+        Parámetros de creación de una colección según la configuración QDRANT_*: vectores
+        (originales en disco si QDRANT_VECTORS_ON_DISK), HNSW, cuantización y payload en disco.
+        """
+        return {
+            "vectors_config": models.VectorParams(
+                size=dimension,
+                distance=models.Distance.COSINE, # Coseno es bueno para similitud de texto
+                on_disk=settings.QDRANT_VECTORS_ON_DISK
+            ),
+            "hnsw_config": models.HnswConfigDiff(m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT),
+            "quantization_config": cls.quantization_config(quantization or settings.QDRANT_QUANTIZATION),
+            "on_disk_payload": settings.QDRANT_PAYLOAD_ON_DISK,
+        }
+
+    @classmethod
+    def query_search_params(cls, quantization: str = None, hnsw_ef: int = None, rescore: bool = None):
+        """Parámetros de búsqueda: 'ef' del HNSW y, con cuantización, sobremuestreo y reordenación."""
+        quantization_params = None
+        if (quantization or settings.QDRANT_QUANTIZATION) != "none":
+            quantization_params = models.QuantizationSearchParams(
+                rescore=settings.QDRANT_SEARCH_RESCORE if rescore is None else rescore,
+                oversampling=settings.QDRANT_SEARCH_OVERSAMPLING
+            )
+        return models.SearchParams(hnsw_ef=hnsw_ef or settings.QDRANT_SEARCH_EF, quantization=quantization_params)
+
+    def _versioned_name(self, version: int) -> str:
+        return f"{self.collection_name}_v{version}"
+
+    def _collection_version_number(self, name: str) -> int:
+        """Versión de una colección física ('<alias>_v<N>'); 0 para una colección anterior a los alias."""
+        match = re.fullmatch(re.escape(self.collection_name) + r"_v(\d+)", name)
+        return int(match.group(1)) if match else 0
+
+    def _versioned_collections(self) -> list:
+        """Colecciones versionadas de este alias, de la más antigua a la más reciente."""
+        names = [collection.name for collection in self._client.get_collections().collections]
+        return sorted((name for name in names if self._collection_version_number(name) > 0), key=self._collection_version_number)
+
+    def resolve_collection(self):
+        """
+        Nombre de la colección física a la que apunta el alias, el propio nombre si es una
+        colección anterior a los alias, o None si no existe.
+        """
+        for alias in self._client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return self.collection_name if self._client.collection_exists(self.collection_name) else None
+
+    def _create_physical_collection(self, name: str, dimension: int):
+        # Una colección versionada sin alias es el resto de una creación o migración interrumpida.
+        if self._client.collection_exists(name):
+            self._client.delete_collection(name)
+        self._client.create_collection(collection_name=name, **self.collection_params(dimension))
+
+    def _point_alias(self, name: str):
+        """Apunta el alias a 'name'. Ambas operaciones se aplican de forma atómica en Qdrant."""
+        operations = [models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=name, alias_name=self.collection_name)
+        )]
+        if any(alias.alias_name == self.collection_name for alias in self._client.get_aliases().aliases):
+            operations.insert(0, models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=self.collection_name)
+            ))
+        self._client.update_collection_aliases(change_aliases_operations=operations)
+
+    def _open(self):
+        self._connect()
+        self._create_collection()
+
+    def _create_collection(self):
+        try:
+            physical_name = self.resolve_collection()
+            orphans = self._versioned_collections() if physical_name is None else []
+            if orphans:
+                # Migración interrumpida tras copiar los puntos y antes de crear el alias.
+                physical_name = orphans[-1]
+                logger.warning(f"El alias '{self.collection_name}' no existe; se apunta a '{physical_name}'.")
+                self._point_alias(physical_name)
+                self._sync_collection_config(physical_name)
+            elif physical_name is None:
+                logger.info(f"Colección '{self.collection_name}' no encontrada. Creándola...")
+                physical_name = self._versioned_name(1)
+                self._create_physical_collection(physical_name, embedding_service.dimension)
+                self._point_alias(physical_name)
+                logger.info(f"Colección '{physical_name}' creada exitosamente con el alias '{self.collection_name}'.")
+                self._on_collection_replaced()
+            else:
+                logger.info(f"Colección '{self.collection_name}' ya existe ('{physical_name}').")
+                self._sync_collection_config(physical_name)
+            self._ensure_payload_indexes()
+        except Exception as e:
+            logger.error(f"Error al verificar/crear la colección en Qdrant: {e}")
+            raise
+
+    def _sync_collection_config(self, physical_name: str):
+        """
+        Comprueba que la dimensión de los vectores coincide con el modelo de embeddings y aplica
+        en caliente los cambios de HNSW, cuantización y almacenamiento en disco. Qdrant reconstruye
+        los segmentos en segundo plano y la colección sigue atendiendo búsquedas mientras tanto.
+        """
+        config = self._client.get_collection(physical_name).config
+        vectors = config.params.vectors
+        dimension = embedding_service.dimension
+        if vectors.size != dimension:
+            raise RuntimeError(
+                f"La colección '{physical_name}' tiene vectores de dimensión {vectors.size} y el modelo de "
+                f"embeddings genera {dimension}. Ejecuta 'python -m app.migrate_collection' para re-indexarla."
+            )
+        if settings.QDRANT_LOCATION:
+            # Qdrant embebido hace búsqueda exacta: el HNSW y la cuantización no se aplican.
+            return
+
+        changes = {}
+        hnsw = config.hnsw_config
+        if (hnsw.m, hnsw.ef_construct) != (settings.QDRANT_HNSW_M, settings.QDRANT_HNSW_EF_CONSTRUCT):
+            changes["hnsw_config"] = models.HnswConfigDiff(m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT)
+        if self._quantization_kind(config.quantization_config) != settings.QDRANT_QUANTIZATION:
+            changes["quantization_config"] = self.quantization_config(settings.QDRANT_QUANTIZATION) or models.Disabled.DISABLED
+        if bool(vectors.on_disk) != settings.QDRANT_VECTORS_ON_DISK:
+            changes["vectors_config"] = {"": models.VectorParamsDiff(on_disk=settings.QDRANT_VECTORS_ON_DISK)}
+        if bool(config.params.on_disk_payload) != settings.QDRANT_PAYLOAD_ON_DISK:
+            changes["collection_params"] = models.CollectionParamsDiff(on_disk_payload=settings.QDRANT_PAYLOAD_ON_DISK)
+        if changes:
+            logger.info(f"Actualizando la configuración de la colección '{physical_name}': {', '.join(changes)}.")
+            self._client.update_collection(collection_name=physical_name, **changes)
+
+    def migrate_collection(self, batch_size: int = 256, keep_old: bool = False) -> str:
+        """
+        Copia los puntos de la colección actual en una nueva colección versionada, creada con la
+        configuración actual, y cambia el alias a ella. Si la dimensión de los vectores ya no
+        coincide con el modelo de embeddings, los vectores se regeneran a partir de 'chunk_text'
+        (o de la transcripción en los puntos anteriores a la fragmentación); los puntos sin
+        ningún texto se omiten.
+
+        Las escrituras que lleguen durante la copia no se trasladan: conviene ejecutarla con la
+        ingesta detenida. Las búsquedas siguen usando la colección anterior hasta el cambio de alias.
+
+        Returns:
+            str: El nombre de la nueva colección.
+        """
+        with self._init_lock:
+            self._connect()
+            source = self.resolve_collection()
+            target = self._versioned_name(self._collection_version_number(source) + 1 if source else 1)
+            dimension = embedding_service.dimension
+            self._create_physical_collection(target, dimension)
+            logger.info(f"Migrando '{source}' a '{target}'...")
+
+            copied = 0
+            skipped = 0
+            offset = None
+            while source is not None:
+                points, offset = self._client.scroll(
+                    collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+                )
+                vectors = [point.vector for point in points]
+                if points and len(vectors[0]) != dimension:
+                    texts = [self.embedding_text(point.payload or {}) for point in points]
+                    empty = [point.id for point, text in zip(points, texts) if not text]
+                    if empty:
+                        logger.warning(f"Se omiten {len(empty)} puntos sin texto del que regenerar el embedding: {empty[:5]}")
+                        skipped += len(empty)
+                    points = [point for point, text in zip(points, texts) if text]
+                    vectors = embedding_service.encode_batch([text for text in texts if text]) if points else []
+                if points:
+                    self._client.upsert(
+                        collection_name=target,
+                        points=[
+                            models.PointStruct(id=point.id, vector=vector, payload=point.payload)
+                            for point, vector in zip(points, vectors)
+                        ],
+                        wait=True
+                    )
+                    copied += len(points)
+                if offset is None:
+                    break
+
+            expected = self._client.count(collection_name=source, exact=True).count if source else 0
+            if copied + skipped != expected:
+                raise RuntimeError(f"La migración copió {copied} puntos (y omitió {skipped}) de {expected}; el alias no se ha cambiado.")
+
+            if source == self.collection_name:
+                # Colección anterior a los alias: el alias no puede coexistir con una colección del mismo nombre.
+                self._client.delete_collection(source)
+            self._point_alias(target)
+            if source not in (None, self.collection_name) and not keep_old:
+                self._client.delete_collection(source)
+            logger.info(f"Migración completada: {copied} puntos en '{target}'.")
+            self._on_collection_replaced()
+            self._ready = False
+        self.initialize()
+        return target
+
+    def delete_collection(self):
+        """Elimina la colección y su alias (p. ej. para empezar de cero en los benchmarks)."""
+        physical_name = self.resolve_collection() if self._client is not None else None
+        if physical_name is None:
+            return
+        if physical_name != self.collection_name:
+            self._client.update_collection_aliases(change_aliases_operations=[
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.collection_name))
+            ])
+        self._client.delete_collection(physical_name)
+        self._ready = False
+
+    def _get_async_client(self) -> AsyncQdrantClient:
+        if self._async_client is None and settings.QDRANT_LOCATION:
+            self._async_client = _LocalAsyncClient(self.client)
+        elif self._async_client is None:
+            self._async_client = AsyncQdrantClient(
+                host=self._host,
+                port=self._port,
+                grpc_port=settings.QDRANT_GRPC_PORT,
+                prefer_grpc=settings.QDRANT_PREFER_GRPC
+            )
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    # Índices de payload: 'record_id' enlaza cada fragmento con su registro; los campos
+    # 'filters.*' son la versión normalizada de los datos extraídos para búsquedas filtradas.
+    PAYLOAD_INDEXES = {
+        "record_id": models.PayloadSchemaType.KEYWORD,
+        "chunk_index": models.PayloadSchemaType.INTEGER,
+        "filters.patient_name": models.PayloadSchemaType.KEYWORD,
+        "filters.patient_name_tokens": models.PayloadSchemaType.KEYWORD,
+        "filters.symptoms": models.PayloadSchemaType.KEYWORD,
+        "filters.patient_age": models.PayloadSchemaType.INTEGER,
+        "filters.consultation_date": models.PayloadSchemaType.DATETIME,
+        "status": models.PayloadSchemaType.KEYWORD,
+    }
+
+    def _ensure_payload_indexes(self):
+        """
+        Crea los índices de payload necesarios (la operación es idempotente en Qdrant).
+        Con ellos, las búsquedas filtradas usan el índice HNSW filtrado en lugar de recorrer la colección.
+        """
+        for field_name, field_schema in self.PAYLOAD_INDEXES.items():
+            self._client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+
+    @classmethod
+    def _pending_condition(cls) -> models.FieldCondition:
+        return models.FieldCondition(key="status", match=models.MatchValue(value=cls.PENDING_STATUS))
+
+    @classmethod
+    def build_filter(cls, spec: dict) -> models.Filter:
+        """
+        Convierte una especificación de filtros (ver 'query_planner.plan_query') en un filtro de Qdrant.
+        Siempre excluye los registros a medio ingerir, para que ninguna búsqueda los vea sin sus datos extraídos.
+        """
+        conditions = []
+        if spec.get("min_age") is not None or spec.get("max_age") is not None:
+            conditions.append(models.FieldCondition(
+                key="filters.patient_age", range=models.Range(gte=spec.get("min_age"), lte=spec.get("max_age"))
+            ))
+        for symptom in spec.get("symptoms") or []:
+            conditions.append(models.FieldCondition(key="filters.symptoms", match=models.MatchValue(value=symptom)))
+        for token in spec.get("name_tokens") or []:
+            conditions.append(models.FieldCondition(key="filters.patient_name_tokens", match=models.MatchValue(value=token)))
+        if spec.get("date_from") or spec.get("date_to"):
+            conditions.append(models.FieldCondition(
+                key="filters.consultation_date",
+                range=models.DatetimeRange(gte=spec.get("date_from"), lt=spec.get("date_to"))
+            ))
+        return models.Filter(must=conditions or None, must_not=[cls._pending_condition()])
+
+    @staticmethod
+    def _record_filter(record_id: str) -> models.Filter:
+        return models.Filter(must=[models.FieldCondition(key="record_id", match=models.MatchValue(value=record_id))])
+
+    def upsert(self, points: list, wait: bool = True):
+        self.client.upsert(collection_name=self.collection_name, points=points, wait=wait)
+
+    def delete_records(self, record_ids: list, wait: bool = True):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(
+                must=[models.FieldCondition(key="record_id", match=models.MatchAny(any=record_ids))]
+            )),
+            wait=wait
+        )
+
+    def set_record_payload(self, record_id: str, payload: dict):
+        self.client.set_payload(
+            collection_name=self.collection_name, payload=payload, points=self._record_filter(record_id), wait=True
+        )
+
+    def record_exists(self, record_id: str) -> bool:
+        count_filter = self._record_filter(record_id)
+        count_filter.must_not = [self._pending_condition()]
+        result = self.client.count(collection_name=self.collection_name, count_filter=count_filter, exact=True)
+        return result.count > 0
+
+    def _query_params(self, query_vector: list, limit: int, filter_spec: dict) -> dict:
+        return {
+            "collection_name": self.collection_name,
+            "query": query_vector,
+            "query_filter": self.build_filter(filter_spec or {}),
+            "limit": limit,
+            "with_payload": True, # ¡Muy importante para obtener los datos!
+            # Qdrant embebido hace búsqueda exacta y avisaría de que ignora estos parámetros.
+            "search_params": None if settings.QDRANT_LOCATION else self.query_search_params()
+        }
+
+    def search(self, query_vector: list, limit: int, filter_spec: dict) -> list:
+        return self.client.query_points(**self._query_params(query_vector, limit, filter_spec)).points
+
+    async def asearch(self, query_vector: list, limit: int, filter_spec: dict) -> list:
+        """Búsqueda con el cliente asíncrono (gRPC)."""
+        params = self._query_params(query_vector, limit, filter_spec)
+        response = await self._get_async_client().query_points(**params)
+        return response.points
+
+    async def aget_points(self, point_ids: list, filter_spec: dict) -> list:
+        query_filter = self.build_filter(filter_spec or {})
+        query_filter.must = [*(query_filter.must or []), models.HasIdCondition(has_id=point_ids)]
+        points, _ = await self._get_async_client().scroll(
+            collection_name=self.collection_name,
+            scroll_filter=query_filter,
+            limit=len(point_ids),
+            with_payload=True,
+            with_vectors=False
+        )
+        return points
+
+    def find_first_chunks(self, filter_spec: dict, limit: int, offset: str = None) -> tuple:
+        query_filter = self.build_filter(filter_spec or {})
+        query_filter.must = [
+            *(query_filter.must or []),
+            models.FieldCondition(key="chunk_index", match=models.MatchValue(value=0))
+        ]
+        points, next_offset = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=query_filter,
+            limit=limit,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False
+        )
+        return points, (str(next_offset) if next_offset is not None else None)
+
+    def iter_points(self, batch_size: int = 512):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=False
+            )
+            if points:
+                yield points
+            if offset is None:
+                return
@@ -0,0 +1,201 @@
+# app/services/query_planner.py
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import Optional
+
+# Vocabulario de síntomas: término canónico -> expresiones equivalentes (español e inglés).
+# Se usa tanto al almacenar (para normalizar los síntomas extraídos) como al consultar.
+SYMPTOM_VOCABULARY = {
+    "fiebre": ["fiebre", "calentura", "temperatura alta", "febril", "fever"],
+    "tos": ["tos", "cough"],
+    "dolor de cabeza": ["dolor de cabeza", "cefalea", "migrana", "jaqueca", "headache", "migraine"],
+    "dolor de garganta": ["dolor de garganta", "odinofagia", "sore throat"],
+    "dolor abdominal": ["dolor abdominal", "dolor de estomago", "dolor de barriga", "abdominal pain", "stomach ache"],
+    "dolor de pecho": ["dolor de pecho", "dolor toracico", "chest pain"],
+    "dolor muscular": ["dolor muscular", "mialgia", "dolor de cuerpo", "muscle pain", "body ache"],
+    "dificultad para respirar": ["dificultad para respirar", "falta de aire", "disnea", "ahogo", "shortness of breath"],
+    "nauseas": ["nauseas", "nausea", "ganas de vomitar"],
+    "vomito": ["vomito", "vomitos", "vomitar", "vomiting"],
+    "diarrea": ["diarrea", "diarrhea"],
+    "mareo": ["mareo", "mareos", "vertigo", "dizziness"],
+    "cansancio": ["cansancio", "fatiga", "agotamiento", "debilidad", "fatigue", "tiredness", "weakness"],
+    "congestion nasal": ["congestion nasal", "nariz tapada", "mocos", "rinorrea", "nasal congestion", "runny nose"],
+    "escalofrios": ["escalofrios", "chills"],
+    "perdida de apetito": ["perdida de apetito", "falta de apetito", "inapetencia", "loss of appetite"],
+    "erupcion": ["erupcion", "sarpullido", "ronchas", "rash"],
+    "dolor de espalda": ["dolor de espalda", "lumbalgia", "back pain"],
+}
+
+MONTHS = {
+    "enero": 1, "january": 1, "febrero": 2, "february": 2, "marzo": 3, "march": 3,
+    "abril": 4, "april": 4, "mayo": 5, "may": 5, "junio": 6, "june": 6,
+    "julio": 7, "july": 7, "agosto": 8, "august": 8, "septiembre": 9, "setiembre": 9,
+    "september": 9, "octubre": 10, "october": 10, "noviembre": 11, "november": 11,
+    "diciembre": 12, "december": 12,
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.lower().split())
+
+
+def _contains_term(normalized_text: str, term: str) -> bool:
+    return re.search(rf"\b{re.escape(term)}\b", normalized_text) is not None
+
+
+def canonical_symptoms(text: str) -> list:
+    """Términos canónicos del vocabulario de síntomas mencionados en un texto."""
+    normalized_text = normalize(text)
+    return [
+        canonical for canonical, synonyms in SYMPTOM_VOCABULARY.items()
+        if any(_contains_term(normalized_text, synonym) for synonym in synonyms)
+    ]
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def build_filter_fields(extracted_data: dict) -> dict:
+    """
+    Versión normalizada e indexable de los datos extraídos, guardada en el payload bajo 'filters'.
+
+    - patient_name / patient_name_tokens: nombre completo y sus palabras, sin tildes.
+    - patient_age: edad como entero.
+    - consultation_date: fecha en formato RFC 3339.
+    - symptoms: síntomas tal cual (normalizados) más sus términos canónicos del vocabulario.
+    """
+    extracted_data = extracted_data or {}
+    fields = {}
+
+    name = normalize(extracted_data.get("patient_name") or "")
+    if name:
+        fields["patient_name"] = name
+        fields["patient_name_tokens"] = name.split()
+
+    age = extracted_data.get("patient_age")
+    if isinstance(age, (int, float)) and not isinstance(age, bool):
+        fields["patient_age"] = int(round(age))
+
+    consultation_date = _parse_date(extracted_data.get("consultation_date"))
+    if consultation_date:
+        fields["consultation_date"] = f"{consultation_date.isoformat()}T00:00:00Z"
+
+    symptoms = set()
+    for symptom in extracted_data.get("symptoms") or []:
+        if isinstance(symptom, str) and symptom.strip():
+            symptoms.add(normalize(symptom))
+            symptoms.update(canonical_symptoms(symptom))
+    if symptoms:
+        fields["symptoms"] = sorted(symptoms)
+
+    return fields
+
+
+# Un número solo se toma como edad si lo acompaña alguna de estas palabras...
+_AGE_WORDS = re.compile(r"\b(?:anos|years?|edad|mayor(?:es)?|menor(?:es)?|older|younger|aged?)\b")
+# ...y no va seguido de una unidad de tiempo o de cantidad ("más de 3 días", "3 o más síntomas").
+_OTHER_UNITS = re.compile(
+    r"\s*(?:dias?|semanas?|mes(?:es)?|horas?|minutos?|veces|sintomas?|pacientes?|consultas?"
+    r"|days?|weeks?|months?|hours?|minutes?|times|symptoms?|patients?|visits?)\b"
+)
+
+# "desde hace más de 2 años" es una duración, no una edad.
+_DURATION_BEFORE = re.compile(
+    r"\b(?:hace|durante|desde|for|since)(?:\s+(?:mas|menos|de|unos?|casi|over|about|more|less|than))*\s*$"
+)
+
+
+def _is_age(text: str, match) -> bool:
+    tail, head = text[match.end():], text[:match.start()]
+    if _OTHER_UNITS.match(tail) or _DURATION_BEFORE.search(head):
+        return False
+    return bool(
+        re.match(r"\s*(?:anos|years?)\b", tail)
+        or _AGE_WORDS.search(match.group(0))
+        or re.search(r"\b(?:edad|aged?)\b(?:\s+\w+)?\s*$", head)
+    )
+
+
+def _month_range(year: int, month: int) -> tuple:
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def plan_query(question: str, today: Optional[date] = None) -> dict:
+    """
+    Extrae filtros explícitos de una pregunta en lenguaje natural.
+
+    Reconoce rangos de edad ("mayores de 60", "under 30 years", "entre 30 y 50 años"),
+    síntomas del vocabulario, meses y años ("en marzo", "marzo de 2024", "en 2023")
+    y nombres de paciente ("paciente Juan Pérez").
+
+    Returns:
+        dict: Especificación de filtros con las claves presentes entre 'min_age', 'max_age',
+            'symptoms', 'date_from', 'date_to' (fin exclusivo) y 'name_tokens'. Vacío si no hay filtros.
+    """
+    today = today or date.today()
+    text = normalize(question)
+    spec = {}
+
+    # --- Edad (solo números acompañados de una palabra de edad, ver _is_age) ---
+    def age_match(pattern):
+        return next((match for match in re.finditer(pattern, text) if _is_age(text, match)), None)
+
+    between = age_match(r"\b(?:entre|between)\s+(\d{1,3})\s+(?:y|and)\s+(\d{1,3})")
+    if between:
+        spec["min_age"], spec["max_age"] = sorted((int(between.group(1)), int(between.group(2))))
+    else:
+        older = age_match(r"\b(?:mayores?\s+de|mas\s+de|over|older\s+than|above)\s+(\d{1,3})")
+        at_least = age_match(r"\b(\d{1,3})\s*(?:anos\s+)?(?:o\s+mas|or\s+older|or\s+more|\+)")
+        younger = age_match(r"\b(?:menores?\s+de|menos\s+de|under|younger\s+than|below)\s+(\d{1,3})")
+        exact = age_match(r"\b(?:de|tiene|tienen)\s+(\d{1,3})\s+anos\b|\b(\d{1,3})\s+years?\s+old\b")
+        if older:
+            spec["min_age"] = int(older.group(1)) + 1
+        elif at_least:
+            spec["min_age"] = int(at_least.group(1))
+        if younger:
+            spec["max_age"] = int(younger.group(1)) - 1
+        if exact and not (older or at_least or younger):
+            spec["min_age"] = spec["max_age"] = int(exact.group(1) or exact.group(2))
+
+    # --- Síntomas ---
+    symptoms = canonical_symptoms(text)
+    if symptoms:
+        spec["symptoms"] = symptoms
+
+    # --- Fechas ---
+    month_names = "|".join(MONTHS)
+    month_match = re.search(rf"\b({month_names})\b(?:\s+(?:de|del|of)?\s*(\d{{4}}))?", text)
+    # "may" en inglés es ambiguo; solo se trata como mes si va acompañado de un año.
+    if month_match and not (month_match.group(1) == "may" and not month_match.group(2)):
+        month = MONTHS[month_match.group(1)]
+        if month_match.group(2):
+            year = int(month_match.group(2))
+        else:
+            # Sin año, se toma la ocurrencia más reciente de ese mes.
+            year = today.year if month <= today.month else today.year - 1
+        spec["date_from"], spec["date_to"] = _month_range(year, month)
+    else:
+        year_match = re.search(r"\b(?:en|in|del|durante)\s+(\d{4})\b", text)
+        if year_match:
+            year = int(year_match.group(1))
+            spec["date_from"], spec["date_to"] = date(year, 1, 1), date(year + 1, 1, 1)
+
+    # --- Nombre del paciente (se busca en la pregunta original para respetar mayúsculas) ---
+    name_match = re.search(
+        r"\b(?i:paciente|patient|se[ñn]or|se[ñn]ora|sr\.|sra\.)\s+((?:[A-ZÁÉÍÓÚÑ][\wáéíóúñü]+\s*){1,4})",
+        question or ""
+    )
+    if name_match:
+        spec["name_tokens"] = normalize(name_match.group(1)).split()
+
+    return spec
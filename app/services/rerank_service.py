@@ -0,0 +1,119 @@
+# app/services/rerank_service.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.metrics import track_stage
+from app.services.model_client import remote_model
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RerankService:
+    """
+    Re-ranking opcional de los fragmentos candidatos con un cross-encoder en CPU.
+
+    El modelo se carga en el primer uso (solo si RERANK_ENABLED está activo) y cada
+    re-ranking se limita a RERANK_TIMEOUT_MS: si no termina a tiempo, se conserva el
+    orden de la búsqueda híbrida en lugar de retrasar la respuesta.
+
+    Una predicción que supera el plazo no se puede interrumpir y sigue ocupando el hilo del
+    modelo. Para que las consultas siguientes no esperen detrás de ella (y agoten también su
+    plazo), la cola se limita a RERANK_MAX_PENDING predicciones y, mientras la que está en curso
+    lleve más de RERANK_TIMEOUT_MS, las consultas nuevas no se re-ordenan.
+    """
+    def __init__(self):
+        self._model = None
+        self._model_lock = threading.Lock()
+        # Un solo hilo: las predicciones se serializan sobre el mismo modelo.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self._state_lock = threading.Lock()
+        # Predicciones enviadas al hilo que aún no han terminado (o se han cancelado en la cola).
+        self._pending = 0
+        # Inicio de la predicción en curso (time.monotonic()), o None si el hilo está libre.
+        self._running_since = None
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None and settings.MODEL_SERVER_ADDRESS:
+                # Varios workers: el modelo vive en el servidor de modelos compartido.
+                self._model = remote_model("reranker")
+            elif self._model is None:
+                from sentence_transformers import CrossEncoder
+                logger.info(f"Cargando cross-encoder '{settings.RERANK_MODEL_NAME}'...")
+                self._model = CrossEncoder(settings.RERANK_MODEL_NAME, device="cpu")
+                logger.info("Cross-encoder cargado.")
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        return self._get_model()
+
+    def load(self):
+        """Carga el cross-encoder y ejecuta una predicción de prueba (calentamiento del arranque)."""
+        self._score("calentamiento", ["calentamiento"])
+
+    def _score(self, query: str, texts: list) -> list:
+        return self._get_model().predict([(query, text) for text in texts]).tolist()
+
+    def _run(self, query: str, texts: list) -> list:
+        with self._state_lock:
+            self._running_since = time.monotonic()
+        try:
+            return self._score(query, texts)
+        finally:
+            with self._state_lock:
+                self._running_since = None
+
+    def _reserve(self) -> bool:
+        """Reserva un hueco en la cola del modelo; False si está llena o la predicción en curso está atascada."""
+        with self._state_lock:
+            stuck = (self._running_since is not None
+                     and time.monotonic() - self._running_since > settings.RERANK_TIMEOUT_MS / 1000)
+            if stuck or self._pending >= settings.RERANK_MAX_PENDING:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, future):
+        # Se llama al terminar la predicción o al cancelarla antes de empezar (plazo agotado en la cola).
+        with self._state_lock:
+            self._pending -= 1
+
+    async def rerank(self, query: str, hits: list) -> list:
+        """
+        Reordena los primeros RERANK_CANDIDATES puntos por la puntuación del cross-encoder
+        (que pasa a ser su 'score'). Los demás se mantienen detrás, en su orden original.
+        """
+        if not settings.RERANK_ENABLED or len(hits) < 2:
+            return hits
+        candidates, rest = hits[:settings.RERANK_CANDIDATES], hits[settings.RERANK_CANDIDATES:]
+        texts = [(hit.payload or {}).get("chunk_text") or (hit.payload or {}).get("transcription", "") for hit in candidates]
+        if not self._reserve():
+            logger.warning("El cross-encoder está saturado; se usa el orden híbrido.")
+            return hits
+        future = self._executor.submit(self._run, query, texts)
+        future.add_done_callback(self._release)
+        try:
+            with track_stage("rerank", candidates=len(candidates)):
+                scores = await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.RERANK_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            logger.warning(f"El re-ranking superó {settings.RERANK_TIMEOUT_MS:.0f} ms; se usa el orden híbrido.")
+            return hits
+        except Exception as e:
+            logger.error(f"Error en el re-ranking: {e}")
+            return hits
+        reranked = [hit.model_copy(update={"score": score}) for hit, score in zip(candidates, scores)]
+        reranked.sort(key=lambda hit: hit.score, reverse=True)
+        return reranked + rest
+
+
+# Instancia única del servicio
+rerank_service = RerankService()
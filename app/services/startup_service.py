@@ -0,0 +1,102 @@
+# app/services/startup_service.py
+import asyncio
+import logging
+import time
+from app.core.config import settings
+from app.services.whisper_service import whisper_service
+from app.services.embedding_service import embedding_service
+from app.services.vector_db_service import vector_db_service
+from app.services.rerank_service import rerank_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StartupService:
+    """
+    Calentamiento de los componentes pesados (modelos y conexión con Qdrant) y su estado de preparación.
+
+    Ningún servicio carga nada al importarse: el calentamiento se lanza en segundo plano desde el
+    ciclo de vida de la aplicación, de modo que el servidor acepta peticiones (y responde a
+    /health/live) de inmediato, mientras /health/ready informa del estado de cada componente.
+    """
+    def __init__(self):
+        # nombre -> {"status": "loading" | "ready" | "failed", "error", "load_seconds"}
+        self._state = {}
+        self._task = None
+
+    @staticmethod
+    def _components() -> dict:
+        """Componentes a preparar: nombre -> (función de carga, función que indica si ya está cargado)."""
+        components = {
+            "whisper": (whisper_service.load, lambda: whisper_service.is_loaded),
+            "embeddings": (embedding_service.load, lambda: embedding_service.is_loaded),
+        }
+        # El componente se llama como el backend: 'qdrant' o 'vector_index' (índice local).
+        vector_component = "qdrant" if settings.VECTOR_BACKEND == "qdrant" else "vector_index"
+        components[vector_component] = (vector_db_service.initialize, lambda: vector_db_service.is_ready)
+        if settings.RERANK_ENABLED:
+            components["reranker"] = (rerank_service.load, lambda: rerank_service.is_loaded)
+        return components
+
+    async def _load(self, name: str, loader):
+        """Carga un componente en un hilo; si falla, lo reintenta cada STARTUP_RETRY_SECONDS."""
+        while True:
+            self._state[name] = {"status": "loading"}
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(loader)
+                self._state[name] = {"status": "ready", "load_seconds": round(time.perf_counter() - start, 2)}
+                logger.info(f"Componente '{name}' listo en {self._state[name]['load_seconds']} s.")
+                return
+            except Exception as e:
+                logger.error(f"Error al preparar el componente '{name}' (reintento en {settings.STARTUP_RETRY_SECONDS} s): {e}")
+                self._state[name] = {"status": "failed", "error": str(e)}
+                await asyncio.sleep(settings.STARTUP_RETRY_SECONDS)
+
+    async def warm_up(self):
+        start = time.perf_counter()
+        components = self._components()
+        if settings.STARTUP_WARMUP_PARALLEL:
+            await asyncio.gather(*(self._load(name, loader) for name, (loader, _) in components.items()))
+        else:
+            for name, (loader, _) in components.items():
+                await self._load(name, loader)
+        logger.info(f"Calentamiento completado en {time.perf_counter() - start:.2f} s.")
+
+    def start(self):
+        """Lanza el calentamiento en segundo plano (si STARTUP_WARMUP está activo)."""
+        if settings.STARTUP_WARMUP and self._task is None:
+            self._task = asyncio.create_task(self.warm_up())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def readiness(self) -> tuple:
+        """
+        Returns:
+            tuple: (lista para recibir tráfico, estado de cada componente). Sin calentamiento,
+                los componentes pendientes no bloquean la preparación porque se cargan en el primer uso.
+        """
+        components = {}
+        for name, (_, is_loaded) in self._components().items():
+            state = self._state.get(name, {})
+            if is_loaded():
+                components[name] = {"status": "ready", **({"load_seconds": state["load_seconds"]} if "load_seconds" in state else {})}
+            else:
+                components[name] = state or {"status": "pending"}
+        ready = all(
+            component["status"] == "ready" or (component["status"] == "pending" and not settings.STARTUP_WARMUP)
+            for component in components.values()
+        )
+        return ready, components
+
+
+# Instancia única del servicio
+startup_service = StartupService()
@@ -0,0 +1,198 @@
+# app/services/transcription_service.py
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app.core.config import settings
+from app.services.whisper_service import whisper_service
+from app.services.audio_service import audio_service
+from app.services.cache_service import transcription_cache, sha256_file
+from app.core.metrics import observe_stage, record_error, register_callback
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionQueueFullError(RuntimeError):
+    """
+    Se lanza cuando el pool de transcripción no admite más trabajos.
+    """
+    def __init__(self, retry_after: int):
+        super().__init__("El servicio de transcripción está saturado. Intenta de nuevo más tarde.")
+        self.retry_after = retry_after
+
+
+class TranscriptionService:
+    """
+    Ejecuta las transcripciones de Whisper fuera del event loop.
+
+    Las transcripciones corren en un pool acotado de hilos (uno por worker del modelo)
+    y solo se admiten tantos trabajos como workers más el tamaño de la cola. Cuando
+    se supera ese límite se rechaza el trabajo en lugar de acumularlo en memoria.
+    """
+    def __init__(self, max_workers: int, queue_size: int):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="whisper-worker")
+        self._lock = threading.Lock()
+        self._pending = 0
+        logger.info(f"Pool de transcripción listo: {max_workers} workers, cola de {queue_size} trabajos.")
+        register_callback("elsol_transcription_pending", "Transcripciones en ejecución o en cola.",
+                          lambda: {(): self._pending})
+        register_callback("elsol_transcription_capacity", "Transcripciones admitidas (workers + cola).",
+                          lambda: {(): self.max_workers + self.queue_size})
+
+    @property
+    def pending(self) -> int:
+        """Trabajos en ejecución o esperando en cola."""
+        return self._pending
+
+    def is_full(self) -> bool:
+        return self._pending >= self.max_workers + self.queue_size
+
+    def _acquire_slot(self):
+        with self._lock:
+            if self.is_full():
+                logger.warning(f"Cola de transcripción llena ({self._pending} trabajos pendientes).")
+                error = TranscriptionQueueFullError(settings.TRANSCRIPTION_RETRY_AFTER_SECONDS)
+                record_error("transcribe", error)
+                raise error
+            self._pending += 1
+
+    def _release_slot(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def _prepare_audio(self, file_path: str) -> dict:
+        """
+        Decodifica el audio en el pool de procesos de 'audio_service' con el hueco ya reservado,
+        de modo que la decodificación de un trabajo se solapa con la inferencia de los anteriores.
+        Si falla (p. ej. un archivo dañado), libera el hueco sin llegar a ocupar un worker de Whisper.
+        """
+        try:
+            return await audio_service.prepare(file_path)
+        except BaseException:
+            self._release_slot()
+            raise
+
+    async def _cache_key(self, file_path: str, audio_hash: Optional[str]) -> str:
+        if audio_hash is None:
+            audio_hash = await asyncio.to_thread(sha256_file, file_path)
+        return whisper_service.cache_key(audio_hash)
+
+    async def transcribe(self, file_path: str, audio_hash: Optional[str] = None) -> dict:
+        """
+        Encola la transcripción de un archivo y espera su resultado sin bloquear el event loop.
+        Si el mismo audio ya se transcribió con la misma configuración, se devuelve el
+        resultado de la caché sin ocupar el pool.
+
+        Args:
+            file_path (str): La ruta al archivo de audio.
+            audio_hash (str, opcional): SHA-256 del archivo, si ya se calculó.
+
+        Raises:
+            TranscriptionQueueFullError: Si el pool y su cola están llenos.
+        """
+        cache_key = await self._cache_key(file_path, audio_hash)
+        cached = transcription_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Transcripción obtenida de la caché para {file_path}.")
+            return cached
+
+        result = await self._run_in_pool(file_path)
+        transcription_cache.set(cache_key, result)
+        return result
+
+    async def _run_in_pool(self, file_path: str) -> dict:
+        self._acquire_slot()
+        audio = await self._prepare_audio(file_path)
+        submitted = time.perf_counter()
+
+        def run():
+            observe_stage("transcribe_queue_wait", time.perf_counter() - submitted)
+            return whisper_service.transcribe_audio(audio)
+
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            self._release_slot()
+            raise
+        # El hueco se libera cuando termina el trabajo, aunque el cliente se haya desconectado.
+        future.add_done_callback(self._release_slot)
+        return await asyncio.wrap_future(future)
+
+    async def stream(self, file_path: str, audio_hash: Optional[str] = None):
+        """
+        Ejecuta la transcripción incremental en el pool y entrega sus eventos a medida que llegan.
+        Si el consumidor abandona el stream, el worker deja de decodificar en el siguiente segmento.
+        Con un acierto de caché, los segmentos guardados se entregan de inmediato.
+
+        Yields:
+            tuple: Los eventos de 'WhisperService.iter_transcription'.
+
+        Raises:
+            TranscriptionQueueFullError: Si el pool y su cola están llenos.
+        """
+        cache_key = await self._cache_key(file_path, audio_hash)
+        cached = transcription_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Transcripción obtenida de la caché para {file_path}.")
+            for segment in cached["segments"]:
+                yield "segment", segment
+            yield "done", cached
+            return
+
+        async for event, data in self._stream_in_pool(file_path):
+            if event == "done":
+                transcription_cache.set(cache_key, data)
+            yield event, data
+
+    async def _stream_in_pool(self, file_path: str):
+        self._acquire_slot()
+        audio = await self._prepare_audio(file_path)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        finished = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for item in whisper_service.iter_transcription(audio):
+                    if cancelled.is_set():
+                        return
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        try:
+            future = self._executor.submit(produce)
+        except Exception:
+            self._release_slot()
+            raise
+        future.add_done_callback(self._release_slot)
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        audio_service.shutdown()
+
+
+# Instancia única del servicio
+transcription_service = TranscriptionService(
+    max_workers=settings.TRANSCRIPTION_WORKERS,
+    queue_size=settings.TRANSCRIPTION_QUEUE_SIZE
+)
@@ -0,0 +1,106 @@
+# app/services/upload_service.py
+import logging
+import os
+import uuid
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import track_stage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+os.makedirs(settings.UPLOAD_DIRECTORY, exist_ok=True)
+
+# Bytes necesarios para reconocer el contenedor de audio por su cabecera.
+SNIFF_LENGTH = 16
+
+
+class UploadRejectedError(ValueError):
+    """
+    Se lanza cuando un archivo subido no se acepta (demasiado grande o no es audio).
+    """
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """
+    Identifica el formato de audio a partir de sus primeros bytes (magic bytes).
+
+    Returns:
+        str | None: El nombre del formato, o None si no parece un archivo de audio.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:3] == b"ID3":
+        return "mp3"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if header[:5] == b"#!AMR":
+        return "amr"
+    if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if header[:4] == b"caff":
+        return "caf"
+    if header[:4] == b"\x30\x26\xb2\x75":
+        return "wma"
+    # Sincronía de trama MPEG/ADTS (mp3 sin etiqueta ID3, aac)
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        return "mpeg"
+    return None
+
+
+async def save_upload_file(file) -> str:
+    """
+    Guarda un archivo subido en el directorio de uploads escribiéndolo por bloques.
+
+    El contenido nunca se carga completo en memoria: se copia en bloques de
+    UPLOAD_CHUNK_SIZE bytes desde el archivo temporal de la petición. La cabecera
+    se valida con el primer bloque y el tamaño se controla mientras se escribe.
+
+    Returns:
+        str: La ruta del archivo guardado.
+
+    Raises:
+        UploadRejectedError: Si el archivo supera MAX_UPLOAD_SIZE_BYTES o no es audio.
+    """
+    with track_stage("save"):
+        max_size = settings.MAX_UPLOAD_SIZE_BYTES
+        # Si el tamaño ya se conoce (la petición fue volcada a disco) se rechaza antes de copiar nada.
+        if file.size is not None and file.size > max_size:
+            raise UploadRejectedError(413, f"El archivo supera el tamaño máximo de {max_size} bytes.")
+
+        header = await file.read(SNIFF_LENGTH)
+        audio_format = sniff_audio_format(header)
+        if audio_format is None:
+            raise UploadRejectedError(415, "El contenido del archivo no corresponde a un formato de audio reconocido.")
+
+        file_extension = os.path.splitext(file.filename or "")[1] or f".{audio_format}"
+        unique_filename = f"{uuid.uuid4()}{file_extension}"
+        file_path = os.path.join(settings.UPLOAD_DIRECTORY, unique_filename)
+
+        written = 0
+        try:
+            with open(file_path, "wb") as buffer:
+                chunk = header
+                while chunk:
+                    written += len(chunk)
+                    if written > max_size:
+                        raise UploadRejectedError(413, f"El archivo supera el tamaño máximo de {max_size} bytes.")
+                    buffer.write(chunk)
+                    chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        except BaseException:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+        logger.info(f"Archivo guardado en {file_path} ({written} bytes, formato {audio_format}).")
+        return file_path
@@ -0,0 +1,113 @@
+# app/services/vector_backend.py
+import threading
+from abc import ABC, abstractmethod
+from app.services.cache_service import answer_cache, data_generation
+
+
+class VectorBackend(ABC):
+    """
+    Interfaz del almacenamiento de puntos que usa 'VectorDBService' (y, a través de él, el
+    chatbot). Hay dos implementaciones: 'QdrantBackend' (servidor o Qdrant embebido) y
+    'LocalVectorBackend' (índice en el propio proceso). Se elige con VECTOR_BACKEND.
+
+    Un punto es un fragmento de un registro: 'id', 'vector' y 'payload' (con 'record_id',
+    'chunk_index', 'chunk_text', 'filters', ...). Los filtros se expresan como la especificación
+    de 'query_planner.plan_query' y cada backend la traduce. Salvo 'iter_points', ninguna
+    lectura devuelve fragmentos en estado PENDING_STATUS (registros a medio ingerir).
+    """
+    # Estado de los fragmentos de un registro cuyos datos extraídos aún no se han añadido
+    # (ver 'VectorDBService.store_record_chunks'). Los registros sin 'status' están completos.
+    PENDING_STATUS = "pending"
+
+    # Identifica el almacenamiento a efectos de caché (p. ej. el alias de la colección).
+    name = ""
+
+    def __init__(self):
+        self._ready = False
+        self._init_lock = threading.Lock()
+        # Se incrementa cada vez que se (re)crea el almacenamiento; forma parte de la clave de la caché de respuestas.
+        self.generation = 0
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def initialize(self):
+        """Conecta o abre el almacenamiento y lo crea si no existe. Si falla, se reintenta en el siguiente uso."""
+        with self._init_lock:
+            if self._ready:
+                return
+            self._open()
+            self._ready = True
+
+    @abstractmethod
+    def _open(self):
+        """Conecta o abre el almacenamiento y lo crea si no existe."""
+
+    def _on_collection_replaced(self):
+        self.generation += 1
+        answer_cache.clear()
+        data_generation.increment()
+
+    @abstractmethod
+    def delete_collection(self):
+        """Elimina todos los puntos y el almacenamiento (p. ej. para empezar de cero en los benchmarks)."""
+
+    @abstractmethod
+    def migrate_collection(self, batch_size: int = 256, keep_old: bool = False) -> str:
+        """
+        Reescribe el almacenamiento con la configuración actual (y regenera los embeddings si
+        cambió su dimensión). Devuelve el nombre de la nueva versión.
+        """
+
+    async def aclose(self):
+        pass
+
+    @staticmethod
+    def embedding_text(payload: dict) -> str:
+        """
+        Texto del que se regenera el embedding de un punto al migrar. Los puntos anteriores a la
+        fragmentación no tienen 'chunk_text': su texto es la transcripción completa.
+        """
+        return payload.get("chunk_text") or payload.get("transcription") or ""
+
+    @abstractmethod
+    def upsert(self, points: list, wait: bool = True):
+        """Inserta o reemplaza los puntos ('models.PointStruct')."""
+
+    @abstractmethod
+    def delete_records(self, record_ids: list, wait: bool = True):
+        """Elimina todos los fragmentos de los registros indicados."""
+
+    @abstractmethod
+    def set_record_payload(self, record_id: str, payload: dict):
+        """Añade (o sobrescribe) claves del payload de todos los fragmentos de un registro."""
+
+    @abstractmethod
+    def record_exists(self, record_id: str) -> bool:
+        """Indica si el registro tiene fragmentos completos."""
+
+    @abstractmethod
+    def search(self, query_vector: list, limit: int, filter_spec: dict) -> list:
+        """Los 'limit' fragmentos más similares que cumplen los filtros ('models.ScoredPoint')."""
+
+    @abstractmethod
+    async def asearch(self, query_vector: list, limit: int, filter_spec: dict) -> list:
+        """Igual que 'search', sin bloquear el event loop."""
+
+    @abstractmethod
+    async def aget_points(self, point_ids: list, filter_spec: dict) -> list:
+        """Los puntos con esos IDs que cumplen los filtros, en cualquier orden."""
+
+    @abstractmethod
+    def find_first_chunks(self, filter_spec: dict, limit: int, offset: str = None) -> tuple:
+        """
+        Primer fragmento (con la transcripción completa) de los registros que cumplen los filtros.
+
+        Returns:
+            tuple: (puntos, ID con el que empieza la página siguiente o None).
+        """
+
+    @abstractmethod
+    def iter_points(self, batch_size: int = 512):
+        """Recorre todos los puntos (con su payload, sin vectores) en lotes, incluidos los pendientes."""
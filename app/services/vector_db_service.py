@@ -1,92 +1,441 @@
+import asyncio
 import logging
+import threading
 import uuid
-from qdrant_client import QdrantClient, models
-from sentence_transformers import SentenceTransformer
+from qdrant_client import models
+from app.core.config import settings
+from app.core.metrics import track_stage
+from app.services.embedding_service import embedding_service
+from app.services.chunking_service import chunk_transcription
+from app.services.query_planner import build_filter_fields
+from app.services.cache_service import answer_cache, data_generation
+from app.services.lexical_index import lexical_index
+from app.services.rerank_service import rerank_service
+from app.services.vector_backend import VectorBackend
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def create_backend(kind: str = None) -> VectorBackend:
+    """Backend de almacenamiento según VECTOR_BACKEND: 'qdrant' (por defecto) o 'local'."""
+    kind = kind or settings.VECTOR_BACKEND
+    if kind == "qdrant":
+        from app.services.qdrant_backend import QdrantBackend
+        return QdrantBackend()
+    if kind == "local":
+        from app.services.local_vector_backend import LocalVectorBackend
+        return LocalVectorBackend()
+    raise ValueError(f"Backend vectorial no soportado: '{kind}' (usa 'qdrant' o 'local').")
+
+
 class VectorDBService:
     """
-    Servicio para gestionar la interacción con la base de datos vectorial Qdrant.
+    Servicio para gestionar la base de datos vectorial: fragmentación, embeddings, ingesta en
+    dos fases, búsqueda híbrida y agrupación por registro. El almacenamiento de los puntos se
+    delega en un backend (ver 'VectorBackend'): Qdrant o el índice local en el propio proceso.
+
+    La conexión y la preparación del almacenamiento se hacen en el primer uso (o en el
+    calentamiento del arranque), no al importar el módulo. Si el backend no está disponible,
+    el error se propaga y se reintenta en el siguiente uso.
     """
-    def __init__(self, host="qdrant", port=6333):
-        logger.info(f"Inicializando conexión con Qdrant en {host}:{port}...")
-        # El cliente se conecta al servicio 'qdrant' definido en docker-compose.yml
-        self.client = QdrantClient(host=host, port=port)
-        
-        # Carga un modelo pre-entrenado para convertir texto en vectores (embeddings).
-        # 'all-MiniLM-L6-v2' es un modelo ligero y eficiente, ideal para empezar.
-        logger.info("Cargando modelo de embeddings 'all-MiniLM-L6-v2'...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("Modelo de embeddings cargado.")
-
-        self.collection_name = "patient_conversations"
-        self.vector_size = self.embedding_model.get_sentence_embedding_dimension()
-        
-        # Asegura que la colección exista al iniciar el servicio.
-        self.create_collection_if_not_exists()
+    def __init__(self, backend: VectorBackend = None):
+        self._backend = backend or create_backend()
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+        # El modelo de embeddings ('all-MiniLM-L6-v2' por defecto) se carga una sola vez
+        # en el proveedor compartido 'embedding_service'.
+        self.embedding_service = embedding_service
+
+    PENDING_STATUS = VectorBackend.PENDING_STATUS
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    @property
+    def backend(self) -> VectorBackend:
+        if not self._ready:
+            self.initialize()
+        return self._backend
+
+    @property
+    def collection_name(self) -> str:
+        return self._backend.name
+
+    def initialize(self):
+        """
+        Conecta con el backend, asegura que el almacenamiento exista y, con la búsqueda
+        híbrida activa, reconstruye el índice léxico si hace falta.
+        """
+        with self._init_lock:
+            if self._ready:
+                return
+            self._backend.initialize()
+            if settings.RETRIEVAL_HYBRID:
+                self._backfill_lexical_index()
+            self._ready = True
 
     def create_collection_if_not_exists(self):
         """
-        Crea la colección en Qdrant si no existe.
+        Crea la colección (o el índice local) si no existe.
         """
-        try:
-            collections = self.client.get_collections().collections
-            collection_names = [collection.name for collection in collections]
-            
-            if self.collection_name not in collection_names:
-                logger.info(f"Colección '{self.collection_name}' no encontrada. Creándola...")
-                self.client.recreate_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=models.VectorParams(
-                        size=self.vector_size,
-                        distance=models.Distance.COSINE # Coseno es bueno para similitud de texto
-                    ),
-                )
-                logger.info(f"Colección '{self.collection_name}' creada exitosamente.")
-            else:
-                logger.info(f"Colección '{self.collection_name}' ya existe.")
-        except Exception as e:
-            logger.error(f"Error al verificar/crear la colección en Qdrant: {e}")
+        if not self._ready:
+            self.initialize()
+        else:
+            self._backend.initialize()
+
+    def delete_collection(self):
+        """Elimina todos los puntos (p. ej. para empezar de cero en los benchmarks)."""
+        self._backend.delete_collection()
+
+    def migrate_collection(self, batch_size: int = 256, keep_old: bool = False) -> str:
+        """
+        Reescribe el almacenamiento con la configuración actual y regenera los embeddings si
+        cambió su dimensión (ver 'migrate_collection' de cada backend).
+
+        Returns:
+            str: El nombre de la nueva versión.
+        """
+        target = self._backend.migrate_collection(batch_size=batch_size, keep_old=keep_old)
+        self._ready = False
+        self.initialize()
+        return target
+
+    async def aclose(self):
+        await self._backend.aclose()
+
+    @property
+    def collection_version(self) -> str:
+        """
+        Identifica el contenido de la colección a efectos de caché (colección, modelo de embeddings
+        y generación). Incluye el contador compartido 'data_generation', así que las escrituras de
+        otros procesos (otros workers, 'app.batch_ingest', 'app.migrate_collection') también la cambian.
+        """
+        return (f"{self._backend.name}:{settings.EMBEDDING_MODEL_NAME}:{self._backend.generation}"
+                f":{data_generation.value()}")
 
-    def store_record(self, transcription: str, extracted_data: dict, metadata: dict):
+    def record_exists(self, record_id: str) -> bool:
         """
-        Genera embeddings y almacena la transcripción y sus metadatos en Qdrant.
+        Indica si el registro con el ID dado sigue almacenado (y completo) en la base vectorial.
         """
         try:
-            logger.info("Generando vector de embedding para la transcripción...")
-            # El vector se genera a partir de la transcripción completa para capturar el contexto general.
-            vector = self.embedding_model.encode(transcription).tolist()
+            return self.backend.record_exists(record_id)
+        except Exception as e:
+            logger.error(f"Error al consultar el registro {record_id} en la base vectorial: {e}")
+            return False
 
-            # El 'payload' son los datos que queremos almacenar junto con el vector.
-            # Esto nos permitirá filtrar y recuperar la información completa más adelante.
+    def _build_points(self, record: dict, chunks: list, vectors: list) -> list:
+        """
+        Construye un punto por fragmento. Todos llevan el 'record_id' del registro padre y sus
+        datos extraídos; la transcripción completa solo se guarda en el primer fragmento.
+        """
+        record_uuid = uuid.UUID(record["record_id"])
+        filters = build_filter_fields(record["extracted_data"])
+        points = []
+        for chunk, vector in zip(chunks, vectors):
             payload = {
-                "transcription": transcription,
+                "record_id": record["record_id"],
+                "chunk_index": chunk["index"],
+                "chunk_count": len(chunks),
+                "chunk_text": chunk["text"],
+                "start": chunk["start"],
+                "end": chunk["end"],
+                "extracted_data": record["extracted_data"],
+                "filters": filters,
+                "processing_metadata": record["metadata"]
+            }
+            if chunk["index"] == 0:
+                payload["transcription"] = record["transcription"]
+            points.append(models.PointStruct(
+                id=str(uuid.uuid5(record_uuid, str(chunk["index"]))),
+                vector=vector,
+                payload=payload
+            ))
+        return points
+
+    @staticmethod
+    def _index_lexical(points_per_record: list):
+        """Actualiza el índice léxico con los fragmentos recién escritos de cada registro."""
+        if not settings.RETRIEVAL_HYBRID:
+            return
+        lexical_index.index_records([
+            {
+                "record_id": record_id,
                 "extracted_data": extracted_data,
-                "processing_metadata": metadata
+                "chunks": [(str(point.id), point.payload["chunk_text"]) for point in points]
             }
-            
-            # Generamos un ID único para este punto de datos.
-            record_id = str(uuid.uuid4())
-
-            logger.info(f"Almacenando registro en Qdrant con ID: {record_id}")
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=[
-                    models.PointStruct(
-                        id=record_id,
-                        vector=vector,
-                        payload=payload
-                    )
-                ],
-                wait=True # Espera a que la operación se complete
-            )
-            logger.info("Registro almacenado exitosamente en Qdrant.")
-            return record_id
+            for record_id, extracted_data, points in points_per_record
+        ])
+
+    def _backfill_lexical_index(self):
+        """
+        Si el índice léxico está vacío pero la colección no (p. ej. datos anteriores a la
+        búsqueda híbrida o un índice borrado), lo reconstruye recorriendo los puntos del backend.
+        """
+        try:
+            if lexical_index.count() > 0:
+                return
+            records = {}
+            for points in self._backend.iter_points(batch_size=512):
+                for point in points:
+                    payload = point.payload or {}
+                    record_id = payload.get("record_id", str(point.id))
+                    record = records.setdefault(record_id, {
+                        "record_id": record_id, "extracted_data": payload.get("extracted_data"), "chunks": []
+                    })
+                    record["chunks"].append((str(point.id), payload.get("chunk_text", payload.get("transcription", ""))))
+            if records:
+                logger.info(f"Reconstruyendo el índice léxico con {len(records)} registros de la base vectorial...")
+                lexical_index.index_records(list(records.values()))
         except Exception as e:
-            logger.error(f"Error al almacenar el registro en Qdrant: {e}")
+            logger.error(f"Error al reconstruir el índice léxico: {e}")
+
+    def store_record(self, transcription: str, extracted_data: dict, metadata: dict,
+                     record_id: str = None, segments: list = None):
+        """
+        Divide la transcripción en fragmentos, genera sus embeddings y los almacena en la base vectorial
+        como puntos enlazados al registro. Si se indica 'record_id', sus fragmentos previos
+        se reemplazan en lugar de duplicarse.
+        """
+        # Generamos un ID único para este registro si no se proporcionó uno.
+        record_id = record_id or str(uuid.uuid4())
+        points = self.store_record_chunks(transcription, metadata, record_id, segments)
+        self.complete_record(record_id, extracted_data, metadata, points)
+        return record_id
+
+    def store_record_chunks(self, transcription: str, metadata: dict, record_id: str, segments: list = None) -> list:
+        """
+        Primera fase del almacenamiento: genera los embeddings de los fragmentos y los escribe
+        en estado 'pending', sin los datos extraídos. No depende de la extracción,
+        así que la ingesta la ejecuta en paralelo con ella (salvo si el registro ya está completo:
+        sus fragmentos anteriores se reemplazan y dejarían de ser visibles hasta 'complete_record'). Las búsquedas no ven el registro
+        hasta 'complete_record'; si la ingesta falla antes, queda pendiente y se puede reintentar.
+
+        Returns:
+            list: Los puntos escritos, que 'complete_record' necesita para el índice léxico y la caché.
+        """
+        try:
+            chunks = chunk_transcription(transcription, segments)
+
+            logger.info(f"Generando embeddings para {len(chunks)} fragmentos de la transcripción...")
+            vectors = self.embedding_service.encode_batch([chunk["text"] for chunk in chunks])
+            points = self._build_points({
+                "record_id": record_id,
+                "transcription": transcription,
+                "extracted_data": None,
+                "metadata": metadata
+            }, chunks, vectors)
+            for point in points:
+                point.payload["status"] = self.PENDING_STATUS
+
+            logger.info(f"Almacenando fragmentos del registro en la base vectorial con ID: {record_id}")
+            self.backend.delete_records([record_id], wait=False)
+            with track_stage("upsert"):
+                self.backend.upsert(points, wait=True) # Espera a que la operación se complete
+            # Si el registro ya existía, sus fragmentos anteriores han dejado de ser visibles.
+            data_generation.increment()
+            return points
+        except Exception as e:
+            logger.error(f"Error al almacenar el registro en la base vectorial: {e}")
             raise RuntimeError("No se pudo almacenar la información en la base de datos vectorial.")
 
+    def complete_record(self, record_id: str, extracted_data: dict, metadata: dict, points: list):
+        """
+        Segunda fase del almacenamiento: añade los datos extraídos, sus filtros y los metadatos
+        a todos los fragmentos del registro (set_payload) y lo hace visible para las búsquedas.
+        """
+        try:
+            with track_stage("set_payload"):
+                self.backend.set_record_payload(record_id, {
+                    "extracted_data": extracted_data,
+                    "filters": build_filter_fields(extracted_data),
+                    "processing_metadata": metadata,
+                    "status": "complete"
+                })
+            self._index_lexical([(record_id, extracted_data, points)])
+            # Las respuestas cacheadas que podrían recuperar estos fragmentos dejan de ser válidas.
+            answer_cache.invalidate([point.vector for point in points], [record_id])
+            data_generation.increment()
+            logger.info("Registro almacenado exitosamente en la base vectorial.")
+        except Exception as e:
+            logger.error(f"Error al completar el registro {record_id} en la base vectorial: {e}")
+            raise RuntimeError("No se pudo almacenar la información en la base de datos vectorial.")
+
+    def store_records(self, records: list, batch_size: int = 256, wait: bool = False) -> list:
+        """
+        Variante por lotes de 'store_record' para la ingesta masiva.
+
+        Genera los embeddings de los fragmentos de todas las transcripciones en lotes y los
+        inserta en bloques de 'batch_size' puntos sin esperar a su indexación. Si 'wait' es
+        True, se espera a que el último bloque se aplique; como los backends aplican las
+        operaciones en orden, eso garantiza que todos los anteriores también lo estén.
+
+        Args:
+            records (list): Diccionarios con 'transcription', 'extracted_data', 'metadata',
+                'record_id' y, opcionalmente, 'segments'.
+
+        Returns:
+            list: Los IDs de los registros almacenados.
+        """
+        if not records:
+            return []
+        try:
+            chunks_per_record = [chunk_transcription(record["transcription"], record.get("segments")) for record in records]
+            texts = [chunk["text"] for chunks in chunks_per_record for chunk in chunks]
+            logger.info(f"Generando embeddings para {len(texts)} fragmentos de {len(records)} transcripciones...")
+            vectors = self.embedding_service.encode_batch(texts)
+
+            points = []
+            points_per_record = []
+            offset = 0
+            for record, chunks in zip(records, chunks_per_record):
+                record_points = self._build_points(record, chunks, vectors[offset:offset + len(chunks)])
+                points_per_record.append((record["record_id"], record["extracted_data"], record_points))
+                points.extend(record_points)
+                offset += len(chunks)
+
+            self.backend.delete_records([record["record_id"] for record in records], wait=False)
+            with track_stage("upsert"):
+                for start in range(0, len(points), batch_size):
+                    is_last = start + batch_size >= len(points)
+                    self.backend.upsert(points[start:start + batch_size], wait=wait and is_last)
+            self._index_lexical(points_per_record)
+            answer_cache.invalidate(vectors, [record["record_id"] for record in records])
+            data_generation.increment()
+            logger.info(f"Lote de {len(records)} registros ({len(points)} fragmentos) enviado a la base vectorial.")
+            return [record["record_id"] for record in records]
+        except Exception as e:
+            logger.error(f"Error al almacenar el lote de registros en la base vectorial: {e}")
+            raise RuntimeError("No se pudo almacenar el lote en la base de datos vectorial.")
+
+    @staticmethod
+    def group_hits_by_record(hits: list, top_k: int) -> list:
+        """
+        Agrupa los fragmentos encontrados por su registro padre.
+
+        Devuelve hasta 'top_k' registros ordenados por la mejor puntuación de sus fragmentos,
+        cada uno con sus datos extraídos y los fragmentos que coincidieron (en orden temporal).
+        Los puntos antiguos, indexados como una sola transcripción, se tratan como un registro
+        con un único fragmento.
+        """
+        records = {}
+        for hit in hits:
+            payload = hit.payload or {}
+            record_id = payload.get("record_id", str(hit.id))
+            record = records.get(record_id)
+            if record is None:
+                if len(records) >= top_k:
+                    continue
+                record = records[record_id] = {
+                    "record_id": record_id,
+                    "score": hit.score,
+                    "extracted_data": payload.get("extracted_data"),
+                    "processing_metadata": payload.get("processing_metadata"),
+                    "matched_chunks": []
+                }
+            if len(record["matched_chunks"]) < settings.RETRIEVAL_CHUNKS_PER_RECORD:
+                record["matched_chunks"].append({
+                    "chunk_index": payload.get("chunk_index", 0),
+                    "text": payload.get("chunk_text", payload.get("transcription", "")),
+                    "start": payload.get("start"),
+                    "end": payload.get("end"),
+                    "score": hit.score
+                })
+        for record in records.values():
+            record["matched_chunks"].sort(key=lambda chunk: chunk["chunk_index"])
+        return list(records.values())
+
+    @staticmethod
+    def _search_limit(top_k: int) -> int:
+        # Se piden más fragmentos que registros para que varios fragmentos de un mismo
+        # registro no desplacen a los demás.
+        return top_k * settings.RETRIEVAL_OVERSAMPLE
+
+    def search_records(self, query_vector: list, top_k: int = 3, filter_spec: dict = None) -> list:
+        """
+        Busca los fragmentos más similares a la consulta y los agrupa por registro.
+        Con 'filter_spec', la búsqueda se restringe a los registros que cumplen los filtros.
+        """
+        hits = self.backend.search(query_vector, self._search_limit(top_k), filter_spec or {})
+        return self.group_hits_by_record(hits, top_k)
+
+    @staticmethod
+    def fuse_rrf(result_lists: list, k: int = None) -> list:
+        """
+        Reciprocal Rank Fusion: combina varias listas ordenadas de puntos sumando 1 / (k + rango)
+        por cada lista en la que aparece un punto. No depende de la escala de cada puntuación,
+        por lo que sirve para mezclar similitud coseno y BM25.
+        """
+        k = k or settings.RETRIEVAL_RRF_K
+        scores = {}
+        points = {}
+        for results in result_lists:
+            for rank, point in enumerate(results):
+                point_id = str(point.id)
+                scores[point_id] = scores.get(point_id, 0.0) + 1.0 / (k + rank + 1)
+                points.setdefault(point_id, point)
+        return [
+            models.ScoredPoint(id=points[point_id].id, version=0, score=score, payload=points[point_id].payload)
+            for point_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        ]
+
+    async def _alexical_hits(self, query_text: str, filter_spec: dict, limit: int) -> list:
+        """
+        Fragmentos del índice léxico (BM25) que cumplen los filtros, en orden de relevancia.
+        """
+        with track_stage("lexical_search"):
+            point_ids = await asyncio.to_thread(lexical_index.search, query_text, limit)
+        if not point_ids:
+            return []
+        points = await self.backend.aget_points(point_ids, filter_spec or {})
+        rank = {point_id: index for index, point_id in enumerate(point_ids)}
+        return sorted(points, key=lambda point: rank.get(str(point.id), len(rank)))
+
+    async def asearch_records(self, query_vector: list, top_k: int = 3, filter_spec: dict = None,
+                              query_text: str = None) -> list:
+        """
+        Igual que 'search_records', pero sin bloquear el event loop (cliente gRPC de Qdrant o un hilo).
+
+        Con 'query_text' y RETRIEVAL_HYBRID activo, los fragmentos densos se fusionan (RRF) con los
+        del índice léxico BM25, y el resultado pasa por el re-ranking opcional del cross-encoder
+        antes de agruparse por registro.
+        """
+        limit = self._search_limit(top_k)
+        if not (query_text and settings.RETRIEVAL_HYBRID):
+            with track_stage("retrieve", hybrid=False):
+                hits = await self.backend.asearch(query_vector, limit, filter_spec or {})
+            return self.group_hits_by_record(hits, top_k)
+
+        with track_stage("retrieve", hybrid=True):
+            dense, lexical = await asyncio.gather(
+                self.backend.asearch(query_vector, limit, filter_spec or {}),
+                self._alexical_hits(query_text, filter_spec, limit)
+            )
+        hits = self.fuse_rrf([dense, lexical])
+        hits = await rerank_service.rerank(query_text, hits)
+        return self.group_hits_by_record(hits, top_k)
+
+    def find_records(self, filter_spec: dict, limit: int = 20, offset: str = None) -> tuple:
+        """
+        Búsqueda estructurada (sin vector) de registros que cumplen los filtros.
+        Recorre solo el primer fragmento de cada registro, que contiene la transcripción completa.
+
+        Returns:
+            tuple: (registros, offset de la página siguiente o None).
+        """
+        points, next_offset = self.backend.find_first_chunks(filter_spec or {}, limit, offset)
+        records = [
+            {
+                "record_id": point.payload.get("record_id"),
+                "extracted_data": point.payload.get("extracted_data"),
+                "processing_metadata": point.payload.get("processing_metadata"),
+                "transcription": point.payload.get("transcription")
+            }
+            for point in points
+        ]
+        return records, next_offset
+
 # Instancia única del servicio para ser usada por la API
 vector_db_service = VectorDBService()
@@ -1,7 +1,15 @@
 # app/services/whisper_service.py
 import faster_whisper
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import settings
+from app.services.cache_service import sha256_text
+from app.core.metrics import observe_stage, track_stage
+from app.services.model_client import remote_model
+from app.services.audio_service import SAMPLING_RATE, prepare_audio
 import logging
+import threading
+import time
 
 
 # Configuración del logger para este módulo
@@ -12,58 +20,251 @@ logger = logging.getLogger(__name__)
 class WhisperService:
     """
     Servicio para manejar la lógica de transcripción con el modelo Whisper.
-    Esta clase carga el modelo una sola vez (patrón Singleton) y proporciona
-    un método para realizar la transcripción.
+    Esta clase carga el modelo una sola vez (patrón Singleton), en la primera
+    transcripción o en el calentamiento del arranque, y proporciona un método
+    para realizar la transcripción.
     """
     _instance = None
     _model = None
+    _load_lock = threading.Lock()
+    # Pool para transcribir en paralelo los fragmentos de un audio largo.
+    _chunk_executor = None
 
     # El método __new__ controla la creación de la instancia.
     def __new__(cls):
         if cls._instance is None:
             logger.info("Creando instancia de WhisperService...")
             cls._instance = super(WhisperService, cls).__new__(cls)
+        return cls._instance
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        self.load()
+        return self._model
+
+    def load(self):
+        """
+        Carga el modelo si aún no está cargado. Si falla, se reintenta en la siguiente llamada.
+        """
+        cls = type(self)
+        with cls._load_lock:
+            if cls._model is not None:
+                return
             try:
-                logger.info(f"Cargando modelo Whisper '{settings.MODEL_SIZE}' en dispositivo '{settings.COMPUTE_DEVICE}'...")
-                cls._model = faster_whisper.WhisperModel(
-                    settings.MODEL_SIZE, 
-                    device=settings.COMPUTE_DEVICE, 
-                    compute_type="int8" # Optimización para CPU
+                if settings.MODEL_SERVER_ADDRESS:
+                    # Varios workers: el modelo vive en el servidor de modelos compartido.
+                    cls._model = remote_model("whisper")
+                else:
+                    logger.info(f"Cargando modelo Whisper '{settings.MODEL_SIZE}' en dispositivo '{settings.COMPUTE_DEVICE}'...")
+                    # 'num_workers' crea un worker de CTranslate2 por transcripción concurrente
+                    # (las réplicas comparten los pesos) y 'cpu_threads' fija los hilos de cada uno.
+                    cls._model = faster_whisper.WhisperModel(
+                        settings.MODEL_SIZE, 
+                        device=settings.COMPUTE_DEVICE, 
+                        compute_type="int8", # Optimización para CPU
+                        cpu_threads=settings.WHISPER_CPU_THREADS,
+                        num_workers=max(settings.TRANSCRIPTION_WORKERS, settings.LONG_AUDIO_WORKERS)
+                    )
+                cls._chunk_executor = ThreadPoolExecutor(
+                    max_workers=settings.LONG_AUDIO_WORKERS, thread_name_prefix="whisper-chunk"
                 )
                 logger.info("Modelo Whisper cargado exitosamente.")
             except Exception as e:
                 logger.error(f"Error fatal al cargar el modelo Whisper: {e}")
-                cls._model = None
-        return cls._instance
+                raise RuntimeError("El modelo de transcripción no está disponible.") from e
 
-    def transcribe_audio(self, file_path: str) -> dict:
+    @staticmethod
+    def cache_key(audio_hash: str) -> str:
+        """
+        Clave de caché de una transcripción: el hash del audio más la configuración
+        del modelo y de la decodificación que afecta al resultado.
         """
-        Transcribe un archivo de audio y devuelve la transcripción y metadatos.
+        return sha256_text(":".join(str(part) for part in (
+            audio_hash, settings.MODEL_SIZE, settings.WHISPER_BEAM_SIZE, settings.WHISPER_VAD_FILTER,
+            settings.WHISPER_VAD_MIN_SILENCE_MS, settings.LONG_AUDIO_THRESHOLD_SECONDS, settings.LONG_AUDIO_CHUNK_SECONDS,
+            settings.AUDIO_TRIM_SILENCE, settings.AUDIO_SILENCE_THRESHOLD_DB, settings.AUDIO_SILENCE_PADDING_MS
+        )))
+
+    @staticmethod
+    def _prepare(audio) -> dict:
+        """
+        Acepta el audio ya preparado por 'audio_service' o la ruta de un archivo,
+        que entonces se decodifica en el hilo actual.
+        """
+        if isinstance(audio, str):
+            logger.info(f"Decodificando el archivo: {audio}")
+            with track_stage("decode"):
+                return prepare_audio(audio)
+        return audio
+
+    def transcribe_audio(self, audio) -> dict:
+        """
+        Transcribe un audio y devuelve la transcripción y metadatos.
+        Los audios de al menos LONG_AUDIO_THRESHOLD_SECONDS usan el modo de audio largo.
 
         Args:
-            file_path (str): La ruta al archivo de audio.
+            audio (dict | str): El audio preparado por 'audio_service.prepare' o la ruta al archivo.
 
         Returns:
-            dict: Un diccionario con la transcripción y la información del idioma.
+            dict: Un diccionario con la transcripción, el idioma, la duración (del audio original)
+                y los segmentos con sus marcas de tiempo (en segundos, sobre el audio original).
         """
-        if not self._model:
-            raise RuntimeError("El modelo de transcripción no está disponible.")
+        self.load()
         
         try:
-            logger.info(f"Iniciando transcripción para el archivo: {file_path}")
-            segments, info = self._model.transcribe(file_path, beam_size=5)
-            
-            logger.info(f"Lenguaje detectado: {info.language} (probabilidad: {info.language_probability:.2f})")
-            
-            transcription = "".join(segment.text for segment in segments)
-            
-            return {
-                "transcription": transcription.strip(),
-                "language": info.language
-            }
+            prepared = self._prepare(audio)
+            samples, offset, duration = prepared["audio"], prepared["offset"], prepared["duration"]
+            logger.info(f"Iniciando transcripción de {duration:.1f} s de audio ({len(samples) / SAMPLING_RATE:.1f} s tras recortar el silencio).")
+            if len(samples) == 0:
+                return self._build_result([], None, duration)
+
+            if len(samples) / SAMPLING_RATE >= settings.LONG_AUDIO_THRESHOLD_SECONDS:
+                with track_stage("transcribe", mode="long"):
+                    return self._transcribe_long_audio(samples, duration, offset)
+
+            with track_stage("transcribe", mode="single"):
+                segments, language, language_probability = self._transcribe_chunk(
+                    samples, offset=offset, vad_filter=settings.WHISPER_VAD_FILTER
+                )
+            logger.info(f"Lenguaje detectado: {language} (probabilidad: {language_probability:.2f})")
+            return self._build_result(segments, language, duration)
         except Exception as e:
             logger.error(f"Ocurrió un error durante la transcripción: {e}")
             raise
 
+    def iter_transcription(self, audio):
+        """
+        Variante incremental de 'transcribe_audio': entrega cada segmento en cuanto se decodifica.
+        Acepta el mismo audio (preparado o la ruta al archivo).
+
+        Yields:
+            tuple: ("segment", {start, end, text}) por cada segmento, en orden, y al final
+                ("done", resultado) con el mismo diccionario que devuelve 'transcribe_audio'.
+        """
+        self.load()
+
+        prepared = self._prepare(audio)
+        samples, offset, duration = prepared["audio"], prepared["offset"], prepared["duration"]
+        logger.info(f"Iniciando transcripción incremental de {duration:.1f} s de audio.")
+        start = time.perf_counter()
+        segments = []
+
+        if len(samples) == 0:
+            language = None
+        elif len(samples) / SAMPLING_RATE >= settings.LONG_AUDIO_THRESHOLD_SECONDS:
+            # Los fragmentos se transcriben en paralelo, pero se entregan en orden.
+            futures = [
+                self._chunk_executor.submit(self._transcribe_chunk, samples[start:end], offset + start / SAMPLING_RATE)
+                for start, end in self._split_speech_chunks(samples)
+            ]
+            language, language_probability = None, -1.0
+            for future in futures:
+                chunk_segments, chunk_language, chunk_probability = future.result()
+                if chunk_probability > language_probability:
+                    language, language_probability = chunk_language, chunk_probability
+                for segment in chunk_segments:
+                    segments.append(segment)
+                    yield "segment", segment
+        else:
+            lazy_segments, info = self._model.transcribe(
+                samples,
+                beam_size=settings.WHISPER_BEAM_SIZE,
+                vad_filter=settings.WHISPER_VAD_FILTER,
+                vad_parameters={"min_silence_duration_ms": settings.WHISPER_VAD_MIN_SILENCE_MS}
+            )
+            language = info.language
+            for lazy_segment in lazy_segments:
+                segment = {
+                    "start": round(lazy_segment.start + offset, 2),
+                    "end": round(lazy_segment.end + offset, 2),
+                    "text": lazy_segment.text
+                }
+                segments.append(segment)
+                yield "segment", segment
+
+        # Incluye el tiempo que el consumidor tarda en leer cada segmento (normalmente despreciable).
+        observe_stage("transcribe", time.perf_counter() - start)
+        yield "done", self._build_result(segments, language, duration)
+
+    def _transcribe_chunk(self, audio, offset: float, vad_filter: bool = False) -> tuple:
+        """
+        Transcribe un fragmento de audio (array de numpy) y desplaza sus marcas de tiempo.
+        Consume el generador de segmentos, por lo que el trabajo ocurre en el hilo que lo llama.
+        """
+        segments, info = self._model.transcribe(
+            audio,
+            beam_size=settings.WHISPER_BEAM_SIZE,
+            vad_filter=vad_filter,
+            vad_parameters={"min_silence_duration_ms": settings.WHISPER_VAD_MIN_SILENCE_MS}
+        )
+        decoded = [
+            {"start": round(segment.start + offset, 2), "end": round(segment.end + offset, 2), "text": segment.text}
+            for segment in segments
+        ]
+        return decoded, info.language, info.language_probability
+
+    def _split_speech_chunks(self, audio) -> list:
+        """
+        Divide el audio en fragmentos de voz de hasta LONG_AUDIO_CHUNK_SECONDS usando VAD.
+        Los tramos de voz consecutivos se agrupan para no cortar frases a la mitad.
+
+        Returns:
+            list: Tuplas (muestra_inicial, muestra_final) de cada fragmento.
+        """
+        max_chunk_samples = int(settings.LONG_AUDIO_CHUNK_SECONDS * SAMPLING_RATE)
+        speech_regions = get_speech_timestamps(
+            audio,
+            VadOptions(
+                min_silence_duration_ms=settings.WHISPER_VAD_MIN_SILENCE_MS,
+                max_speech_duration_s=settings.LONG_AUDIO_CHUNK_SECONDS
+            ),
+            sampling_rate=SAMPLING_RATE
+        )
+
+        chunks = []
+        for region in speech_regions:
+            if chunks and region["end"] - chunks[-1][0] <= max_chunk_samples:
+                chunks[-1] = (chunks[-1][0], region["end"])
+            else:
+                chunks.append((region["start"], region["end"]))
+        return chunks
+
+    def _transcribe_long_audio(self, audio, duration: float, offset: float = 0.0) -> dict:
+        """
+        Modo de audio largo: divide el audio con VAD, transcribe los fragmentos en paralelo
+        y une los segmentos en orden con sus marcas de tiempo absolutas ('offset' es el
+        silencio recortado al inicio).
+        """
+        chunks = self._split_speech_chunks(audio)
+        logger.info(f"Audio largo ({duration:.0f} s): {len(chunks)} fragmentos de voz en {settings.LONG_AUDIO_WORKERS} workers.")
+        if not chunks:
+            return self._build_result([], None, duration)
+
+        futures = [
+            self._chunk_executor.submit(self._transcribe_chunk, audio[start:end], offset + start / SAMPLING_RATE)
+            for start, end in chunks
+        ]
+        results = [future.result() for future in futures]
+
+        segments = [segment for chunk_segments, _, _ in results for segment in chunk_segments]
+        # El idioma del audio es el detectado con mayor probabilidad entre los fragmentos.
+        _, language, language_probability = max(results, key=lambda result: result[2])
+        logger.info(f"Lenguaje detectado: {language} (probabilidad: {language_probability:.2f})")
+        return self._build_result(segments, language, duration)
+
+    @staticmethod
+    def _build_result(segments: list, language: str, duration: float) -> dict:
+        transcription = "".join(segment["text"] for segment in segments)
+        return {
+            "transcription": transcription.strip(),
+            "language": language,
+            "duration": round(duration, 2),
+            "segments": segments
+        }
+
 # Instancia única del servicio para ser importada en los endpoints.
 whisper_service = WhisperService()
\ No newline at end of file
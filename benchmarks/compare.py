@@ -0,0 +1,51 @@
+# benchmarks/compare.py
+"""
+Compara dos resultados de 'benchmarks.run' (p. ej. la rama principal frente a un cambio):
+
+    python -m benchmarks.compare base.json candidate.json
+"""
+import argparse
+import json
+
+
+def _delta(base: float, candidate: float) -> str:
+    if not base:
+        return "n/a"
+    return f"{(candidate - base) / base * 100:+.1f}%"
+
+
+def compare(base: dict, candidate: dict) -> list:
+    lines = [f"base {base['meta']['git_commit']} -> candidato {candidate['meta']['git_commit']}"]
+    base_levels = {level["clients"]: level for level in base["levels"]}
+    for level in candidate["levels"]:
+        previous = base_levels.get(level["clients"])
+        if previous is None:
+            continue
+        lines.append(f"\n{level['clients']} clientes")
+        for pipeline in ("ingest", "chat"):
+            old, new = previous[pipeline]["throughput_per_s"], level[pipeline]["throughput_per_s"]
+            lines.append(f"  {pipeline:<10} throughput {old:>9.3f} -> {new:>9.3f} /s ({_delta(old, new)})")
+        for stage, stats in level["stages"].items():
+            old_stats = previous["stages"].get(stage, {})
+            if not stats.get("count") or not old_stats.get("count"):
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                lines.append(f"  {stage:<10} {key:<7} {old_stats[key]:>9.1f} -> {stats[key]:>9.1f} ms ({_delta(old_stats[key], stats[key])})")
+        lines.append(f"  peak RSS   {previous['peak_rss_mb']:>9.1f} -> {level['peak_rss_mb']:>9.1f} MB")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmark.")
+    parser.add_argument("base")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    print("\n".join(compare(base, candidate)))
+
+
+if __name__ == "__main__":
+    main()
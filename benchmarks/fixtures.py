@@ -0,0 +1,139 @@
+# benchmarks/fixtures.py
+"""
+Datos sintéticos y deterministas (por semilla) para los benchmarks: conversaciones con
+su transcripción y segmentos, preguntas para el chat, audios WAV y embeddings.
+"""
+import os
+import random
+import wave
+from datetime import date, timedelta
+import numpy as np
+
+FIRST_NAMES = ["Juan", "Ana", "Luis", "María", "Carlos", "Lucía", "Pedro", "Sofía", "Jorge", "Elena",
+               "Miguel", "Laura", "Andrés", "Paula", "Diego", "Carmen", "Raúl", "Isabel", "Tomás", "Valeria"]
+LAST_NAMES = ["Pérez", "Gómez", "Rodríguez", "Martínez", "López", "Sánchez", "Díaz", "Torres", "Ramírez", "Flores"]
+SYMPTOMS = ["fiebre", "tos", "dolor de cabeza", "dolor de garganta", "dolor abdominal", "náuseas", "diarrea",
+            "mareo", "cansancio", "congestión nasal", "escalofríos", "dolor de espalda", "falta de aire"]
+DIAGNOSES = ["gripe", "infección respiratoria", "gastroenteritis", "migraña", "faringitis", "lumbalgia", "sinusitis"]
+FILLER = [
+    "El promotor pregunta si ha tomado algún medicamento y el paciente dice que solo paracetamol.",
+    "También comenta que en su casa hay otras personas con molestias parecidas.",
+    "Se le recomienda beber abundante agua y descansar durante los próximos días.",
+    "El paciente explica que las molestias empeoran por la noche y mejoran por la mañana.",
+    "No refiere alergias conocidas ni enfermedades crónicas.",
+    "El promotor revisa la temperatura y toma nota de la presión arterial.",
+    "Se acuerda una visita de seguimiento la próxima semana para ver la evolución.",
+    "El paciente trabaja en el campo y pasa muchas horas al sol.",
+]
+WORDS_PER_SECOND = 2.5
+
+
+def make_conversation(index: int, seed: int = 0, filler_sentences: int = 12) -> dict:
+    """
+    Genera una conversación sintética con su transcripción, segmentos (con tiempos) y los
+    datos que la extracción debería obtener.
+    """
+    rng = random.Random(seed * 100003 + index)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    age = rng.randint(18, 90)
+    consultation_date = date(2024, 1, 1) + timedelta(days=rng.randint(0, 364))
+    symptoms = rng.sample(SYMPTOMS, rng.randint(1, 3))
+    diagnosis = rng.choice(DIAGNOSES)
+    symptom_text = symptoms[0] if len(symptoms) == 1 else ", ".join(symptoms[:-1]) + " y " + symptoms[-1]
+
+    sentences = [
+        "Buenos días, ¿cómo se llama?",
+        f"Me llamo {name}.",
+        "¿Cuántos años tiene?",
+        f"Tengo {age} años.",
+        f"Hoy es {consultation_date.isoformat()}.",
+        "¿Qué le pasa?",
+        f"Tengo {symptom_text} desde hace {rng.randint(1, 10)} días.",
+        *(rng.choice(FILLER) for _ in range(filler_sentences)),
+        f"Parece una {diagnosis}.",
+    ]
+
+    segments = []
+    position = 0.0
+    for sentence in sentences:
+        duration = len(sentence.split()) / WORDS_PER_SECOND
+        segments.append({"start": round(position, 2), "end": round(position + duration, 2), "text": " " + sentence})
+        position += duration + 0.3
+
+    return {
+        "index": index,
+        "transcription": "".join(segment["text"] for segment in segments).strip(),
+        "segments": segments,
+        "duration": round(position, 2),
+        "expected": {"patient_name": name, "patient_age": age, "consultation_date": consultation_date.isoformat(),
+                     "symptoms": symptoms, "preliminary_diagnosis": diagnosis},
+    }
+
+
+def make_questions(conversations: list, count: int, seed: int = 0) -> list:
+    """Preguntas para el chat sobre las conversaciones generadas (nombres, síntomas, edades, diagnósticos)."""
+    rng = random.Random(seed)
+    templates = [
+        lambda c: f"¿Qué síntomas tiene el paciente {c['expected']['patient_name']}?",
+        lambda c: f"¿Qué pacientes tienen {rng.choice(c['expected']['symptoms'])}?",
+        lambda c: f"¿Qué pacientes mayores de {max(18, c['expected']['patient_age'] - 5)} tienen {c['expected']['symptoms'][0]}?",
+        lambda c: f"¿Quién tiene un diagnóstico de {c['expected']['preliminary_diagnosis']}?",
+        lambda c: f"¿Cuántos años tiene {c['expected']['patient_name']} y qué le recomendaron?",
+    ]
+    return [rng.choice(templates)(rng.choice(conversations)) for _ in range(count)]
+
+
+def synthesize_speech_like_audio(duration_seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """
+    Señal con estructura parecida a la voz (armónicos de una fundamental variable, modulados
+    en sílabas de ~4 Hz y con pausas) para ejercitar el decodificador, la VAD y Whisper con
+    audios de duración controlada. No contiene palabras inteligibles.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration_seconds * sample_rate)) / sample_rate
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    # Pausas de ~0.6 s cada pocos segundos, como entre frases.
+    pauses = (t % 3.0) > 2.4
+    envelope = syllables * ~pauses
+    signal = 0.3 * voice * envelope + 0.01 * rng.standard_normal(len(t))
+    return (signal / np.max(np.abs(signal)) * 0.8).astype(np.float32)
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = 16000):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((audio * 32767).astype(np.int16).tobytes())
+
+
+def make_audio_files(directory: str, count: int, duration_seconds: float, seed: int = 0) -> list:
+    """Escribe 'count' archivos WAV sintéticos (16 kHz, mono) y devuelve sus rutas."""
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"synthetic_{index:04d}.wav")
+        write_wav(path, synthesize_speech_like_audio(duration_seconds, seed=seed * 100003 + index))
+        paths.append(path)
+    return paths
+
+
+def synthesize_embeddings(count: int, dimension: int = 384, clusters: int = 512, noise: float = 0.6,
+                          seed: int = 0, sample_seed: int = 1, batch_size: int = 65536) -> np.ndarray:
+    """
+    Embeddings normalizados agrupados alrededor de 'clusters' centros (como los temas de las
+    conversaciones), en float32. Los centros dependen de 'seed' y las muestras de 'sample_seed',
+    de modo que las consultas pueden generarse con otra 'sample_seed' sobre los mismos centros.
+    """
+    centers = np.random.default_rng(seed).standard_normal((clusters, dimension)).astype(np.float32)
+    rng = np.random.default_rng(sample_seed)
+    vectors = np.empty((count, dimension), dtype=np.float32)
+    for start in range(0, count, batch_size):
+        end = min(count, start + batch_size)
+        batch = centers[rng.integers(0, clusters, end - start)]
+        batch += noise * rng.standard_normal(batch.shape, dtype=np.float32)
+        vectors[start:end] = batch / np.linalg.norm(batch, axis=1, keepdims=True)
+    return vectors
@@ -0,0 +1,162 @@
+# benchmarks/gemini_stub.py
+"""
+Servidor local que imita los endpoints de Gemini usados por la aplicación
+('generateContent' y 'streamGenerateContent?alt=sse'), con latencia y errores inyectables.
+
+Uso independiente (para apuntar la API a él con GEMINI_API_BASE_URL=http://127.0.0.1:8081/v1beta):
+
+    python -m benchmarks.gemini_stub --port 8081 --latency-ms 400 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Frases de relleno para las respuestas del chat.
+ANSWER_WORDS = (
+    "Según los registros, el paciente refirió los síntomas descritos durante la consulta "
+    "y el promotor recomendó reposo, hidratación y seguimiento en una semana."
+).split()
+
+
+def extract_from_prompt(prompt: str) -> dict:
+    """
+    Extracción determinista sobre las transcripciones sintéticas de 'benchmarks.fixtures'
+    (se apoya en sus frases fijas), para que los datos almacenados sean realistas.
+    """
+    name = re.search(r"[Mm]e llamo ([A-ZÁÉÍÓÚÑ][\wáéíóúñ]+(?: [A-ZÁÉÍÓÚÑ][\wáéíóúñ]+)*)", prompt)
+    age = re.search(r"[Tt]engo (\d{1,3}) años", prompt)
+    date = re.search(r"(\d{4}-\d{2}-\d{2})", prompt)
+    symptoms = re.search(r"[Tt]engo ([^.]*?) desde hace", prompt)
+    diagnosis = re.search(r"[Pp]arece (?:una|un) ([^.]+)\.", prompt)
+    return {
+        "patient_name": name.group(1) if name else None,
+        "patient_age": int(age.group(1)) if age else None,
+        "consultation_date": date.group(1) if date else None,
+        "symptoms": [item.strip() for item in re.split(r",| y ", symptoms.group(1)) if item.strip()] if symptoms else [],
+        "preliminary_diagnosis": diagnosis.group(1) if diagnosis else None,
+        "observations": "Conversación sintética generada para benchmarks."
+    }
+
+
+class GeminiStub:
+    """
+    Aplicación FastAPI del stub. La latencia de cada respuesta es 'latency_ms' ± 'jitter_ms';
+    con probabilidad 'error_rate' responde 503 (o 429 con Retry-After), que el cliente reintenta.
+    En streaming, el primer fragmento llega tras la latencia y los siguientes cada 'token_interval_ms'.
+    """
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 50, error_rate: float = 0.0,
+                 token_interval_ms: float = 20, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.token_interval_ms = token_interval_ms
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.app = FastAPI(title="Gemini stub")
+        self.app.post("/v1beta/models/{model_method}")(self.handle)
+
+    def _delay(self) -> float:
+        return max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+
+    @staticmethod
+    def _usage(prompt: str, output: str) -> dict:
+        prompt_tokens = len(prompt) // 4
+        output_tokens = len(output) // 4
+        return {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens}
+
+    def _error(self):
+        self.errors += 1
+        if self._random.random() < 0.5:
+            return JSONResponse(status_code=429, content={"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                                headers={"Retry-After": "0"})
+        return JSONResponse(status_code=503, content={"error": {"code": 503, "status": "UNAVAILABLE"}})
+
+    async def handle(self, model_method: str, request: Request):
+        self.requests += 1
+        payload = await request.json()
+        prompt = "".join(part.get("text", "") for content in payload.get("contents", []) for part in content.get("parts", []))
+        generation_config = payload.get("generationConfig", {})
+
+        await asyncio.sleep(self._delay())
+        if self._random.random() < self.error_rate:
+            return self._error()
+
+        if generation_config.get("response_mime_type") == "application/json":
+            text = json.dumps(extract_from_prompt(prompt), ensure_ascii=False)
+        else:
+            text = " ".join(ANSWER_WORDS)
+
+        if model_method.endswith(":streamGenerateContent"):
+            return StreamingResponse(self._stream(prompt, text), media_type="text/event-stream")
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": self._usage(prompt, text)
+        }
+
+    async def _stream(self, prompt: str, text: str):
+        words = text.split(" ")
+        for index in range(0, len(words), 4):
+            if index:
+                await asyncio.sleep(self.token_interval_ms / 1000)
+            chunk = {"candidates": [{"content": {"parts": [{"text": " ".join(words[index:index + 4]) + " "}], "role": "model"}}]}
+            if index + 4 >= len(words):
+                chunk["usageMetadata"] = self._usage(prompt, text)
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """Ejecuta el stub con uvicorn en un hilo en segundo plano (para usarlo desde el harness)."""
+    def __init__(self, stub: GeminiStub, port: int = None):
+        self.stub = stub
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name="gemini-stub", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1beta"
+
+    def start(self):
+        self._thread.start()
+        deadline = time.time() + 10
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("El stub de Gemini no arrancó a tiempo.")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local de la API de Gemini.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-interval-ms", type=float, default=20)
+    args = parser.parse_args()
+    stub = GeminiStub(args.latency_ms, args.jitter_ms, args.error_rate, args.token_interval_ms)
+    uvicorn.run(stub.app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# benchmarks/run.py
+"""
+Benchmark offline de los pipelines de ingesta y chat.
+
+Arranca un stub local de Gemini (con latencia y errores inyectables), usa Qdrant embebido
+en memoria (o el índice vectorial local con --vector-backend local) y datos sintéticos, y mide para cada nivel de concurrencia (N clientes):
+
+- percentiles de latencia por etapa: save, transcribe, extract, index (embeddings + upsert, en
+  paralelo con extract), set_payload, retrieve, generate;
+- throughput de ingesta (archivos/s) y de chat (preguntas/s);
+- pico de memoria residente (RSS) del proceso.
+
+El resultado es un JSON estable (claves ordenadas) para comparar versiones con
+'python -m benchmarks.compare'. Los modelos de Whisper y de embeddings deben estar
+descargados previamente (se fuerza HF_HUB_OFFLINE=1 salvo que se indique lo contrario).
+
+    python -m benchmarks.run --conversations 40 --questions 40 --clients 1,4,8 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.fixtures import make_conversation, make_questions, make_audio_files
+from benchmarks.gemini_stub import GeminiStub, StubServer
+
+STAGES = ("save", "transcribe", "extract", "index", "set_payload", "retrieve", "generate")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline de ingesta y chat.")
+    parser.add_argument("--conversations", type=int, default=24, help="Conversaciones a ingerir por nivel.")
+    parser.add_argument("--questions", type=int, default=24, help="Preguntas de chat por nivel.")
+    parser.add_argument("--clients", default="1,4,8", help="Niveles de concurrencia, separados por comas.")
+    parser.add_argument("--audio-seconds", type=float, default=20.0, help="Duración de los audios sintéticos.")
+    parser.add_argument("--skip-transcription", action="store_true",
+                        help="No carga Whisper ni mide 'transcribe' (útil para aislar el resto del pipeline).")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--vector-backend", choices=("qdrant", "local"), default="qdrant",
+                        help="Base vectorial: Qdrant embebido en memoria o el índice local en el directorio temporal.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="Ruta del JSON de resultados ('-' para stdout).")
+    return parser.parse_args(argv)
+
+
+def configure_environment(data_dir: str, stub_url: str, vector_backend: str = "qdrant"):
+    """
+    Configura la aplicación antes de importarla ('settings' se lee al importar): stub de
+    Gemini, base vectorial (Qdrant en memoria o índice local), directorios temporales y cachés desactivadas para que cada
+    petición recorra el pipeline completo.
+    """
+    os.environ["GEMINI_API_BASE_URL"] = stub_url
+    os.environ["GEMINI_API_KEY"] = "benchmark"
+    os.environ["VECTOR_BACKEND"] = vector_backend
+    os.environ["QDRANT_LOCATION"] = ":memory:"
+    os.environ["DATA_DIRECTORY"] = data_dir
+    os.environ["UPLOAD_DIRECTORY"] = os.path.join(data_dir, "uploads")
+    os.environ["CACHE_ENABLED"] = "false"
+    os.environ["CHAT_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+
+def summarize(values: list) -> dict:
+    """Percentiles (en milisegundos) de una lista de duraciones en segundos."""
+    if not values:
+        return {"count": 0}
+    ms = np.array(values) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(ms, 90)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def peak_rss_mb() -> float:
+    # En Linux 'ru_maxrss' está en KiB (en macOS, en bytes).
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+class StageTimer:
+    def __init__(self):
+        self.durations = {stage: [] for stage in STAGES}
+        self.errors = {stage: 0 for stage in STAGES}
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors[stage] += 1
+            raise
+        self.durations[stage].append(time.perf_counter() - start)
+
+
+class Benchmark:
+    def __init__(self, args, audio_paths: list):
+        # Importación diferida: la aplicación se importa después de configurar el entorno.
+        from app.core.config import settings
+        from app.services.upload_service import save_upload_file
+        from app.services.extraction_service import extraction_service
+        from app.services.vector_db_service import vector_db_service
+        from app.services.lexical_index import lexical_index
+        from app.services.chatbot_service import chatbot_service
+        from app.services.query_planner import plan_query
+        self.settings = settings
+        self.save_upload_file = save_upload_file
+        self.extraction_service = extraction_service
+        self.vector_db_service = vector_db_service
+        self.lexical_index = lexical_index
+        self.chatbot_service = chatbot_service
+        self.plan_query = plan_query
+        self.transcription_service = None
+        if not args.skip_transcription:
+            from app.services.transcription_service import transcription_service
+            self.transcription_service = transcription_service
+        self.args = args
+        self.audio_paths = audio_paths
+
+    def reset_collection(self):
+        """Vacía la base vectorial y el índice léxico para que cada nivel parta del mismo estado."""
+        self.vector_db_service.delete_collection()
+        self.vector_db_service.create_collection_if_not_exists()
+        self.lexical_index.clear()
+
+    async def _transcribe(self, path: str):
+        from app.services.transcription_service import TranscriptionQueueFullError
+        while True:
+            try:
+                return await self.transcription_service.transcribe(path)
+            except TranscriptionQueueFullError:
+                # Igual que la ingesta masiva: se espera a que haya hueco en el pool.
+                await asyncio.sleep(0.05)
+
+    async def ingest_one(self, conversation: dict, timer: StageTimer):
+        from starlette.datastructures import Headers, UploadFile
+        audio_path = self.audio_paths[conversation["index"] % len(self.audio_paths)]
+        with open(audio_path, "rb") as audio_file:
+            upload = UploadFile(audio_file, filename=os.path.basename(audio_path),
+                                headers=Headers({"content-type": "audio/wav"}))
+            with timer.measure("save"):
+                saved_path = await self.save_upload_file(upload)
+        try:
+            if self.transcription_service is not None:
+                with timer.measure("transcribe"):
+                    await self._transcribe(saved_path)
+        finally:
+            os.remove(saved_path)
+
+        # El audio sintético no contiene palabras: las etapas siguientes usan la transcripción
+        # sintética emparejada, para que el contenido almacenado sea realista y reproducible.
+        # Como en 'ingestion_service', la extracción y la escritura de los fragmentos van en paralelo.
+        record_id = f"00000000-0000-4000-8000-{conversation['index']:012d}"
+        metadata = {"filename": os.path.basename(audio_path), "language": "es"}
+
+        async def extract():
+            with timer.measure("extract"):
+                return await self.extraction_service.extract_data_from_text(conversation["transcription"])
+
+        async def index():
+            with timer.measure("index"):
+                return await asyncio.to_thread(
+                    self.vector_db_service.store_record_chunks,
+                    conversation["transcription"], metadata, record_id, conversation["segments"]
+                )
+
+        extracted_data, points = await asyncio.gather(extract(), index())
+        with timer.measure("set_payload"):
+            await asyncio.to_thread(self.vector_db_service.complete_record, record_id, extracted_data, metadata, points)
+
+    async def chat_one(self, question: str, timer: StageTimer):
+        with timer.measure("retrieve"):
+            context = await self.chatbot_service._retrieve_context(question, filter_spec=self.plan_query(question))
+        with timer.measure("generate"):
+            await self.chatbot_service._generate_response(question, context)
+
+    @staticmethod
+    async def _run_clients(clients: int, items: list, handler) -> tuple:
+        """Reparte 'items' entre 'clients' tareas concurrentes. Devuelve (segundos, fallos)."""
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+        failures = 0
+
+        async def client():
+            nonlocal failures
+            while not queue.empty():
+                item = queue.get_nowait()
+                try:
+                    await handler(item)
+                except Exception:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return time.perf_counter() - start, failures
+
+    async def run_level(self, clients: int, conversations: list, questions: list) -> dict:
+        self.reset_collection()
+        timer = StageTimer()
+        ingest_seconds, ingest_failures = await self._run_clients(
+            clients, conversations, lambda conversation: self.ingest_one(conversation, timer)
+        )
+        chat_seconds, chat_failures = await self._run_clients(
+            clients, questions, lambda question: self.chat_one(question, timer)
+        )
+        return {
+            "clients": clients,
+            "ingest": {
+                "items": len(conversations),
+                "failures": ingest_failures,
+                "elapsed_s": round(ingest_seconds, 3),
+                "throughput_per_s": round(len(conversations) / ingest_seconds, 3),
+            },
+            "chat": {
+                "items": len(questions),
+                "failures": chat_failures,
+                "elapsed_s": round(chat_seconds, 3),
+                "throughput_per_s": round(len(questions) / chat_seconds, 3),
+            },
+            "stages": {stage: summarize(timer.durations[stage]) for stage in STAGES},
+            "stage_errors": timer.errors,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def settings_snapshot(self) -> dict:
+        keys = ("MODEL_SIZE", "TRANSCRIPTION_WORKERS", "WHISPER_CPU_THREADS", "WHISPER_BEAM_SIZE", "EMBEDDING_MODEL_NAME",
+                "EMBEDDING_BACKEND", "CHUNK_MAX_WORDS", "CHUNK_OVERLAP_WORDS", "RETRIEVAL_HYBRID", "RERANK_ENABLED",
+                "CHAT_CONTEXT_TOKEN_BUDGET", "LLM_MAX_CONCURRENCY", "VECTOR_BACKEND")
+        return {key: getattr(self.settings, key, None) for key in keys}
+
+
+async def main_async(args) -> dict:
+    clients_levels = [int(value) for value in args.clients.split(",") if value.strip()]
+    stub = GeminiStub(args.llm_latency_ms, args.llm_jitter_ms, args.llm_error_rate, seed=args.seed)
+    server = StubServer(stub).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="elsol_bench_") as data_dir:
+            configure_environment(data_dir, server.base_url, args.vector_backend)
+            conversations = [make_conversation(index, seed=args.seed) for index in range(args.conversations)]
+            questions = make_questions(conversations, args.questions, seed=args.seed)
+            audio_paths = make_audio_files(os.path.join(data_dir, "audio"), min(8, args.conversations),
+                                           args.audio_seconds, seed=args.seed)
+
+            rss_before_models = peak_rss_mb()
+            benchmark = Benchmark(args, audio_paths)
+            levels = []
+            for clients in clients_levels:
+                print(f"Nivel de concurrencia: {clients} clientes...", file=sys.stderr)
+                levels.append(await benchmark.run_level(clients, conversations, questions))
+
+            from app.services.llm_service import llm_service
+            await llm_service.aclose()
+            return {
+                "meta": {
+                    "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "git_commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "args": vars(args),
+                    "settings": benchmark.settings_snapshot(),
+                },
+                "llm_stub": {"requests": stub.requests, "injected_errors": stub.errors},
+                "rss_before_models_mb": rss_before_models,
+                "peak_rss_mb": peak_rss_mb(),
+                "levels": levels,
+            }
+    finally:
+        server.stop()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(main_async(args))
+    output = json.dumps(result, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Resultados guardados en {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# benchmarks/vector_index.py
+"""
+Benchmark de recall frente a latencia de la colección de Qdrant, para dimensionar los nodos
+a medida que crece el archivo de pacientes.
+
+Para cada tamaño (p. ej. 100k y 1M puntos sintéticos) y cada cuantización ('none', 'int8',
+'binary') crea una colección con los mismos parámetros que 'QdrantBackend' (HNSW, vectores
+y payload en disco según QDRANT_*), la llena, espera a que Qdrant termine de indexarla y mide,
+para cada 'ef' de búsqueda (con y sin reordenación si hay cuantización):
+
+- recall@k frente a la búsqueda exacta calculada con numpy;
+- percentiles de latencia por consulta (secuencial, incluida la red) y consultas por segundo;
+- una estimación de la RAM de vectores e índice HNSW.
+
+Necesita un servidor de Qdrant (el Qdrant embebido hace búsqueda exacta). Las colecciones
+'bench_*' se eliminan al terminar salvo con --keep-collections.
+
+Con --backend local mide en su lugar el índice en proceso ('LocalVectorBackend', búsqueda
+exacta por bloques) sin servidor, como referencia de latencia frente a Qdrant.
+
+    docker compose up -d qdrant
+    python -m benchmarks.vector_index --points 100000,1000000 --ef 32,64,128,256 --output vectors.json
+    python -m benchmarks.vector_index --backend local --points 100000 --output local.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+from qdrant_client import QdrantClient, models
+from benchmarks.fixtures import synthesize_embeddings
+from benchmarks.run import git_commit, summarize
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de recall y latencia de la colección de Qdrant.")
+    parser.add_argument("--backend", choices=("qdrant", "local"), default="qdrant")
+    parser.add_argument("--host", default=os.getenv("QDRANT_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("QDRANT_PORT", "6333")))
+    parser.add_argument("--points", default="100000,1000000", help="Tamaños de colección, separados por comas.")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimensión (384 = all-MiniLM-L6-v2).")
+    parser.add_argument("--clusters", type=int, default=512)
+    parser.add_argument("--quantization", default="none,int8,binary", help="Cuantizaciones a comparar.")
+    parser.add_argument("--ef", default="32,64,128,256", help="Valores de 'ef' de búsqueda.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1024, help="Puntos por lote al llenar la colección.")
+    parser.add_argument("--parallel", type=int, default=4, help="Procesos que suben los lotes.")
+    parser.add_argument("--index-timeout", type=float, default=3600, help="Espera máxima (s) a que termine la indexación.")
+    parser.add_argument("--keep-collections", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="Ruta del JSON de resultados ('-' para stdout).")
+    return parser.parse_args(argv)
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, top_k: int, batch_size: int = 65536) -> np.ndarray:
+    """Vecinos exactos (producto escalar de vectores normalizados = coseno) calculados por bloques."""
+    best_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), top_k), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start:start + batch_size]
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        block_ids = np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))
+        ids = np.concatenate([best_ids, block_ids], axis=1)
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return best_ids
+
+
+def estimate_ram_mb(points: int, dimension: int, quantization: str, settings) -> float:
+    """
+    RAM aproximada de vectores e índice: los vectores cuantizados siempre en RAM, los originales
+    solo si QDRANT_VECTORS_ON_DISK es false (o sin cuantización), y ~2·m enlaces de 4 bytes por punto.
+    """
+    quantized = {"int8": dimension, "binary": dimension / 8, "none": 0}[quantization]
+    originals = 0 if settings.QDRANT_VECTORS_ON_DISK and quantization != "none" else dimension * 4
+    graph = 2 * settings.QDRANT_HNSW_M * 4
+    return round(points * (quantized + originals + graph) / (1024 * 1024), 1)
+
+
+def wait_for_index(client, name: str, points: int, timeout: float) -> dict:
+    start = time.perf_counter()
+    while True:
+        info = client.get_collection(name)
+        indexed = info.indexed_vectors_count or 0
+        if (info.status.value == "green" and indexed >= points) or time.perf_counter() - start > timeout:
+            return {"status": info.status.value, "indexed_vectors": indexed}
+        time.sleep(1)
+
+
+def measure(search, queries: np.ndarray, truth: np.ndarray) -> dict:
+    """Recall y latencia de 'search(query) -> puntos', con los IDs enteros de las filas."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        points = search(query.tolist())
+        latencies.append(time.perf_counter() - start)
+        hits += len({int(point.id) for point in points} & set(expected.tolist()))
+    return {
+        "recall": round(hits / truth.size, 4),
+        "qps": round(len(latencies) / sum(latencies), 1),
+        "latency": summarize(latencies),
+    }
+
+
+def make_dataset(args, points: int) -> tuple:
+    print(f"Generando {points} vectores...", file=sys.stderr)
+    vectors = synthesize_embeddings(points, args.dimension, args.clusters, seed=args.seed, sample_seed=args.seed + 1)
+    queries = synthesize_embeddings(args.queries, args.dimension, args.clusters, seed=args.seed, sample_seed=args.seed + 2)
+    return vectors, queries, exact_neighbors(vectors, queries, args.top_k)
+
+
+def run_size(client, service_cls, settings, args, points: int) -> list:
+    vectors, queries, truth = make_dataset(args, points)
+    ef_values = [int(value) for value in args.ef.split(",") if value.strip()]
+
+    results = []
+    for quantization in [value.strip() for value in args.quantization.split(",") if value.strip()]:
+        name = f"bench_{quantization}_{points}"
+        print(f"Llenando '{name}'...", file=sys.stderr)
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        client.create_collection(collection_name=name, **service_cls.collection_params(args.dimension, quantization))
+        start = time.perf_counter()
+        client.upload_collection(
+            collection_name=name, vectors=vectors, ids=range(points),
+            batch_size=args.batch_size, parallel=args.parallel, wait=True
+        )
+        upload_seconds = time.perf_counter() - start
+        index_state = wait_for_index(client, name, points, args.index_timeout)
+
+        searches = []
+        # Referencia: búsqueda exacta con los vectores originales.
+        def search(params):
+            return lambda query: client.query_points(
+                collection_name=name, query=query, limit=args.top_k, search_params=params, with_payload=False
+            ).points
+
+        exact_params = models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))
+        searches.append({"ef": None, "rescore": None, "exact": True, **measure(search(exact_params), queries, truth)})
+        for ef in ef_values:
+            for rescore in ([True, False] if quantization != "none" else [None]):
+                params = service_cls.query_search_params(quantization, hnsw_ef=ef, rescore=rescore)
+                searches.append({"ef": ef, "rescore": rescore, "exact": False, **measure(search(params), queries, truth)})
+        results.append({
+            "points": points,
+            "quantization": quantization,
+            "upload_seconds": round(upload_seconds, 1),
+            "index_seconds": round(time.perf_counter() - start, 1),
+            "index": index_state,
+            "estimated_ram_mb": estimate_ram_mb(points, args.dimension, quantization, settings),
+            "searches": searches,
+        })
+        if not args.keep_collections:
+            client.delete_collection(name)
+    return results
+
+
+def run_local(backend_cls, args, points: int, data_dir: str) -> list:
+    """Llena un 'LocalVectorBackend' con los mismos vectores y mide su búsqueda exacta."""
+    vectors, queries, truth = make_dataset(args, points)
+    backend = backend_cls(os.path.join(data_dir, f"bench_local_{points}"), dimension=args.dimension)
+    print(f"Llenando el índice local con {points} vectores...", file=sys.stderr)
+    start = time.perf_counter()
+    for offset in range(0, points, args.batch_size):
+        backend.upsert([
+            models.PointStruct(id=row, vector=vector, payload={"record_id": str(row)})
+            for row, vector in enumerate(vectors[offset:offset + args.batch_size].tolist(), start=offset)
+        ], wait=False)
+    upload_seconds = time.perf_counter() - start
+    searches = [{"ef": None, "rescore": None, "exact": True,
+                 **measure(lambda query: backend.search(query, args.top_k, {}), queries, truth)}]
+    backend.delete_collection()
+    return [{
+        "points": points,
+        "quantization": "none",
+        "backend": "local",
+        "upload_seconds": round(upload_seconds, 1),
+        # Los vectores float32 del archivo mapeado, que el sistema mantiene en la caché de páginas.
+        "estimated_ram_mb": round(points * args.dimension * 4 / (1024 * 1024), 1),
+        "searches": searches,
+    }]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="elsol_bench_") as data_dir:
+        # La aplicación se importa después de configurar el entorno ('settings' se lee al importar).
+        os.environ["DATA_DIRECTORY"] = data_dir
+        from app.core.config import settings
+        from app.services.qdrant_backend import QdrantBackend
+        from app.services.local_vector_backend import LocalVectorBackend
+
+        client = QdrantClient(host=args.host, port=args.port, timeout=600) if args.backend == "qdrant" else None
+        results = []
+        for points in [int(value) for value in args.points.split(",") if value.strip()]:
+            if args.backend == "local":
+                results.extend(run_local(LocalVectorBackend, args, points, data_dir))
+            else:
+                results.extend(run_size(client, QdrantBackend, settings, args, points))
+
+    keys = ("QDRANT_HNSW_M", "QDRANT_HNSW_EF_CONSTRUCT", "QDRANT_QUANTIZATION_QUANTILE", "QDRANT_VECTORS_ON_DISK",
+            "QDRANT_PAYLOAD_ON_DISK", "QDRANT_SEARCH_OVERSAMPLING", "LOCAL_INDEX_BLOCK_ROWS")
+    output = json.dumps({
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "settings": {key: getattr(settings, key) for key in keys},
+        },
+        "results": results,
+    }, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Resultados guardados en {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# test/conftest.py
+import os
+import sys
+import tempfile
+
+# 'test_gemini.py' es un script manual contra la API real de Gemini (se ejecuta al importarlo).
+collect_ignore = ["test_gemini.py"]
+
+# La configuración se lee al importar la aplicación: datos temporales, Qdrant en memoria y sin cachés.
+os.environ.setdefault("DATA_DIRECTORY", tempfile.mkdtemp(prefix="elsol_test_"))
+os.environ.setdefault("QDRANT_LOCATION", ":memory:")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("CHAT_CACHE_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
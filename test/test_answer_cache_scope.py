@@ -0,0 +1,14 @@
+# test/test_answer_cache_scope.py
+from app.core.config import settings
+from app.services.cache_service import SharedCounter
+from app.services.vector_db_service import vector_db_service
+
+
+def test_writes_from_another_process_change_the_cache_scope():
+    before = vector_db_service.collection_version
+
+    # Otro proceso (p. ej. 'app.batch_ingest') abre el mismo contador y registra una escritura.
+    SharedCounter("data_generation", settings.CACHE_DB_PATH).increment()
+
+    assert settings.API_WORKERS == 1
+    assert vector_db_service.collection_version != before
@@ -0,0 +1,34 @@
+# test/test_chat_stream.py
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.chatbot_service import chatbot_service
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_with_date_filters(monkeypatch):
+    async def fake_encode(query):
+        return [0.0] * 8
+
+    async def fake_retrieve(query, top_k=3, filter_spec=None, query_vector=None):
+        return []
+
+    monkeypatch.setattr(chatbot_service.embedding_service, "aencode", fake_encode)
+    monkeypatch.setattr(chatbot_service, "_retrieve_context", fake_retrieve)
+
+    # Sin el ciclo de vida ('with'): no se cargan los modelos en segundo plano.
+    response = TestClient(app).post("/api/v1/chat/stream", json={"question": "¿Quién tuvo fiebre en marzo de 2024?"})
+
+    assert response.status_code == 200
+    events = _events(response.text)
+    assert [event for event, _ in events] == ["context", "token", "done"]
+    filters = events[0][1]["applied_filters"]
+    assert filters["date_from"] == "2024-03-01"
+    assert filters["date_to"] == "2024-04-01"
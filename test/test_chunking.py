@@ -0,0 +1,39 @@
+# test/test_chunking.py
+from app.services.chunking_service import chunk_transcription
+
+
+def _segment(start: float, end: float, text: str) -> dict:
+    return {"start": start, "end": end, "text": text}
+
+
+def test_leading_silence_keeps_chunk_zero():
+    segments = [
+        _segment(0.0, 2.0, " "),
+        _segment(2.0, 4.0, " El paciente tiene fiebre."),
+        _segment(4.0, 6.0, " Y dolor de cabeza."),
+    ]
+    chunks = chunk_transcription("El paciente tiene fiebre. Y dolor de cabeza.", segments, max_words=1, overlap_words=0)
+
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0]["text"] == "El paciente tiene fiebre."
+    assert chunks[0]["start"] == 2.0
+
+
+def test_empty_segments_between_text_leave_no_gaps():
+    segments = [
+        _segment(0.0, 1.0, " Hola."),
+        _segment(1.0, 2.0, ""),
+        _segment(2.0, 3.0, " ¿Cómo está?"),
+    ]
+    chunks = chunk_transcription("Hola. ¿Cómo está?", segments, max_words=1, overlap_words=0)
+
+    assert [chunk["index"] for chunk in chunks] == [0, 1]
+    assert [chunk["text"] for chunk in chunks] == ["Hola.", "¿Cómo está?"]
+
+
+def test_only_empty_segments_fall_back_to_transcription():
+    chunks = chunk_transcription("Consulta sin segmentos útiles.", [_segment(0.0, 1.0, " ")])
+
+    assert len(chunks) == 1
+    assert chunks[0]["index"] == 0
+    assert chunks[0]["text"] == "Consulta sin segmentos útiles."
@@ -0,0 +1,41 @@
+# test/test_ingestion.py
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import ingestion_service as ingestion_module
+from app.services.embedding_service import EmbeddingService, embedding_service
+from app.services.extraction_service import extraction_service
+from app.services.qdrant_backend import QdrantBackend
+from app.services.vector_db_service import VectorDBService
+
+TRANSCRIPTION = {"transcription": "El paciente tiene fiebre desde ayer.", "language": "es", "segments": None}
+
+
+def test_failed_reingestion_keeps_the_complete_record(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_HYBRID", False)
+    monkeypatch.setattr(EmbeddingService, "dimension", property(lambda self: 4))
+    monkeypatch.setattr(embedding_service, "encode_batch", lambda texts: [[1.0, 0.0, 0.0, 0.0] for _ in texts])
+    service = VectorDBService(backend=QdrantBackend())
+    monkeypatch.setattr(ingestion_module, "vector_db_service", service)
+    ingestion = ingestion_module.IngestionService()
+
+    async def extract_ok(text):
+        return {"patient_name": "Ana", "symptoms": ["fiebre"]}
+
+    monkeypatch.setattr(extraction_service, "extract_data_from_text", extract_ok)
+    result = asyncio.run(ingestion.process_transcription(TRANSCRIPTION, "a.wav", 0.0, audio_hash="hash"))
+    assert service.record_exists(result["record_id"])
+
+    async def extract_failing(text):
+        raise RuntimeError("Gemini no disponible")
+
+    # La caché de registros expiró: se vuelve a ingerir el mismo audio y la extracción falla.
+    monkeypatch.setattr(extraction_service, "extract_data_from_text", extract_failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(ingestion.process_transcription(TRANSCRIPTION, "a.wav", 0.0, audio_hash="hash"))
+
+    assert service.record_exists(result["record_id"])
+    hits = service.backend.search([1.0, 0.0, 0.0, 0.0], limit=5, filter_spec={})
+    assert hits and hits[0].payload["extracted_data"]["patient_name"] == "Ana"
@@ -0,0 +1,39 @@
+# test/test_migrate_collection.py
+import uuid
+from qdrant_client import models
+from app.services.embedding_service import EmbeddingService, embedding_service
+from app.services.qdrant_backend import QdrantBackend
+
+
+def test_migration_reembeds_legacy_points_from_transcription(monkeypatch):
+    encoded = []
+
+    def fake_encode_batch(texts):
+        encoded.extend(texts)
+        return [[float(len(text)), 1.0, 0.0, 0.0] for text in texts]
+
+    # El modelo "nuevo" genera vectores de dimensión 4; la colección anterior a los alias tiene dimensión 2.
+    monkeypatch.setattr(EmbeddingService, "dimension", property(lambda self: 4))
+    monkeypatch.setattr(embedding_service, "encode_batch", fake_encode_batch)
+
+    backend = QdrantBackend()
+    backend._connect()
+    backend._client.create_collection(
+        collection_name=backend.collection_name,
+        vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE)
+    )
+    legacy_id, chunk_id, empty_id = (str(uuid.UUID(int=index)) for index in (1, 2, 3))
+    backend._client.upsert(collection_name=backend.collection_name, points=[
+        # Punto anterior a la fragmentación: solo la transcripción completa.
+        models.PointStruct(id=legacy_id, vector=[1.0, 0.0], payload={"transcription": "el paciente tiene fiebre"}),
+        models.PointStruct(id=chunk_id, vector=[0.0, 1.0], payload={"record_id": "r", "chunk_text": "dolor de cabeza"}),
+        models.PointStruct(id=empty_id, vector=[1.0, 1.0], payload={}),
+    ], wait=True)
+
+    target = backend.migrate_collection()
+
+    assert target == f"{backend.collection_name}_v1"
+    assert sorted(encoded) == ["dolor de cabeza", "el paciente tiene fiebre"]
+    points = backend._client.retrieve(target, ids=[legacy_id, chunk_id, empty_id], with_vectors=True)
+    assert {str(point.id) for point in points} == {legacy_id, chunk_id}
+    assert all(len(point.vector) == 4 for point in points)
@@ -0,0 +1,50 @@
+# test/test_query_planner.py
+from datetime import date
+
+import pytest
+
+from app.services.query_planner import plan_query
+
+TODAY = date(2024, 6, 15)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Pacientes mayores de 60 años", {"min_age": 61}),
+    ("¿Quién tiene más de 40 años?", {"min_age": 41}),
+    ("Pacientes menores de 18", {"max_age": 17}),
+    ("Pacientes de 65 años o más", {"min_age": 65}),
+    ("Pacientes entre 30 y 50 años", {"min_age": 30, "max_age": 50}),
+    ("Patients under 30 years old", {"max_age": 29}),
+    ("¿Qué paciente tiene 35 años?", {"min_age": 35, "max_age": 35}),
+])
+def test_age_filters(question, expected):
+    spec = plan_query(question, today=TODAY)
+
+    assert {key: spec[key] for key in ("min_age", "max_age") if key in spec} == expected
+
+
+@pytest.mark.parametrize("question", [
+    "¿Qué pacientes tienen fiebre desde hace más de 3 días?",
+    "Pacientes con tos por menos de 2 semanas",
+    "¿Quién tuvo 3 o más síntomas?",
+    "Pacientes con fiebre entre 2 y 4 días",
+    "¿Quién tiene tos desde hace más de 2 años?",
+])
+def test_numbers_that_are_not_ages(question):
+    spec = plan_query(question, today=TODAY)
+
+    assert "min_age" not in spec
+    assert "max_age" not in spec
+
+
+@pytest.mark.parametrize("question", [
+    "¿Qué le pasa al paciente Juan Pérez?",
+    "Paciente Juan Pérez",
+    "PACIENTE Juan Pérez",
+])
+def test_name_keyword_is_case_insensitive(question):
+    assert plan_query(question, today=TODAY)["name_tokens"] == ["juan", "perez"]
+
+
+def test_name_requires_capitalized_words():
+    assert "name_tokens" not in plan_query("Paciente con fiebre", today=TODAY)
@@ -0,0 +1,44 @@
+# test/test_rerank.py
+import asyncio
+import threading
+
+from qdrant_client.models import ScoredPoint
+
+from app.core.config import settings
+from app.services.rerank_service import RerankService
+
+
+def _hit(point_id: int, text: str) -> ScoredPoint:
+    return ScoredPoint(id=point_id, version=0, score=0.0, payload={"chunk_text": text})
+
+
+def test_slow_prediction_does_not_block_later_queries(monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_ENABLED", True)
+    monkeypatch.setattr(settings, "RERANK_TIMEOUT_MS", 200)
+    release = threading.Event()
+    service = RerankService()
+    calls = []
+
+    def score(query, texts):
+        calls.append(query)
+        if query == "lenta":
+            release.wait(5)
+        return [float(i) for i in range(len(texts))]
+
+    monkeypatch.setattr(service, "_score", score)
+    hits = [_hit(1, "fiebre"), _hit(2, "tos")]
+
+    async def scenario():
+        # La primera predicción agota el plazo y sigue ocupando el hilo del modelo.
+        assert await service.rerank("lenta", hits) == hits
+        # Mientras tanto, las consultas nuevas conservan el orden sin pasar por el modelo.
+        assert await service.rerank("rápida", hits) == hits
+        assert calls == ["lenta"]
+        release.set()
+        while service._pending:
+            await asyncio.sleep(0.01)
+        return await service.rerank("rápida", hits)
+
+    reranked = asyncio.run(scenario())
+    assert [hit.id for hit in reranked] == [2, 1]
+    assert service._pending == 0